@@ -0,0 +1,563 @@
+"""Asynchronous client of the INWX API for use with asyncio.
+
+This module requires the optional dependency aiohttp.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+import xmlrpc.client
+from typing import Any, Coroutine, Iterable, List, Optional, Tuple
+
+import aiohttp
+from certbot import errors
+from INWX.Domrobot import ApiClient
+from INWX.Domrobot import ApiType
+
+from certbot_dns_inwx._internal.cache import PersistentCache
+from certbot_dns_inwx._internal.dns_inwx import _api_result
+from certbot_dns_inwx._internal.dns_inwx import _choose_ttls
+from certbot_dns_inwx._internal.dns_inwx import _CircuitBreaker
+from certbot_dns_inwx._internal.dns_inwx import _found_record_id
+from certbot_dns_inwx._internal.dns_inwx import _INWXClient
+from certbot_dns_inwx._internal.dns_inwx import _is_transient_status
+from certbot_dns_inwx._internal.dns_inwx import _needs_negative_ttl
+from certbot_dns_inwx._internal.dns_inwx import _orphan_deleted
+from certbot_dns_inwx._internal.dns_inwx import _RateLimiter
+from certbot_dns_inwx._internal.dns_inwx import _retry_delay
+from certbot_dns_inwx._internal.dns_inwx import _RetryBudget
+from certbot_dns_inwx._internal.dns_inwx import _soa_negative_ttl
+from certbot_dns_inwx._internal.dns_inwx import _TransientError
+from certbot_dns_inwx._internal.dns_inwx import _ZoneIndex
+from certbot_dns_inwx._internal.dns_inwx import _ZoneListing
+from certbot_dns_inwx._internal.journal import Journal
+from certbot_dns_inwx._internal.lru import LRUCache
+from certbot_dns_inwx._internal.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncINWXClient:
+    """
+    Encapsulates all communication with the INWX API without blocking the event loop.
+
+    The client offers the operations of the synchronous client: log in, look up zones and add
+    and delete TXT records, one at a time or in batches. At most `max_workers` requests are in
+    flight at the same time. Like the synchronous client, it shares its error handling, retry
+    budget and circuit breaker, and logs in again once if its session is rejected. Existing
+    records are not reconciled and no session store is used. A batch of records which is
+    cancelled while being added is rolled back, and deletions run to completion even if the task
+    awaiting them is cancelled.
+    """
+
+    def __init__(self, url: str, username: str, password: str, secret: str,
+                 max_workers: int = 1, rate_limit: float = 0, metrics: Optional[Metrics] = None,
+                 max_retries: int = 0, connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None, journal: Optional[Journal] = None,
+                 cache: Optional[PersistentCache] = None) -> None:
+        # Ensure compatibility with configurations for the old API interface
+        if url.endswith('/'):
+            url = url[:-1]
+        if url.endswith('xmlrpc'):
+            url = url[:-6]
+
+        self.url = url
+        self.username = username
+        self.password = password
+        self.secret = secret
+        self.max_workers = max(1, max_workers or 1)
+        self.rateLimiter = _RateLimiter(rate_limit)
+        self.circuitBreaker = _CircuitBreaker()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.max_retries = max_retries
+        self.retryBudget = _RetryBudget(_INWXClient.RETRY_BUDGET, _INWXClient.RETRY_BUDGET_REFILL)
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout or None, sock_read=read_timeout or None)
+        self.journal = journal
+        self.journalRecovered = False
+        self.cache = cache
+        self.recordCache = LRUCache('record', max_entries=4096, metrics=self.metrics)
+        self.recordIds = {}
+        self.negativeTtls = {}
+        self.zoneIndex = None
+        self.zoneIndexLock = None
+        self.semaphore = None
+        self.session = None
+        self.sessionLock = None
+        self.sessionGeneration = 0
+        self.sessionRenewed = False
+        self.sessionRejected = False
+
+    async def __aenter__(self) -> 'AsyncINWXClient':
+        try:
+            await self.login()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, *unused_args) -> None:
+        await self.close()
+
+    async def login(self) -> None:
+        """
+        Log in to the API, opening the HTTP session if necessary.
+
+        Zones cached on disk are loaded when the HTTP session is opened.
+
+        :raises certbot.errors.PluginError: if the login fails
+        """
+
+        if self.session is None:
+            # Created here, as they need to belong to the running event loop
+            self.semaphore = asyncio.Semaphore(self.max_workers)
+            self.zoneIndexLock = asyncio.Lock()
+            self.sessionLock = asyncio.Lock()
+            if self.cache is not None and self.zoneIndex is None:
+                # Reads the cache file on first use
+                zones = await asyncio.get_running_loop().run_in_executor(None, self.cache.get, 'zones')
+                self.metrics.cache_lookup('persistent_zones', isinstance(zones, list))
+                if isinstance(zones, list):
+                    self.zoneIndex = _ZoneIndex(zones, cached=True)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_workers), timeout=self.timeout,
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                headers={'Content-Type': 'text/xml; charset=UTF-8',
+                         'User-Agent': f'DomRobot/{ApiClient.CLIENT_VERSION} (Python aiohttp)'})
+
+        try:
+            login_result = await self._send('account.login', {'lang': 'en', 'user': self.username,
+                                                              'pass': self.password})
+            if login_result['code'] == 1000 and login_result.get('resData', {}).get('tfa', '0') != '0':
+                if not self.secret:
+                    raise Exception('Api requests two factor challenge but no shared secret is given.')
+                login_result = await self._send('account.unlock', {'tan': ApiClient.get_secret_code(self.secret)})
+        except Exception as err:
+            raise errors.PluginError(f'INWX login failed: {err}')
+        if login_result['code'] != 1000:
+            raise errors.PluginError(f"INWX login failed: {login_result['msg']}")
+        self.sessionRejected = False
+
+    async def close(self) -> None:
+        """
+        Close the HTTP session. The API session is left to expire, like that of the synchronous client.
+        """
+
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def add_txt_record(self, source: str, record_name: str, record_content: str, record_ttl: int) -> None:
+        """
+        Add a TXT record using the supplied information.
+
+        :raises certbot.errors.PluginError: if an error occurs communicating with the DNS server
+        """
+
+        await self.add_txt_records([(source, record_name, record_content, record_ttl)])
+
+    async def add_txt_records(self, records: List[Tuple[str, str, str, int]]) -> None:
+        """
+        Add multiple TXT records at once, grouped by their base domain.
+
+        The base domain and negative caching TTL of every zone are only looked up once. A failure
+        on a single record does not prevent the remaining records from being added; all failures
+        are reported together. If the batch is cancelled, the requests already sent are awaited
+        and all records of the batch are deleted again before the cancellation is propagated.
+
+        :param list records: Tuples of (source, record_name, record_content, record_ttl).
+        :raises certbot.errors.PluginError: if any of the records could not be added
+        """
+
+        await self._recover_leftovers()
+        failures = []
+        names = list(dict.fromkeys(record[1] for record in records))
+        domains = dict(zip(names, await asyncio.gather(*(self._find_domain(name) for name in names),
+                                                       return_exceptions=True)))
+        grouped = {}
+        for record in records:
+            domain = domains[record[1]]
+            if isinstance(domain, Exception):
+                failures.append(f'{record[1]} for {record[0]}: {domain}')
+            else:
+                grouped.setdefault(domain, []).append(record)
+        negative_ttls = dict(zip(grouped, await asyncio.gather(
+            *(self._negative_ttl(domain, [record[3] for record in zone_records])
+              for domain, zone_records in grouped.items()))))
+
+        ttls = {domain: _choose_ttls(domain, {record[3] for record in zone_records}, negative_ttls[domain])
+                for domain, zone_records in grouped.items()}
+        tasks = [(domain, record) for domain, zone_records in grouped.items() for record in zone_records]
+        creates = [asyncio.ensure_future(self._create_txt_record(
+            domain, record_name, record_content, ttls[domain][record_ttl]))
+            for domain, (_, record_name, record_content, record_ttl) in tasks]
+        try:
+            results = await asyncio.shield(asyncio.gather(*creates, return_exceptions=True))
+        except asyncio.CancelledError:
+            logger.debug('Adding TXT records has been cancelled, removing the records of the batch')
+            await asyncio.shield(self._roll_back(creates, [record for _, record in tasks]))
+            raise
+
+        for (_, (source, record_name, _, _)), result in zip(tasks, results):
+            if isinstance(result, Exception):
+                self.recordCache.invalidate(record_name)
+                failures.append(f'{record_name} for {source}: {result}')
+        if failures:
+            raise errors.PluginError('Failed to add TXT DNS record(s): ' + '; '.join(failures))
+
+    async def _roll_back(self, creates: List['asyncio.Future'], records: list) -> None:
+        """
+        Wait for the given record creations to finish and delete the records they created.
+        """
+
+        results = await asyncio.gather(*creates, return_exceptions=True)
+        deletions = []
+        for (_, record_name, record_content, _), record_id in zip(records, results):
+            if isinstance(record_id, BaseException) or record_id is None:
+                continue
+            ids = self.recordIds.get((record_name, record_content), [])
+            if record_id in ids:
+                ids.remove(record_id)
+            if not ids:
+                self.recordIds.pop((record_name, record_content), None)
+            deletions.append(self._delete_record(record_id))
+        for result in await asyncio.gather(*deletions, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning('Unable to remove a TXT record of a cancelled batch: %s', result)
+
+    async def _recover_leftovers(self) -> None:
+        """
+        Delete the records journaled by runs which have been interrupted before their cleanup.
+
+        As existing records are not reconciled, records matching one to add are deleted as well
+        and created again. This happens once per client.
+        """
+
+        if self.journal is None or self.journalRecovered:
+            return
+        self.journalRecovered = True
+        leftovers = await self._journal('leftovers')
+        if leftovers:
+            logger.info('Deleting %d TXT record(s) left over by interrupted runs', len(leftovers))
+            await self._delete_orphans(leftovers)
+            await self._journal('compact')
+
+    async def _delete_orphans(self, records: List[dict]) -> None:
+        """
+        Delete left over TXT records. Failures are only logged.
+        """
+
+        results = await asyncio.gather(*(self._call_api('nameserver.deleteRecord', {'id': record['id']})
+                                         for record in records), return_exceptions=True)
+        for record, result in zip(records, results):
+            err = result if isinstance(result, Exception) else None
+            if _orphan_deleted(record, err, self.metrics) and self.journal is not None:
+                await self._journal('deleted', record['id'])
+
+    async def _create_txt_record(self, domain: str, record_name: str, record_content: str,
+                                 record_ttl: int) -> Optional[int]:
+        """
+        Create a TXT record in the given zone and remember its ID for the deletion.
+
+        If the zone was taken from the persistent cache and the creation fails, the zone index
+        is refreshed and the creation retried once in case the cached zone was outdated.
+
+        :returns: The ID of the record, if reported by the API.
+        """
+
+        params = {'domain': domain, 'name': record_name, 'type': 'TXT', 'content': record_content,
+                  'ttl': record_ttl}
+        try:
+            result = await self._call_api('nameserver.createRecord', params)
+        except Exception:
+            live = await self._revalidate_domain(record_name, domain)
+            if live is None:
+                raise
+            logger.debug('Cached zone %s for %s is outdated, retrying with %s', domain, record_name, live)
+            self.metrics.increment('retries_total', reason='stale_zone')
+            params = dict(params, domain=live)
+            result = await self._call_api('nameserver.createRecord', params)
+
+        if 'id' not in result:
+            return None
+        self.recordIds.setdefault((record_name, record_content), []).append(result['id'])
+        if self.journal is not None:
+            await self._journal('created', params['domain'], record_name, record_content, result['id'])
+        return result['id']
+
+    async def _negative_ttl(self, domain: str, record_ttls: Iterable[int]) -> Optional[int]:
+        """
+        Return how long resolvers may cache negative answers of the zone, fetched once per zone.
+
+        It is not fetched (and None returned) if it cannot lower any of the requested TTLs.
+        """
+
+        if not _needs_negative_ttl(record_ttls):
+            return None
+        if domain not in self.negativeTtls:
+            try:
+                self.negativeTtls[domain] = _soa_negative_ttl(
+                    await self._call_api('nameserver.info', {'domain': domain, 'type': 'SOA'}))
+            except Exception as err:
+                logger.debug('Unable to determine the negative caching TTL of %s: %s', domain, err)
+                self.negativeTtls[domain] = None
+        return self.negativeTtls[domain]
+
+    async def del_txt_record(self, source: str, record_name: str, record_content: str) -> None:
+        """
+        Delete a TXT record using the supplied information.
+
+        :raises certbot.errors.PluginError: if an error occurs communicating with the DNS server
+        """
+
+        try:
+            ids = self.recordIds.get((record_name, record_content))
+            record_id = ids.pop() if ids else None
+            if not ids:
+                self.recordIds.pop((record_name, record_content), None)
+            if record_id is None and self.journal is not None:
+                # The record may have been created by an earlier run
+                entry = await self._journal('find', record_name, record_content)
+                record_id = entry['id'] if entry is not None else None
+            if record_id is None:
+                # The record has not been created by this client, so its ID needs to be looked up
+                domain = await self._find_domain(record_name)
+                record_id = _found_record_id(await self._call_api(
+                    'nameserver.info', {'domain': domain, 'name': record_name, 'content': record_content}))
+
+            await self._delete_record(record_id)
+        except Exception as err:
+            self.recordCache.invalidate(record_name)
+            raise errors.PluginError(
+                f'Failed to delete TXT DNS record {record_name} for {source}: {err}')
+
+    async def del_txt_records(self, records: List[Tuple[str, str, str]]) -> None:
+        """
+        Delete multiple TXT records at once.
+
+        A failure on a single record does not prevent the remaining records from being deleted;
+        all failures are reported together. The deletions are completed even if the awaiting
+        task is cancelled.
+
+        :param list records: Tuples of (source, record_name, record_content).
+        :raises certbot.errors.PluginError: if any of the records could not be deleted
+        """
+
+        results = await asyncio.shield(asyncio.gather(*(self.del_txt_record(*record) for record in records),
+                                                      return_exceptions=True))
+        if self.journal is not None:
+            await self._journal('compact')
+        failures = [str(result) for result in results if isinstance(result, Exception)]
+        if failures:
+            raise errors.PluginError('; '.join(failures))
+
+    async def _delete_record(self, record_id: int) -> None:
+        await self._call_api('nameserver.deleteRecord', {'id': record_id})
+        if self.journal is not None:
+            await self._journal('deleted', record_id)
+
+    async def _journal(self, operation: str, *args: Any) -> Any:
+        """
+        Run an operation of the journal, which writes and syncs files under a lock, in a thread.
+        """
+
+        return await asyncio.get_running_loop().run_in_executor(None, getattr(self.journal, operation), *args)
+
+    async def _find_domain(self, record_name: str) -> str:
+        """
+        Find the base domain name for a given domain name.
+
+        The base domain is looked up in the index of all zones of the account, which is
+        fetched once and only refreshed if a lookup misses.
+
+        :raises certbot.errors.PluginError: if no matching domain is found.
+        """
+
+        domain = self.recordCache.get(record_name)
+        if domain is not None:
+            return domain
+
+        with self.metrics.timed('zone_lookup_duration_seconds'):
+            index = self.zoneIndex
+            domain = index.lookup(record_name) if index is not None else None
+            self.metrics.cache_lookup('zone_index', domain is not None)
+            if domain is None:
+                logger.debug('No zone known for %s, refreshing zone index...', record_name)
+                try:
+                    domain = (await self._refresh_zone_index(index)).lookup(record_name)
+                except Exception as err:
+                    raise errors.PluginError(f'Unable to determine base domain for {record_name}: {err}')
+            if domain is None:
+                raise errors.PluginError(
+                    f'Unable to determine base domain for {record_name}: no matching domain found')
+
+        self.recordCache.set(record_name, domain)
+        return domain
+
+    async def _refresh_zone_index(self, stale: Optional[_ZoneIndex]) -> _ZoneIndex:
+        """
+        Replace the zone index unless another task already replaced the given stale one.
+        """
+
+        async with self.zoneIndexLock:
+            if self.zoneIndex is stale:
+                listing = _ZoneListing(_INWXClient.ZONE_PAGE_LIMIT)
+                while listing.add(await self._call_api('nameserver.list', listing.params())):
+                    pass
+                self.zoneIndex = _ZoneIndex(listing.zones)
+                if self.cache is not None:
+                    self.cache.set('zones', listing.zones)
+            return self.zoneIndex
+
+    async def _revalidate_domain(self, record_name: str, domain: str) -> Optional[str]:
+        """
+        Determine the base domain of a record again using a live zone index.
+
+        :returns: The live base domain if it differs from `domain`, otherwise None.
+        """
+
+        index = self.zoneIndex
+        if index is not None and index.cached:
+            index = await self._refresh_zone_index(index)
+        live = index.lookup(record_name) if index is not None else None
+        if live is None or live == domain:
+            return None
+        self.recordCache.set(record_name, live)
+        return live
+
+    async def _call_api(self, api_method: str, method_params: dict = None) -> dict:
+        attempt = 0
+        while True:
+            try:
+                return await self._call_api_once(api_method, method_params)
+            except _TransientError as err:
+                if attempt >= self.max_retries or not self.retryBudget.take():
+                    raise Exception(f'INWX API request failed: {err}')
+                delay = _retry_delay(attempt)
+                logger.debug('INWX API request %s failed (%s), retrying in %.1f seconds', api_method, err, delay)
+                self.metrics.increment('retries_total', reason='transient')
+                await asyncio.sleep(delay)
+                attempt += 1
+            except Exception as err:
+                raise Exception(f'INWX API request failed: {err}')
+
+    async def _call_api_once(self, api_method: str, method_params: dict = None) -> dict:
+        """
+        Perform a single API request.
+
+        :raises _TransientError: if the request failed in a way that may succeed when retried
+        """
+
+        generation = self.sessionGeneration
+        result = await self._send(api_method, method_params)
+        if result['code'] == _INWXClient.AUTHENTICATION_ERROR and await self._renew_session(generation):
+            self.metrics.increment('retries_total', reason='session_expired')
+            result = await self._send(api_method, method_params)
+        if result['code'] == _INWXClient.AUTHENTICATION_ERROR:
+            self.sessionRejected = True
+        elif result['code'] == 1000:
+            self.sessionRenewed = False
+        return _api_result(result)
+
+    async def _renew_session(self, generation: int) -> bool:
+        """
+        Log in again if the session has been rejected, e.g. because it expired.
+
+        A session is only renewed if it has been used successfully since the last renewal, so a
+        login which is not accepted by the other methods is not repeated for every request.
+
+        :param int generation: The session generation the rejected request was sent with.
+        :returns: Whether a new session has been established since that request.
+        :rtype: bool
+        """
+
+        async with self.sessionLock:
+            if self.sessionGeneration != generation:
+                return True
+            if self.sessionRenewed:
+                return False
+            logger.debug('INWX API session has been rejected, logging in again')
+            self.sessionRenewed = True
+            self.session.cookie_jar.clear()
+            try:
+                await self.login()
+            except errors.PluginError:
+                self.sessionRejected = True
+                raise
+            self.sessionGeneration += 1
+            return True
+
+    async def _send(self, api_method: str, method_params: dict = None) -> dict:
+        """
+        Send a single rate limited request to the API and record its duration and result code.
+
+        Requests are refused while the circuit breaker is open. Transport failures are raised
+        as `_TransientError` if the request can safely be repeated.
+        """
+
+        payload = xmlrpc.client.dumps((method_params or {},), api_method, encoding='UTF-8').replace('\n', '')
+        async with self.semaphore:
+            trial = self.circuitBreaker.check()
+            code = 'exception'
+            start = time.monotonic()
+            try:
+                wait = self.rateLimiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                start = time.monotonic()
+                async with self.session.post(self.url + ApiType.XML_RPC, data=payload.encode('UTF-8')) as response:
+                    if _is_transient_status(api_method, response.status):
+                        raise _TransientError(f'HTTP status {response.status}')
+                    response.raise_for_status()
+                    result = xmlrpc.client.loads(await response.text())[0][0]
+                code = result['code']
+                return result
+            except aiohttp.ClientConnectorError as err:
+                # The request never reached the server
+                raise _TransientError(str(err))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                if api_method in _INWXClient.NON_IDEMPOTENT_METHODS:
+                    raise
+                raise _TransientError(str(err) or type(err).__name__)
+            finally:
+                self.metrics.observe('api_request_duration_seconds', time.monotonic() - start, method=api_method)
+                self.metrics.increment('api_requests_total', method=api_method, code=code)
+                self.circuitBreaker.record(code not in _INWXClient.TRANSIENT_ERRORS and code != 'exception', trial)
+
+
+class EventLoopThread:
+    """
+    Runs an event loop in a background thread, so synchronous code can run coroutines on it.
+
+    Clients bound to the loop can thereby be kept across several synchronous calls.
+    """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+        async def create_lock():
+            return asyncio.Lock()
+
+        # Serializes the creation of clients; created on the loop, as it needs to belong to it
+        self.clientLock = self.run(create_lock())
+
+    def submit(self, coroutine: Coroutine[Any, Any, Any]) -> 'concurrent.futures.Future':
+        """
+        Schedule a coroutine on the loop without waiting for it, also from within the loop.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine: Coroutine[Any, Any, Any]) -> Any:
+        """
+        Run a coroutine on the loop and wait for its result.
+
+        If waiting is interrupted, e.g. by a KeyboardInterrupt, the coroutine is cancelled.
+        """
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
@@ -0,0 +1,154 @@
+"""Persistent on-disk cache shared across certbot runs."""
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from certbot.compat import filesystem
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class PersistentCache:
+    """
+    A small key/value store persisted as a JSON file.
+
+    Every entry carries its own expiry time. Changes are kept in memory and written by
+    :meth:`flush`, which merges them with the current file content while holding an exclusive
+    lock, so concurrent certbot runs on the same host do not lose each other's entries.
+    A missing, corrupt or incompatible file is treated like an empty cache.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, ttl: float, max_entries: int = 10000) -> None:
+        """
+        :param str path: Path of the cache file. Its directory is created if necessary.
+        :param float ttl: Default number of seconds an entry stays valid.
+        :param int max_entries: Maximum number of entries kept; the oldest ones are evicted first.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = None
+        self.changes = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the value stored for the given key or None if it is unknown or has expired.
+        """
+        with self.lock:
+            if self.entries is None:
+                self.entries = self._read()
+            entry = self.entries.get(key)
+        if entry is None or entry['expires'] <= time.time():
+            return None
+        return entry['value']
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a JSON serializable value for the given key.
+
+        :param float ttl: Number of seconds the entry stays valid, defaults to the cache TTL.
+        """
+        now = time.time()
+        entry = {'value': value, 'stored': now, 'expires': now + (self.ttl if ttl is None else ttl)}
+        with self.lock:
+            if self.entries is None:
+                self.entries = self._read()
+            self.entries[key] = entry
+            self.changes[key] = entry
+
+    def invalidate(self, key: str) -> None:
+        """
+        Remove the entry for the given key.
+        """
+        with self.lock:
+            if self.entries is not None:
+                self.entries.pop(key, None)
+            self.changes[key] = None
+
+    def flush(self) -> None:
+        """
+        Write all pending changes to disk.
+
+        Failures are logged but never raised, as the cache is merely an optimization.
+        """
+        with self.lock:
+            if not self.changes:
+                return
+            try:
+                if not os.path.isdir(os.path.dirname(self.path)):
+                    filesystem.makedirs(os.path.dirname(self.path), 0o700)
+                with self._locked():
+                    entries = self._read()
+                    for key, entry in self.changes.items():
+                        if entry is None:
+                            entries.pop(key, None)
+                        else:
+                            entries[key] = entry
+                    entries = self._evict(entries)
+                    self._write(entries)
+                self.entries = entries
+                self.changes = {}
+            except OSError as err:
+                logger.warning('Unable to write cache file %s: %s', self.path, err)
+
+    def _evict(self, entries: Dict[str, dict]) -> Dict[str, dict]:
+        now = time.time()
+        entries = {key: entry for key, entry in entries.items() if entry['expires'] > now}
+        if len(entries) > self.max_entries:
+            newest = sorted(entries.items(), key=lambda item: item[1]['stored'], reverse=True)
+            entries = dict(newest[:self.max_entries])
+        return entries
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, 'r') as file:
+                content = json.load(file)
+            if content.get('version') != self.VERSION:
+                raise ValueError(f"unsupported version {content.get('version')}")
+            return {key: entry for key, entry in content['entries'].items()
+                    if isinstance(entry, dict) and 'value' in entry
+                    and isinstance(entry.get('expires'), (int, float))
+                    and isinstance(entry.get('stored'), (int, float))}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as err:
+            logger.debug('Ignoring unusable cache file %s: %s', self.path, err)
+            return {}
+
+    def _write(self, entries: Dict[str, dict]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.cache-')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump({'version': self.VERSION, 'entries': entries}, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        if fcntl is None:  # pragma: no cover
+            yield
+            return
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
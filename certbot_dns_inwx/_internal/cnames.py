@@ -0,0 +1,141 @@
+"""Concurrent resolution of CNAME chains on validation records.
+
+This module requires the optional dependency dnspython.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, Union
+
+import dns.asyncresolver
+import dns.exception
+import dns.name
+import dns.rdatatype
+import dns.resolver
+from certbot import errors
+
+from certbot_dns_inwx._internal.lru import LRUCache
+from certbot_dns_inwx._internal.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CNAMEResolver:
+    """
+    Follows CNAME chains of many names concurrently using a single resolver.
+
+    Both existing CNAMEs and their absence (NXDOMAIN or no CNAME record) are cached
+    for the TTL given by the DNS, so chains sharing intermediate names are only
+    resolved once. The cache is bounded in size, so long-running processes do not
+    keep every name they ever resolved.
+    """
+
+    MAX_HOPS = 10
+    NEGATIVE_TTL = 60
+
+    def __init__(self, resolver: Optional[dns.asyncresolver.Resolver] = None, max_entries: int = 4096,
+                 metrics: Optional[Metrics] = None) -> None:
+        """
+        :param int max_entries: Maximum number of names whose CNAME (or its absence) is cached.
+        :param Metrics metrics: Metrics to count the lookups and evictions of the cache in.
+        """
+        self.resolver = resolver if resolver is not None else dns.asyncresolver.Resolver()
+        # Maps names to their CNAME target (None if there is none) and when it expires
+        self.cache = LRUCache('cname', max_entries=max_entries, metrics=metrics)
+
+    def resolve_all(self, names: Iterable[str]) -> Dict[str, Union[str, Exception]]:
+        """
+        Follow the CNAME chains of all given names concurrently.
+
+        :param list names: The names to resolve.
+        :returns: A mapping of each name to the final name of its chain, or to the
+                  `~certbot.errors.PluginError` raised while resolving it.
+        :rtype: dict
+        """
+        names = list(dict.fromkeys(names))
+
+        async def resolve():
+            inflight = {}
+            return await asyncio.gather(*(self._follow(name, inflight) for name in names), return_exceptions=True)
+
+        return dict(zip(names, asyncio.run(resolve())))
+
+    def ttl(self, validation_name: str) -> float:
+        """
+        Return the number of seconds the resolved chain of a name stays valid.
+
+        This is the smallest remaining TTL of the links of the chain, including the absence of a
+        CNAME at its end, or 0 if the chain is not cached completely.
+        """
+        now = time.monotonic()
+        name = dns.name.from_text(validation_name)
+        seen = {name}
+        expires = None
+        for _ in range(self.MAX_HOPS):
+            try:
+                target, name_expires = self.cache[name]
+            except KeyError:
+                return 0
+            expires = name_expires if expires is None else min(expires, name_expires)
+            if target is None or target in seen:
+                break
+            seen.add(target)
+            name = target
+        return expires - now
+
+    async def _follow(self, validation_name: str, inflight: dict) -> str:
+        name = dns.name.from_text(validation_name)
+        seen = {name}
+        for _ in range(self.MAX_HOPS):
+            target = await self._lookup(name, inflight)
+            if target is None:
+                break
+            if target in seen:
+                logger.warning('CNAME loop detected on %s at %s', validation_name, target.to_text(True))
+                break
+            seen.add(target)
+            name = target
+        return name.to_text(True)
+
+    async def _lookup(self, name: dns.name.Name, inflight: dict) -> Optional[dns.name.Name]:
+        """
+        Return the CNAME target of a single name, sharing concurrent queries for the same name.
+        """
+        cached = self.cache.get(name)
+        if cached is not None:
+            return cached[0]
+        if name not in inflight:
+            inflight[name] = asyncio.ensure_future(self._query(name))
+        return await inflight[name]
+
+    async def _query(self, name: dns.name.Name) -> Optional[dns.name.Name]:
+        try:
+            answer = await self.resolver.resolve(name, dns.rdatatype.CNAME)
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN) as err:
+            ttl = self._negative_ttl(err)
+            self.cache.set(name, (None, time.monotonic() + ttl), ttl)
+            return None
+        except (dns.exception.Timeout, dns.resolver.YXDOMAIN, dns.resolver.NoNameservers) as err:
+            raise errors.PluginError(f'Failed to lookup CNAME\'s on {name.to_text(True)}: {err}')
+
+        target = answer[0].target if len(answer) >= 1 else None
+        ttl = answer.rrset.ttl if answer.rrset is not None else self.NEGATIVE_TTL
+        self.cache.set(name, (target, time.monotonic() + ttl), ttl)
+        return target
+
+    def _negative_ttl(self, err: dns.exception.DNSException) -> int:
+        """
+        Determine how long the absence of a CNAME may be cached from the SOA record of the response.
+        """
+        try:
+            if isinstance(err, dns.resolver.NXDOMAIN):
+                responses = list(err.responses().values())
+            else:
+                responses = [err.response()]
+        except (AttributeError, KeyError, TypeError):
+            return self.NEGATIVE_TTL
+        for response in responses:
+            for rrset in getattr(response, 'authority', []):
+                if rrset.rdtype == dns.rdatatype.SOA:
+                    return min(rrset.ttl, rrset[0].minimum)
+        return self.NEGATIVE_TTL
@@ -0,0 +1,274 @@
+"""Long-running daemon performing dns-01 challenges on behalf of many certbot processes.
+
+The daemon keeps one authenticated INWX API session and its zone and CNAME caches warm. Plugins
+configured with ``--dns-inwx-daemon-socket`` hand their challenges to it over a Unix socket,
+speaking one JSON object per line in both directions.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from certbot import errors
+
+from certbot_dns_inwx._internal import standalone
+from certbot_dns_inwx._internal.dns_inwx import Authenticator
+
+logger = logging.getLogger(__name__)
+
+Challenge = Tuple[str, str, str]
+
+
+class _Request:
+    """
+    A perform request waiting to be processed as part of a batch.
+    """
+
+    def __init__(self, challenges: List[Challenge], propagation_seconds: Optional[int]) -> None:
+        self.challenges = challenges
+        self.propagation_seconds = propagation_seconds
+        self.records = []
+        self.error = None
+        self.done = threading.Event()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            # The connection has been closed without a request, e.g. by a starting daemon probing the socket
+            return
+        try:
+            request = json.loads(line)
+            challenges = [tuple(challenge) for challenge in request.get('challenges', [])]
+            if request.get('action') == 'perform':
+                self.server.daemon.perform(challenges, request.get('propagation_seconds'))
+            elif request.get('action') == 'cleanup':
+                self.server.daemon.cleanup(challenges)
+            else:
+                raise ValueError(f"unknown action {request.get('action')!r}")
+            response = {'ok': True}
+        except Exception as err:
+            response = {'ok': False, 'error': str(err)}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class ChallengeDaemon:
+    """
+    Serves perform and cleanup requests of plugins over a Unix socket.
+
+    Perform requests arriving while a batch is added, or within `coalesce_delay` of each other,
+    are combined into a single batch, so every zone is only looked up and listed once. As soon as
+    the records of a batch exist, the next batch is collected while every request waits for the
+    propagation of its own records up to its own deadline, so the requests of a batch wait at
+    the same time and no request waits for the propagation of another batch. Cleanup requests
+    are served immediately.
+    """
+
+    def __init__(self, authenticator: Authenticator, socket_path: str, coalesce_delay: float = 0.1) -> None:
+        self.authenticator = authenticator
+        self.socket_path = socket_path
+        self.coalesce_delay = coalesce_delay
+        self.pending = []
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.server = None
+        self.threads = []
+
+    def start(self) -> 'ChallengeDaemon':
+        """
+        Bind the socket, only accessible to the current user, and start serving in background threads.
+
+        :raises certbot.errors.Error: if another daemon is already listening on the socket
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except FileNotFoundError:
+                pass
+            except ConnectionRefusedError:
+                if stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                    # A left over socket of a daemon which is not running anymore
+                    os.unlink(self.socket_path)
+            else:
+                raise errors.Error(f'Another challenge daemon is already listening on {self.socket_path}')
+        old_umask = os.umask(0o177)
+        try:
+            self.server = _Server(self.socket_path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon = self
+        self.threads = [threading.Thread(target=self.server.serve_forever, daemon=True),
+                        threading.Thread(target=self._run, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        logger.info('Listening on %s', self.socket_path)
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and remove the socket.
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+        for thread in self.threads:
+            thread.join()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def perform(self, challenges: List[Challenge], propagation_seconds: Optional[int] = None) -> None:
+        """
+        Add the validation records of the challenges and wait for them to propagate.
+
+        :param list challenges: Tuples of (domain, validation_name, validation).
+        :param int propagation_seconds: Seconds to wait, defaults to those of the daemon.
+        :raises certbot.errors.PluginError: if the records could not be added
+        """
+        request = _Request(challenges, propagation_seconds)
+        with self.condition:
+            if self.stopping:
+                raise errors.PluginError('The challenge daemon is shutting down')
+            self.pending.append(request)
+            self.condition.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        try:
+            self.authenticator._wait_for_propagation(request.records, request.propagation_seconds)
+        except Exception as err:
+            logger.warning('Waiting for the propagation failed: %s', err)
+
+    def cleanup(self, challenges: List[Challenge]) -> None:
+        """
+        Remove the validation records of the challenges.
+
+        The metrics are written to the metrics file afterwards, like at the end of a certbot run.
+
+        :param list challenges: Tuples of (domain, validation_name, validation).
+        :raises certbot.errors.PluginError: if any of the records could not be deleted
+        """
+        try:
+            self.authenticator._remove_challenges(challenges)
+        finally:
+            self.authenticator._write_metrics()
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    for request in self.pending:
+                        request.error = errors.PluginError('The challenge daemon is shutting down')
+                        request.done.set()
+                    return
+            time.sleep(self.coalesce_delay)
+            with self.condition:
+                batch, self.pending = self.pending, []
+            self._process(batch)
+
+    def _process(self, batch: List[_Request]) -> None:
+        """
+        Add the records of all requests of a batch at once and hand every request its records.
+
+        If the batch fails, its requests are repeated one by one to find out which of them
+        failed. Records already added by the batch are then reused instead of created again.
+        """
+        logger.info('Performing %d challenge(s) of %d request(s)',
+                    sum(len(request.challenges) for request in batch), len(batch))
+        try:
+            records = self.authenticator._add_challenges([challenge for request in batch
+                                                          for challenge in request.challenges])
+        except Exception as err:
+            if len(batch) == 1:
+                batch[0].error = err
+                batch[0].done.set()
+                return
+            for request in batch:
+                try:
+                    request.records = self.authenticator._add_challenges(request.challenges)
+                except Exception as request_err:
+                    request.error = request_err
+                request.done.set()
+            return
+
+        # The records are in the order of the challenges of the requests
+        offset = 0
+        for request in batch:
+            request.records = records[offset:offset + len(request.challenges)]
+            offset += len(request.challenges)
+            request.done.set()
+
+
+class DaemonClient:
+    """
+    Hands challenges to a running daemon.
+    """
+
+    def __init__(self, socket_path: str) -> None:
+        self.socket_path = socket_path
+
+    def request(self, action: str, **params) -> None:
+        """
+        Send a request and wait for the daemon to complete it.
+
+        :raises certbot.errors.PluginError: if the daemon is unreachable or the request failed
+        """
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps(dict(params, action=action)).encode('utf-8') + b'\n')
+                with sock.makefile('rb') as file:
+                    response = json.loads(file.readline() or b'{}')
+        except (OSError, ValueError) as err:
+            raise errors.PluginError(f'Unable to reach the challenge daemon at {self.socket_path}: {err}')
+        if not response.get('ok'):
+            raise errors.PluginError(f"Challenge daemon failed to {action}: {response.get('error')}")
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Perform INWX dns-01 challenges on behalf of certbot processes '
+                                                 'configured with --dns-inwx-daemon-socket.')
+    parser.add_argument('--socket', required=True, help='Path of the Unix socket to listen on.')
+    standalone.add_arguments(parser)
+    parsed = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        authenticator = standalone.make_authenticator(parsed, 'socket')
+        authenticator._setup_credentials()
+        authenticator._get_inwx_client()
+    except errors.Error as err:
+        logger.error('%s', err)
+        return 1
+
+    try:
+        daemon = ChallengeDaemon(authenticator, parsed.socket).start()
+    except errors.Error as err:
+        logger.error('%s', err)
+        return 1
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *unused_args: stop.set())
+    stop.wait()
+    daemon.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
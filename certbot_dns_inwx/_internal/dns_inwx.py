@@ -1,14 +1,31 @@
 """DNS Authenticator using INWX XML-RPC DNS API."""
+import hashlib
+import importlib.util
 import logging
 import os.path
+import random
 import sys
-from typing import Callable
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-from INWX.Domrobot import ApiClient
+import requests
+from acme import challenges
+from certbot import achallenges
 from certbot import errors
 from certbot.compat import misc
+from certbot.display import util as display_util
 from certbot.plugins import dns_common
 
+from certbot_dns_inwx._internal.lru import LRUCache
+from certbot_dns_inwx._internal.metrics import Metrics
+
+if TYPE_CHECKING:
+    from certbot_dns_inwx._internal.aio import AsyncINWXClient, EventLoopThread
+    from certbot_dns_inwx._internal.cache import PersistentCache
+    from certbot_dns_inwx._internal.journal import Journal
+    from certbot_dns_inwx._internal.session import SessionStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,8 +39,27 @@ class Authenticator(dns_common.DNSAuthenticator):
                    'using INWX for your domains).')
     ttl = 300
 
-    clientCache = {}
-    nameCache = {}
+    metrics = Metrics()
+    clientCache = LRUCache('client', max_entries=16, ttl=3600, metrics=metrics,
+                           on_evict=lambda key, client: Authenticator._discard_client(key, client))
+    clientLock = threading.Lock()
+    # Number of authenticators holding each client, and the asynchronous clients dropped from the
+    # client cache while held, which are closed once released
+    clientUsers = {}
+    discardedClients = set()
+    clientUsersLock = threading.Lock()
+    nameCache = LRUCache('validation_name', max_entries=4096, metrics=metrics)
+    persistentCache = {}
+    cnameResolver = None
+    eventLoop = None
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.credentials: Optional[dns_common.CredentialsConfiguration] = None
+        # Names the validation records have been placed at, kept until their cleanup
+        self.resolvedNames: Dict[str, str] = {}
+        # Clients the validation records have been placed with, held until their cleanup
+        self.clients: Dict[str, Any] = {}
 
     @classmethod
     def add_parser_arguments(cls, add: Callable[..., None], default_propagation_seconds: int = 60) -> None:
@@ -34,15 +70,89 @@ class Authenticator(dns_common.DNSAuthenticator):
             cfg_default = os.path.join(misc.get_default_folder('config'), 'inwx.cfg')
         add('credentials', help='Path to INWX account credentials INI file.',
             default=cfg_default)
+        add('ttl',
+            type=int,
+            help='TTL of the validation records in seconds. It is lowered to the negative caching TTL of '
+                 'the zone if that is smaller, but never below the minimum TTL of INWX.',
+            default=cls.ttl)
+        add('zone-ttl',
+            help='Comma separated TTLs of the validation records of individual zones or zone suffixes, '
+                 'overriding --dns-inwx-ttl, e.g. "example.com=600,example.org=300".',
+            default=None)
+        add('max-workers',
+            type=int,
+            help='Maximum number of INWX API requests for independent records performed concurrently.',
+            default=4)
+        add('rate-limit',
+            type=float,
+            help='Maximum number of INWX API requests per second (0 to disable).',
+            default=10)
+        add('connect-timeout',
+            type=float,
+            help='Number of seconds to wait for a connection to the INWX API (0 to wait indefinitely).',
+            default=10)
+        add('read-timeout',
+            type=float,
+            help='Number of seconds to wait for a response of the INWX API (0 to wait indefinitely).',
+            default=60)
+        add('max-retries',
+            type=int,
+            help='Maximum number of retries of INWX API requests failing temporarily.',
+            default=3)
+        add('persistent-cache',
+            type=bool,
+            help='Shall zones and CNAME redirects be cached on disk across certbot runs?',
+            default=False)
+        add('cache-ttl',
+            type=int,
+            help='Number of seconds entries of the persistent cache and resolved CNAMEs stay valid. '
+                 'Resolved CNAMEs are not kept longer than their DNS TTL either.',
+            default=86400)
+        add('orphan-age',
+            type=int,
+            help='Number of seconds after which _acme-challenge TXT records not belonging to the current '
+                 'challenges are considered left over and deleted (0 to disable). Requires the persistent '
+                 'cache, which tracks since when the records exist.',
+            default=0)
+        add('journal',
+            type=bool,
+            help='Shall created records be journaled in the work directory, so records left over by an '
+                 'interrupted run are resumed or deleted by the next one?',
+            default=False)
+        add('session-cache',
+            type=bool,
+            help='Shall the INWX API session be stored next to the credentials file and reused '
+                 'by subsequent certbot runs?',
+            default=False)
+        add('daemon-socket',
+            help='Path of the Unix socket of a running certbot-dns-inwx-daemon to hand the challenges to, '
+                 'instead of talking to the INWX API directly.',
+            default=None)
+        add('metrics-file',
+            help='Path of a file the metrics of the run are written to. Files ending in .prom are written '
+                 'in the Prometheus text format (e.g. for the node_exporter textfile collector), all '
+                 'others as JSON.',
+            default=None)
 
-        try:
-            import dns.resolver
+        # Only look for dnspython here, importing it is deferred until CNAMEs are actually resolved
+        if importlib.util.find_spec('dns') is not None:
             add('follow-cnames',
                 type=bool,
                 help='Shall the plugin follow CNAME redirects on validation records?',
                 default=True)
-        except ImportError:
-            pass
+            add('propagation-polling',
+                type=bool,
+                help='Shall the authoritative nameservers be polled until they serve the validation '
+                     'records? The propagation seconds are then the maximum time to wait.',
+                default=False)
+
+        # Likewise, aiohttp is only imported once the asynchronous client is used
+        if importlib.util.find_spec('aiohttp') is not None:
+            add('async-client',
+                type=bool,
+                help='Shall the INWX API be accessed by an asynchronous client? All accounts and '
+                     'records are then handled concurrently in a single event loop.',
+                default=False)
 
     def more_info(self) -> str:
         return 'This plugin configures a DNS TXT record to respond to a dns-01 challenge using ' + \
@@ -58,9 +168,147 @@ class Authenticator(dns_common.DNSAuthenticator):
                 'password': 'Password of the INWX API account.',
                 'shared_secret': 'Optional shared secret code for the two-factor ' + \
                                  'authentication assigned to the INWX API account.'
-            }
+            },
+            self._validate_accounts
         )
 
+    @staticmethod
+    def _validate_accounts(credentials: dns_common.CredentialsConfiguration) -> None:
+        """
+        Ensures that all additional accounts listed in `accounts` are completely configured.
+        """
+        for account in Authenticator._account_names(credentials):
+            credentials.require({
+                f'{account}_zones': f'Comma separated zones or zone suffixes served by the INWX account {account}.',
+                f'{account}_username': f'Username of the INWX API account {account}.',
+                f'{account}_password': f'Password of the INWX API account {account}.',
+            })
+
+    @staticmethod
+    def _account_names(credentials: dns_common.CredentialsConfiguration) -> List[str]:
+        return _split_list(credentials.conf('accounts'))
+
+    def _get_account(self, record_name: str) -> Optional[str]:
+        """
+        Returns the additional account serving the record, or None for the default account.
+
+        The account listing the longest zone suffix of the record name is chosen.
+        """
+        if self.credentials is None:
+            return None
+        best, best_length = None, -1
+        for account in self._account_names(self.credentials):
+            for zone in _split_list(self.credentials.conf(f'{account}_zones')):
+                zone = zone.strip('.').lower()
+                name = record_name.lower()
+                if (name == zone or name.endswith('.' + zone)) and len(zone) > best_length:
+                    best, best_length = account, len(zone)
+        return best
+
+    def _get_ttl(self, record_name: str) -> int:
+        """
+        Returns the TTL configured for the zone of the record, the one of the longest zone suffix
+        listed in `zone-ttl`, or the default TTL.
+        """
+        ttl, best_length = self.conf('ttl') or self.ttl, -1
+        for item in _split_list(self.conf('zone-ttl')):
+            zone, _, value = item.partition('=')
+            zone = zone.strip().strip('.').lower()
+            name = record_name.lower()
+            if (name == zone or name.endswith('.' + zone)) and len(zone) > best_length:
+                try:
+                    ttl, best_length = int(value), len(zone)
+                except ValueError:
+                    raise errors.PluginError(f'Invalid TTL {value!r} for zone {zone} in --dns-inwx-zone-ttl')
+        return ttl
+
+    def _by_account(self, records: list) -> Dict[Optional[str], list]:
+        """
+        Groups records, whose second element is the record name, by the account serving them.
+        """
+        grouped = {}
+        for record in records:
+            grouped.setdefault(self._get_account(record[1]), []).append(record)
+        return grouped
+
+    def _run_per_account(self, func: Callable[['_INWXClient', list], Any], records: list) -> None:
+        """
+        Hands the records of every account to its client, all accounts in parallel.
+
+        :raises certbot.errors.PluginError: if the function failed for any of the accounts
+        """
+        grouped = self._by_account(records)
+
+        def call(account):
+            func(self._get_inwx_client(account), grouped[account])
+
+        if len(grouped) == 1:
+            call(next(iter(grouped)))
+            return
+        from concurrent.futures import ThreadPoolExecutor
+
+        failures = []
+        with ThreadPoolExecutor(max_workers=len(grouped)) as executor:
+            futures = [executor.submit(call, account) for account in grouped]
+            for future in futures:
+                try:
+                    future.result()
+                except errors.PluginError as err:
+                    failures.append(str(err))
+        if failures:
+            raise errors.PluginError('; '.join(failures))
+
+    def _use_async_client(self) -> bool:
+        """
+        Returns whether the asynchronous client is enabled and its dependency aiohttp installed.
+
+        The option only exists if aiohttp is installed, which is not imported before it is needed.
+        """
+        if importlib.util.find_spec('aiohttp') is None:
+            return False
+        return bool(self.conf('async-client'))
+
+    def _run_async(self, method: str, records: list) -> None:
+        """
+        Hands the records of every account to the given method of its asynchronous client.
+
+        All accounts are handled concurrently in the event loop shared by all authenticators.
+
+        :raises certbot.errors.PluginError: if the method failed for any of the accounts
+        """
+        import asyncio
+
+        grouped = self._by_account(records)
+
+        async def call(account):
+            client = await self._get_async_client(account)
+            await getattr(client, method)(grouped[account])
+
+        async def call_all():
+            return await asyncio.gather(*(call(account) for account in grouped), return_exceptions=True)
+
+        failures = []
+        for result in self._get_event_loop().run(call_all()):
+            if isinstance(result, errors.PluginError):
+                failures.append(str(result))
+            elif isinstance(result, BaseException):
+                raise result
+        if failures:
+            raise errors.PluginError('; '.join(failures))
+
+    def _find_domain(self, record_name: str) -> str:
+        """
+        Returns the zone of a record name using the client of the account serving it.
+        """
+        account = self._get_account(record_name)
+        if not self._use_async_client():
+            return self._get_inwx_client(account)._find_domain(record_name)
+
+        async def find():
+            return await (await self._get_async_client(account))._find_domain(record_name)
+
+        return self._get_event_loop().run(find())
+
     def _follow_cnames(self, domain: str, validation_name: str) -> str:
         """
         Performs recursive CNAME lookups in case there exists a CNAME for the given
@@ -68,58 +316,813 @@ class Authenticator(dns_common.DNSAuthenticator):
         If the optional dependency dnspython is not installed, the given name is
         simply returned.
         """
+        return self._follow_all_cnames({validation_name: domain})[validation_name]
+
+    def _follow_all_cnames(self, validation_names: Dict[str, str]) -> Dict[str, str]:
+        """
+        Performs recursive CNAME lookups for all given validation names concurrently.
+        If the optional dependency dnspython is not installed, the given names are
+        simply returned.
+
+        :param dict validation_names: Mapping of validation names to the domain they validate.
+        :returns: Mapping of validation names to the names their records have to be placed at.
+        :rtype: dict
+        """
         try:
-            import dns.exception
-            import dns.resolver
-            import dns.name
+            from certbot_dns_inwx._internal.cnames import CNAMEResolver
 
             if not self.conf('follow-cnames'):
-                return validation_name
+                return {name: name for name in validation_names}
+        except ImportError:
+            return {name: name for name in validation_names}
+
+        if Authenticator.cnameResolver is None:
+            Authenticator.cnameResolver = CNAMEResolver(metrics=Authenticator.metrics)
+        with Authenticator.metrics.timed('cname_resolution_duration_seconds'):
+            resolved = Authenticator.cnameResolver.resolve_all(validation_names)
+        for name, result in resolved.items():
+            if isinstance(result, Exception):
+                logger.debug('CNAME lookup on %s failed: %s', name, result)
+                raise errors.PluginError(
+                    f'Failed to lookup CNAME\'s on your requested domain {validation_names[name]}')
+        return resolved
+
+    def perform(self, achalls: List[achallenges.AnnotatedChallenge]) -> List[challenges.ChallengeResponse]:
+        """
+        Performs all dns-01 challenges at once.
+
+        In contrast to the per challenge implementation of the base class, all validation
+        records are collected first and then handed to the client in a single batch, which
+        groups them by their base domain. If a daemon socket is configured, the challenges are
+        handed to the daemon instead, which needs no credentials on this side.
+        """
+        daemon = self.conf('daemon-socket')
+        if not daemon:
+            self._setup_credentials()
+
+        self._attempt_cleanup = True
+
+        challenges = []
+        responses = []
+        for achall in achalls:
+            domain = achall.identifier.value
+            validation_name = achall.validation_domain_name(domain)
+            validation = achall.validation(achall.account_key)
+
+            challenges.append((domain, validation_name, validation))
+            responses.append(achall.response(achall.account_key))
+
+        if daemon:
+            from certbot_dns_inwx._internal.daemon import DaemonClient
+
+            DaemonClient(daemon).request('perform', challenges=challenges,
+                                         propagation_seconds=self.conf('propagation-seconds'))
+            return responses
+
+        records = self._add_challenges(challenges)
+        self._wait_for_propagation(records)
+
+        return responses
+
+    def _add_challenges(self, challenges: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str, int]]:
+        """
+        Adds the validation records of the given challenges in a single batch.
+
+        :param list challenges: Tuples of (domain, validation_name, validation).
+        :returns: The added records as tuples of (domain, record_name, record_content, record_ttl).
+        :rtype: list
+        """
+        resolved = self._resolve_validation_names({validation_name: domain
+                                                   for domain, validation_name, _ in challenges})
+        self.resolvedNames.update(resolved)
+        records = [(domain, resolved[validation_name], validation, self._get_ttl(resolved[validation_name]))
+                   for domain, validation_name, validation in challenges]
+
+        try:
+            if self._use_async_client():
+                self._run_async('add_txt_records', records)
+            else:
+                self._run_per_account(lambda client, account_records: client.add_txt_records(account_records),
+                                      records)
+        except errors.PluginError:
+            # Resolve the names again next time in case the failure was caused by an outdated CNAME
+            self._invalidate_validation_names(resolved)
+            raise
+        finally:
+            for account in {None, *self._by_account(records)}:
+                cache = self._get_persistent_cache(account)
+                if cache is not None:
+                    cache.flush()
+        return records
+
+    def _wait_for_propagation(self, records: List[Tuple[str, str, str, int]], timeout: Optional[int] = None) -> None:
+        """
+        Waits for the validation records to propagate.
+
+        If enabled, the authoritative nameservers are polled until they serve all records,
+        otherwise (or if the optional dependency dnspython is not installed) the configured
+        propagation seconds are waited.
+
+        :param int timeout: Number of seconds to wait instead of the configured propagation seconds.
+        """
+        try:
+            from certbot_dns_inwx._internal.propagation import PropagationChecker
+
+            polling = self.conf('propagation-polling')
         except ImportError:
-            return validation_name
+            polling = False
+
+        if timeout is None:
+            timeout = self.conf('propagation-seconds')
+        if not polling:
+            self._notify('Waiting %d seconds for DNS changes to propagate' % timeout)
+            time.sleep(timeout)
+            return
+
+        pending = [(self._find_domain(record_name), record_name, record_content)
+                   for _, record_name, record_content, _ in records]
+        self._notify('Waiting up to %d seconds for DNS changes to propagate' % timeout)
+        start = time.monotonic()
+        if PropagationChecker(timeout, self.conf('max-workers')).wait(pending):
+            logger.info('DNS changes propagated after %.1f seconds', time.monotonic() - start)
+        else:
+            logger.warning('Not all DNS changes were visible on the authoritative nameservers '
+                           'after %d seconds', timeout)
+
+    def _notify(self, message: str) -> None:
+        display_util.notify(message)
+
+    def cleanup(self, achalls: List[achallenges.AnnotatedChallenge]) -> None:
+        """
+        Removes the validation records of all challenges at once.
+        """
+        if self._attempt_cleanup:
+            challenges = []
+            for achall in achalls:
+                domain = achall.identifier.value
+                validation_name = achall.validation_domain_name(domain)
+                validation = achall.validation(achall.account_key)
+
+                challenges.append((domain, validation_name, validation))
+
+            daemon = self.conf('daemon-socket')
+            if daemon:
+                from certbot_dns_inwx._internal.daemon import DaemonClient
+
+                DaemonClient(daemon).request('cleanup', challenges=challenges)
+                return
 
-        resolver = dns.resolver.Resolver()
-        name = dns.name.from_text(validation_name)
-        for _ in range(10):
             try:
-                answer = resolver.resolve(name, dns.rdatatype.CNAME)
-                if 1 <= len(answer):
-                    name = answer[0].target
-                else:
-                    break
-            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-                break
-            except (dns.exception.Timeout, dns.resolver.YXDOMAIN, dns.resolver.NoNameservers):
-                raise errors.PluginError(f'Failed to lookup CNAME\'s on your requested domain {domain}')
-        return name.to_text(True)
+                self._remove_challenges(challenges)
+            finally:
+                self._write_metrics()
+
+    def _remove_challenges(self, challenges: List[Tuple[str, str, str]]) -> None:
+        """
+        Removes the validation records of the given challenges in a single batch.
+
+        :param list challenges: Tuples of (domain, validation_name, validation).
+        """
+        resolved = self._take_resolved_names({validation_name: domain
+                                              for domain, validation_name, _ in challenges})
+        records = [(domain, resolved[validation_name], validation)
+                   for domain, validation_name, validation in challenges]
+        try:
+            if self._use_async_client():
+                self._run_async('del_txt_records', records)
+            else:
+                self._run_per_account(lambda client, account_records: client.del_txt_records(account_records),
+                                      records)
+        finally:
+            self._release_clients()
+
+    def _write_metrics(self) -> None:
+        """
+        Writes the metrics of the run to the configured file, if any, and starts over.
+        """
+        path = self.conf('metrics-file')
+        if path:
+            Authenticator.metrics.write(path)
+            Authenticator.metrics.reset()
 
     def _perform(self, domain: str, validation_name: str, validation: str) -> None:
-        if validation_name in Authenticator.nameCache:
-            resolved = Authenticator.nameCache[validation_name]
-        else:
-            resolved = self._follow_cnames(domain, validation_name)
-            Authenticator.nameCache[validation_name] = resolved
+        resolved = self._resolve_validation_name(domain, validation_name)
+        self.resolvedNames[validation_name] = resolved
+        self._get_inwx_client(self._get_account(resolved)).add_txt_record(domain, resolved, validation,
+                                                                         self._get_ttl(resolved))
 
-        if resolved != validation_name:
-            logger.info('Validation record for %s redirected by CNAME(s) to %s', domain, resolved)
-        self._get_inwx_client().add_txt_record(domain, resolved, validation, self.ttl)
+    def _resolve_validation_name(self, domain: str, validation_name: str) -> str:
+        """
+        Returns the name the validation record has to be placed at, following CNAMEs if enabled.
+        """
+        return self._resolve_validation_names({validation_name: domain})[validation_name]
+
+    def _resolve_validation_names(self, validation_names: Dict[str, str]) -> Dict[str, str]:
+        """
+        Returns the names the validation records have to be placed at, following CNAMEs if enabled.
+
+        Names which are not cached yet are resolved concurrently.
+
+        :param dict validation_names: Mapping of validation names to the domain they validate.
+        :returns: Mapping of validation names to the names their records have to be placed at.
+        :rtype: dict
+        """
+        cache = self._get_persistent_cache()
+        resolved = {}
+        pending = {}
+        for validation_name, domain in validation_names.items():
+            name = Authenticator.nameCache.get(validation_name)
+            if name is not None:
+                resolved[validation_name] = name
+                continue
+            if cache is not None:
+                # Not copied to the in-memory cache, whose entry would outlive the one on disk
+                cached = cache.get('cname:' + validation_name)
+                Authenticator.metrics.cache_lookup('persistent_cname', cached is not None)
+                if cached is not None:
+                    resolved[validation_name] = cached
+                    continue
+            pending[validation_name] = domain
+
+        if pending:
+            for validation_name, name in self._follow_all_cnames(pending).items():
+                resolved[validation_name] = name
+                # Entries are only stored when resolved, so hits do not extend their lifetime
+                ttl = self._get_cname_ttl(validation_name)
+                if ttl > 0:
+                    Authenticator.nameCache.set(validation_name, name, ttl)
+                    if cache is not None:
+                        cache.set('cname:' + validation_name, name, ttl)
+
+        for validation_name, domain in validation_names.items():
+            if resolved[validation_name] != validation_name:
+                logger.info('Validation record for %s redirected by CNAME(s) to %s',
+                            domain, resolved[validation_name])
+        return {validation_name: resolved[validation_name] for validation_name in validation_names}
+
+    def _take_resolved_names(self, validation_names: Dict[str, str]) -> Dict[str, str]:
+        """
+        Returns the names the validation records have been placed at by this authenticator and forgets them.
+
+        The records are thereby deleted where they have been created, even if the resolved names
+        have expired or the CNAMEs changed in the meantime. Only names of records this
+        authenticator has not added, e.g. before a restart of the daemon, are resolved again.
+
+        :param dict validation_names: Mapping of validation names to the domain they validate.
+        :returns: Mapping of validation names to the names their records have been placed at.
+        :rtype: dict
+        """
+        resolved = {}
+        pending = {}
+        for validation_name, domain in validation_names.items():
+            name = self.resolvedNames.pop(validation_name, None)
+            if name is None:
+                pending[validation_name] = domain
+            else:
+                resolved[validation_name] = name
+        if pending:
+            resolved.update(self._resolve_validation_names(pending))
+        return resolved
+
+    def _get_cname_ttl(self, validation_name: str) -> float:
+        """
+        Returns how long the name a validation name has just been resolved to may be cached.
+
+        If CNAMEs are followed, this is the smallest TTL along the chain, but at most `cache-ttl`.
+        """
+        ttl = self.conf('cache-ttl')
+        if Authenticator.cnameResolver is not None and self.conf('follow-cnames'):
+            ttl = min(ttl, Authenticator.cnameResolver.ttl(validation_name))
+        return ttl
+
+    def _invalidate_validation_names(self, validation_names: Iterable[str]) -> None:
+        """
+        Forgets the resolved names of the given validation names in memory and on disk.
+        """
+        cache = self._get_persistent_cache()
+        for validation_name in validation_names:
+            Authenticator.nameCache.invalidate(validation_name)
+            if cache is not None:
+                cache.invalidate('cname:' + validation_name)
 
     def _cleanup(self, domain: str, validation_name: str, validation: str) -> None:
-        resolved = Authenticator.nameCache[validation_name]
-        self._get_inwx_client().del_txt_record(domain, resolved, validation)
+        resolved = self._take_resolved_names({validation_name: domain})[validation_name]
+        try:
+            self._get_inwx_client(self._get_account(resolved)).del_txt_record(domain, resolved, validation)
+        finally:
+            self._release_clients()
 
-    def _get_inwx_client(self):
-        key = self.conf('credentials')
-        if key in Authenticator.clientCache:
-            return Authenticator.clientCache[key]
-        else:
-            client = _INWXClient(self.credentials.conf('url'),
-                                 self.credentials.conf('username'),
-                                 self.credentials.conf('password'),
-                                 self.credentials.conf('shared_secret'))
+    def _get_inwx_client(self, account: Optional[str] = None):
+        """
+        Returns the logged in client of the given additional account or of the default account.
+        """
+        key = self._get_client_key(account)
+        client = self._get_held_client(key)
+        if client is not None and not client.sessionRejected:
+            return self._hold_client(key, client)
+        # Only one thread logs in, the others wait for its client
+        with Authenticator.clientLock:
+            client = Authenticator.clientCache.get(key)
+            if client is not None and not client.sessionRejected:
+                return self._hold_client(key, client)
+            if client is not None:
+                logger.debug('INWX API session has been rejected, logging in again')
+                Authenticator.clientCache.invalidate(key)
+            prefix = '' if account is None else account + '_'
+            client = _INWXClient(self.credentials.conf(prefix + 'url') or self.credentials.conf('url'),
+                                 self.credentials.conf(prefix + 'username'),
+                                 self.credentials.conf(prefix + 'password'),
+                                 self.credentials.conf(prefix + 'shared_secret'),
+                                 self.conf('max-workers'),
+                                 self.conf('rate-limit'),
+                                 self._get_persistent_cache(account),
+                                 self._get_session_store(account),
+                                 Authenticator.metrics,
+                                 self.conf('max-retries'),
+                                 self.conf('orphan-age'),
+                                 self.conf('connect-timeout'),
+                                 self.conf('read-timeout'),
+                                 self._get_journal(account))
             # Login was successful if this point is reached
-            Authenticator.clientCache[key] = client
-            return client
+            Authenticator.clientCache.set(key, client)
+        return self._hold_client(key, client)
+
+    def _get_client_key(self, account: Optional[str] = None) -> str:
+        """
+        Returns the key of the client of the given account in the client cache.
+        """
+        return self.conf('credentials') if account is None else f"{self.conf('credentials')}#{account}"
+
+    async def _get_async_client(self, account: Optional[str] = None) -> 'AsyncINWXClient':
+        """
+        Returns the logged in asynchronous client of the given additional account or of the default account.
+        """
+        from certbot_dns_inwx._internal.aio import AsyncINWXClient
+
+        key = 'async:' + self._get_client_key(account)
+        client = self._get_held_client(key)
+        if client is not None and not client.sessionRejected:
+            return self._hold_client(key, client)
+        # Only one task logs in, the others wait for its client
+        async with self._get_event_loop().clientLock:
+            client = Authenticator.clientCache.get(key)
+            if client is not None and not client.sessionRejected:
+                return self._hold_client(key, client)
+            if client is not None:
+                logger.debug('INWX API session has been rejected, logging in again')
+                # Closes the rejected client
+                Authenticator.clientCache.invalidate(key)
+            prefix = '' if account is None else account + '_'
+            client = AsyncINWXClient(self.credentials.conf(prefix + 'url') or self.credentials.conf('url'),
+                                     self.credentials.conf(prefix + 'username'),
+                                     self.credentials.conf(prefix + 'password'),
+                                     self.credentials.conf(prefix + 'shared_secret'),
+                                     self.conf('max-workers'),
+                                     self.conf('rate-limit'),
+                                     Authenticator.metrics,
+                                     self.conf('max-retries'),
+                                     self.conf('connect-timeout'),
+                                     self.conf('read-timeout'),
+                                     self._get_journal(account),
+                                     self._get_persistent_cache(account))
+            try:
+                await client.login()
+            except BaseException:
+                await client.close()
+                raise
+            Authenticator.clientCache.set(key, client)
+        return self._hold_client(key, client)
+
+    def _get_held_client(self, key: str) -> Any:
+        """
+        Returns the client this authenticator holds for the given key, unless its session has been
+        rejected, or else the one in the client cache.
+        """
+        client = self.clients.get(key)
+        if client is None or client.sessionRejected:
+            client = Authenticator.clientCache.get(key)
+        return client
+
+    def _hold_client(self, key: str, client: Any) -> Any:
+        """
+        Holds the client until the records of this authenticator are cleaned up and returns it.
+
+        A held client keeps its record IDs and session even if it expires from the client cache
+        meanwhile, and is not closed before it is released. A client replacing a rejected one
+        releases the latter.
+        """
+        with Authenticator.clientUsersLock:
+            held = self.clients.get(key)
+            if held is client:
+                return client
+            self.clients[key] = client
+            Authenticator.clientUsers[client] = Authenticator.clientUsers.get(client, 0) + 1
+        if held is not None:
+            Authenticator._release_client(held)
+        return client
+
+    def _release_clients(self) -> None:
+        """
+        Releases the clients held by this authenticator once no records await their cleanup anymore.
+        """
+        with Authenticator.clientUsersLock:
+            if self.resolvedNames:
+                return
+            clients, self.clients = self.clients, {}
+        for client in clients.values():
+            Authenticator._release_client(client)
+
+    @staticmethod
+    def _release_client(client: Any) -> None:
+        """
+        Drops one hold on the client and closes it if it was the last one and the client has been
+        dropped from the client cache meanwhile.
+        """
+        with Authenticator.clientUsersLock:
+            users = Authenticator.clientUsers.pop(client) - 1
+            if users:
+                Authenticator.clientUsers[client] = users
+                return
+            if client not in Authenticator.discardedClients:
+                return
+            Authenticator.discardedClients.discard(client)
+        Authenticator.eventLoop.submit(Authenticator._close_unused_client(client))
+
+    @staticmethod
+    def _get_event_loop() -> 'EventLoopThread':
+        """
+        Returns the event loop running the asynchronous clients, started on first use.
+
+        The clients left on the loop are closed when the process exits.
+        """
+        from certbot_dns_inwx._internal.aio import EventLoopThread
+
+        if Authenticator.eventLoop is None:
+            Authenticator.eventLoop = EventLoopThread()
+            import atexit
+
+            atexit.register(Authenticator._close_async_clients)
+        return Authenticator.eventLoop
+
+    @staticmethod
+    def _discard_client(key: str, client: Any) -> None:
+        """
+        Closes an asynchronous client dropped from the client cache, without waiting for it, or
+        once it is released if an authenticator still holds it.
+
+        Synchronous clients need no closing, their connections are released with them.
+        """
+        if not key.startswith('async:') or Authenticator.eventLoop is None:
+            return
+        with Authenticator.clientUsersLock:
+            if Authenticator.clientUsers.get(client):
+                Authenticator.discardedClients.add(client)
+                return
+        Authenticator.eventLoop.submit(Authenticator._close_unused_client(client))
+
+    @staticmethod
+    async def _close_unused_client(client: 'AsyncINWXClient') -> None:
+        """
+        Closes a dropped asynchronous client, unless it has been taken up again before the event
+        loop got to it, in which case it is closed once released.
+        """
+        with Authenticator.clientUsersLock:
+            if Authenticator.clientUsers.get(client):
+                Authenticator.discardedClients.add(client)
+                return
+        await client.close()
+
+    @staticmethod
+    def _close_async_clients() -> None:
+        """
+        Removes all asynchronous clients from the client cache and waits for them to be closed,
+        along with those dropped from it but still held.
+        """
+        if Authenticator.eventLoop is None:
+            return
+        import asyncio
+
+        clients = [Authenticator.clientCache.pop(key) for key in Authenticator.clientCache.keys()
+                   if key.startswith('async:')]
+        with Authenticator.clientUsersLock:
+            clients.extend(Authenticator.discardedClients)
+            Authenticator.discardedClients.clear()
+
+        async def close_all():
+            await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+        Authenticator.eventLoop.run(close_all())
+
+    def _get_persistent_cache(self, account: Optional[str] = None) -> Optional['PersistentCache']:
+        """
+        Returns the on-disk cache of the given or default account or None if it is disabled.
+        """
+        if not self.conf('persistent-cache'):
+            return None
+        key = os.path.abspath(self.conf('credentials'))
+        if account is not None:
+            key += '#' + account
+        if key not in Authenticator.persistentCache:
+            from certbot_dns_inwx._internal.cache import PersistentCache
+
+            Authenticator.persistentCache[key] = PersistentCache(self._get_state_path('cache', '.json', account),
+                                                                 self.conf('cache-ttl'))
+        return Authenticator.persistentCache[key]
+
+    def _get_journal(self, account: Optional[str] = None) -> Optional['Journal']:
+        """
+        Returns the journal of the records created for the given or default account or None if it is disabled.
+        """
+        if not self.conf('journal'):
+            return None
+        from certbot_dns_inwx._internal.journal import Journal
+
+        return Journal(self._get_state_path('journal', '.jsonl', account))
+
+    def _get_state_path(self, prefix: str, suffix: str, account: Optional[str] = None) -> str:
+        """
+        Returns the path of a file in the work directory belonging to the credentials and account.
+        """
+        key = os.path.abspath(self.conf('credentials'))
+        if account is not None:
+            key += '#' + account
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.config.work_dir, 'dns-inwx', f'{prefix}-{digest}{suffix}')
+
+    def _get_session_store(self, account: Optional[str] = None) -> Optional['SessionStore']:
+        """
+        Returns the store for the API session of the given or default account next to the
+        credentials file or None if it is disabled.
+        """
+        if not self.conf('session-cache'):
+            return None
+        from certbot_dns_inwx._internal.session import SessionStore
+
+        suffix = '.session' if account is None else f'.{account}.session'
+        return SessionStore(os.path.abspath(self.conf('credentials')) + suffix)
+
+
+def _split_list(value: Optional[str]) -> List[str]:
+    """
+    Splits a comma separated value of the credentials file, which may already be split.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [item.strip() for item in value if item.strip()]
+
+
+def _choose_ttls(domain: str, record_ttls: Iterable[int], negative_ttl: Optional[int]) -> Dict[int, int]:
+    """
+    Choose the TTLs of the validation records of a zone and log them once for the zone.
+
+    Every requested TTL is lowered to the negative caching TTL of the zone, but not below the
+    minimum TTL of the API.
+
+    :returns: A mapping of every requested TTL to the one to use.
+    :rtype: dict
+    """
+    ttls = {record_ttl: max(_INWXClient.MIN_TTL, min(record_ttl, negative_ttl or record_ttl))
+            for record_ttl in record_ttls}
+    chosen = '/'.join(str(ttl) for ttl in sorted(set(ttls.values())))
+    if not _needs_negative_ttl(ttls):
+        logger.info('Using a TTL of %s seconds for validation records in %s', chosen, domain)
+    else:
+        logger.info('Using a TTL of %s seconds for validation records in %s (negative answers are cached for %s)',
+                    chosen, domain, f'{negative_ttl} seconds' if negative_ttl else 'an unknown time')
+    return ttls
+
+
+def _needs_negative_ttl(record_ttls: Iterable[int]) -> bool:
+    """
+    Return whether the negative caching TTL of a zone may lower any of the requested TTLs.
+
+    TTLs at or below the minimum TTL of the API are kept anyway, so the SOA record of the zone
+    does not need to be fetched for them.
+    """
+    return any(record_ttl > _INWXClient.MIN_TTL for record_ttl in record_ttls)
+
+
+def _api_result(result: dict) -> dict:
+    """
+    Classify the result of an API request.
+
+    :returns: The data of a successful result.
+    :rtype: dict
+    :raises _TransientError: if the request failed in a way that may succeed when retried
+    :raises Exception: if the request failed otherwise
+    """
+    if result['code'] == 2201:
+        raise Exception(
+            f'insufficient authorization. Have you added the \'DNS management\' role to your API account?')
+    elif result['code'] in _INWXClient.TRANSIENT_ERRORS:
+        raise _TransientError(f"{result['msg']} ({result['code']})")
+    elif result['code'] != 1000:
+        raise Exception(f"{result['msg']} ({result['code']})")
+    return result.get('resData', {})
+
+
+def _is_transient_status(api_method: str, status: int) -> bool:
+    """
+    Decide whether a request answered with the given HTTP status may be repeated.
+
+    Requests which are not idempotent are not repeated, as they may have been processed.
+    """
+    return api_method not in _INWXClient.NON_IDEMPOTENT_METHODS and (status == 429 or status >= 500)
+
+
+def _retry_delay(attempt: int) -> float:
+    """
+    Return the random delay before a retry, whose maximum doubles with every attempt (counted from 0).
+    """
+    return random.uniform(0, min(_INWXClient.RETRY_MAX_DELAY, _INWXClient.RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _soa_negative_ttl(info: dict) -> int:
+    """
+    Return how long resolvers may cache negative answers of a zone, given its SOA record as
+    returned by `nameserver.info`.
+
+    As defined by RFC 2308, this is the smaller of the TTL and the minimum field of the SOA record.
+    """
+    soa = info.get('record', [])[0]
+    return min(int(soa['ttl']), int(soa['content'].split()[-1]))
+
+
+def _found_record_id(info: dict) -> int:
+    """
+    Return the ID of the record found by `nameserver.info`.
+
+    :raises Exception: if no record has been found
+    """
+    if (not 'record' in info) or 0 == info['count']:
+        raise Exception(f'record has been removed/altered')
+    return info['record'][0]['id']
+
+
+def _orphan_deleted(record: dict, err: Optional[Exception], metrics: Metrics) -> bool:
+    """
+    Log the outcome of deleting a redundant or left over TXT record.
+
+    :param Exception err: The error the deletion failed with, or None if it succeeded.
+    :returns: Whether the record is gone, i.e. it has been deleted or did not exist anymore.
+    :rtype: bool
+    """
+    if err is not None and not str(err).endswith(f'({_INWXClient.OBJECT_DOES_NOT_EXIST})'):
+        logger.warning('Unable to delete stale TXT record %s: %s', record['name'], err)
+        return False
+    if err is None:
+        logger.info('Deleted stale TXT record %s', record['name'])
+        metrics.increment('records_reconciled_total', action='deleted')
+    return True
+
+
+class _RateLimiter:
+    """
+    Spaces out API requests of all threads of a session to a maximum rate.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def reserve(self) -> float:
+        """
+        Reserves the next slot for a request.
+
+        :returns: The number of seconds to wait before the request may be sent.
+        :rtype: float
+        """
+        if not self.interval:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        return wait
+
+    def acquire(self) -> None:
+        """
+        Blocks until the next request may be sent.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class _TransportAdapter(requests.adapters.HTTPAdapter):
+    """
+    Pool of keep-alive connections to the API applying default timeouts to all requests.
+
+    Workers exceeding the pool size wait for a connection to be returned instead of opening
+    additional connections, which would be closed again right after their request.
+    """
+
+    def __init__(self, pool_size: int, timeout: Tuple[Optional[float], Optional[float]]) -> None:
+        self.timeout = timeout
+        super().__init__(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class _TransientError(Exception):
+    """
+    An API request failed in a way that may succeed when retried.
+    """
+
+
+class _CircuitBreaker:
+    """
+    Fails requests fast after repeated transient failures until a cool down has passed.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = None
+        self.trialPending = False
+        self.lock = threading.Lock()
+
+    def check(self) -> bool:
+        """
+        Raises an exception if requests are currently refused.
+
+        After the cool down a single trial request is let through, all others are refused until
+        its outcome is recorded; if it fails, the circuit is opened again.
+
+        :returns: Whether the request is the trial request.
+        :rtype: bool
+        """
+        with self.lock:
+            if self.opened is None:
+                return False
+            if self.trialPending or time.monotonic() - self.opened < self.reset_timeout:
+                raise Exception('too many failed requests, the INWX API is not contacted for a while')
+            self.trialPending = True
+            return True
+
+    def record(self, success: bool, trial: bool = False) -> None:
+        """
+        Records the outcome of a request.
+
+        :param bool trial: Whether the request was the trial request let through by :meth:`check`.
+        """
+        with self.lock:
+            if trial:
+                self.trialPending = False
+            if success:
+                self.failures = 0
+                self.opened = None
+                return
+            self.failures += 1
+            if trial:
+                logger.warning('INWX API request failed again, pausing requests for %d seconds', self.reset_timeout)
+                self.opened = time.monotonic()
+            elif self.failures >= self.threshold and self.opened is None:
+                logger.warning('INWX API failed %d times in a row, pausing requests for %d seconds',
+                               self.failures, self.reset_timeout)
+                self.opened = time.monotonic()
+
+
+class _RetryBudget:
+    """
+    Token bucket limiting the retries of a session, refilled over time so long-lived processes
+    keep retrying after transient failures.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float) -> None:
+        """
+        :param float capacity: Maximum number of retries available at once.
+        :param float refill_rate: Number of retries regained per second.
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        """
+        Consume one retry.
+
+        :returns: Whether a retry was left.
+        :rtype: bool
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+            self.updated = now
+            if self.tokens < 1:
+                logger.debug('Retry budget of the INWX API session is exhausted')
+                return False
+            self.tokens -= 1
+            return True
 
 
 class _INWXClient:
@@ -127,21 +1130,116 @@ class _INWXClient:
     Encapsulates all communication with the INWX XML-RPC API.
     """
 
-    def __init__(self, url: str, username: str, password: str, secret: str) -> None:
+    ZONE_PAGE_LIMIT = 1000
+    MIN_TTL = 300
+    AUTHENTICATION_ERROR = 2200
+    OBJECT_DOES_NOT_EXIST = 2303
+    # Command failed, command failed with the server closing the connection and session limit exceeded
+    TRANSIENT_ERRORS = (2400, 2500, 2502)
+    NON_IDEMPOTENT_METHODS = ('nameserver.createRecord',)
+    RETRY_BUDGET = 25
+    # Retries regained per second
+    RETRY_BUDGET_REFILL = 0.1
+    RETRY_BASE_DELAY = 0.5
+    RETRY_MAX_DELAY = 8.0
+
+    def __init__(self, url: str, username: str, password: str, secret: str,
+                 max_workers: int = 1, rate_limit: float = 0, cache: Optional['PersistentCache'] = None,
+                 session_store: Optional['SessionStore'] = None, metrics: Optional[Metrics] = None,
+                 max_retries: int = 0, orphan_age: float = 0, connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None, journal: Optional['Journal'] = None) -> None:
         # Ensure compatibility with configurations for the old API interface
         if url.endswith('/'):
             url = url[:-1]
         if url.endswith('xmlrpc'):
             url = url[:-6]
+        # Deferred, so loading the plugin does not pay for the Domrobot client and its XML-RPC dependencies
+        from INWX.Domrobot import ApiClient
+
         self.inwx = ApiClient(url)
-        self.recordCache = {}
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.recordCache = LRUCache('record', max_entries=4096, metrics=self.metrics)
+        self.recordIds = {}
+        self.recordIdLock = threading.Lock()
+        self.cache = cache
+        zones = cache.get('zones') if cache is not None else None
+        if cache is not None:
+            self.metrics.cache_lookup('persistent_zones', isinstance(zones, list))
+        self.zoneIndex = _ZoneIndex(zones, cached=True) if isinstance(zones, list) else None
+        self.zoneIndexLock = threading.Lock()
+        self.max_workers = max(1, max_workers or 1)
+        self.rateLimiter = _RateLimiter(rate_limit)
+        self.circuitBreaker = _CircuitBreaker()
+        self.max_retries = max_retries
+        self.retryBudget = _RetryBudget(self.RETRY_BUDGET, self.RETRY_BUDGET_REFILL)
+        self.orphanAge = orphan_age
+        self.negativeTtls = {}
+        self.journal = journal
+        self.journalRecovered = False
+        self.url = url
+        self.username = username
+        self.password = password
+        self.secret = secret
+        self.sessionStore = session_store
+        self.sessionLock = threading.Lock()
+        self.sessionReused = False
+        self.sessionGeneration = 0
+        self.sessionRejected = False
+        self.timeout = (connect_timeout or None, read_timeout or None)
+        self._configure_transport()
+
+        cookies = session_store.load(url, username) if session_store is not None else None
+        if cookies is not None:
+            logger.debug('Reusing stored INWX API session')
+            for cookie in cookies:
+                self.inwx.api_session.cookies.set(cookie['name'], cookie['value'],
+                                                  domain=cookie['domain'], path=cookie['path'])
+            self.sessionReused = True
+        else:
+            self._login()
+
+    def _configure_transport(self) -> None:
+        """
+        Let the API session keep up to one connection per worker alive and apply the timeouts.
+        """
+
+        adapter = _TransportAdapter(self.max_workers, self.timeout)
+        self.inwx.api_session.mount('https://', adapter)
+        self.inwx.api_session.mount('http://', adapter)
+
+    def _login(self) -> None:
+        """
+        Log in to the API and store the new session if a session store is configured.
+
+        :raises certbot.errors.PluginError: if the login fails
+        """
+
         try:
-            login_result = self.inwx.login(username, password, secret)
+            login_result = self.inwx.login(self.username, self.password, self.secret)
         except Exception as err:
             raise errors.PluginError(f'INWX login failed: {err}')
         if login_result['code'] != 1000:
             raise errors.PluginError(f"INWX login failed: {login_result['msg']}")
 
+        if self.sessionStore is not None:
+            self.sessionStore.save(self.url, self.username,
+                                   [{'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain,
+                                     'path': cookie.path} for cookie in self.inwx.api_session.cookies])
+
+    def discard_session(self) -> None:
+        """
+        Log out from the API and remove the stored session.
+        """
+
+        try:
+            self.inwx.logout()
+        except Exception as err:
+            logger.debug('INWX logout failed: %s', err)
+        # The logout replaces the API session with a new one
+        self._configure_transport()
+        if self.sessionStore is not None:
+            self.sessionStore.discard()
+
     def add_txt_record(self, source: str, record_name: str, record_content: str, record_ttl: int):
         """
         Add a TXT record using the supplied information.
@@ -155,14 +1253,226 @@ class _INWXClient:
 
         try:
             domain = self._find_domain(record_name)
+            record_ttl = _choose_ttls(domain, [record_ttl], self._negative_ttl(domain, [record_ttl]))[record_ttl]
 
-            self._call_api('nameserver.createRecord',
-                           {'domain': domain, 'name': record_name, 'type': 'TXT', 'content': record_content,
-                            'ttl': record_ttl})
+            self._create_txt_record(domain, record_name, record_content, record_ttl)
         except Exception as err:
+            self.recordCache.invalidate(record_name)
             raise errors.PluginError(
                 f'Failed to add TXT DNS record {record_name} for {source}: {err}')
 
+    def add_txt_records(self, records: List[Tuple[str, str, str, int]]):
+        """
+        Add multiple TXT records at once, grouped by their base domain.
+
+        Every base domain is only looked up once and its TXT records are fetched once to
+        reconcile them with the records to add (see :meth:`_reconcile`). A failure on a single
+        record does not prevent the remaining records from being added; all failures are
+        reported together.
+
+        :param list records: Tuples of (source, record_name, record_content, record_ttl) as
+                             accepted by :meth:`add_txt_record`.
+        :raises certbot.errors.PluginError: if any of the records could not be added
+        """
+
+        self._recover_leftovers(records)
+        failures = []
+        grouped = self._group_by_domain(records, failures)
+        inspections = self._run_concurrently(
+            lambda item: self._inspect_zone(item[0], {record[3] for record in item[1]}), list(grouped.items()))
+        tasks = []
+        orphans = []
+        for (domain, zone_records), (inspection, _) in zip(grouped.items(), inspections):
+            snapshot, negative_ttl = inspection
+            ttls = _choose_ttls(domain, {record[3] for record in zone_records}, negative_ttl)
+            zone_records = [(source, record_name, record_content, ttls[record_ttl])
+                            for source, record_name, record_content, record_ttl in zone_records]
+            missing, stale = self._reconcile(domain, zone_records, snapshot)
+            tasks.extend((domain, record) for record in missing)
+            orphans.extend(stale)
+
+        def create(task):
+            domain, (source, record_name, record_content, record_ttl) = task
+            self._create_txt_record(domain, record_name, record_content, record_ttl)
+
+        for (_, (source, record_name, _, _)), (_, err) in zip(tasks, self._run_concurrently(create, tasks)):
+            if err is not None:
+                self.recordCache.invalidate(record_name)
+                failures.append(f'{record_name} for {source}: {err}')
+
+        self._delete_orphans(orphans)
+
+        if failures:
+            raise errors.PluginError('Failed to add TXT DNS record(s): ' + '; '.join(failures))
+
+    def _inspect_zone(self, domain: str, record_ttls: Iterable[int]) -> Tuple[List[dict], Optional[int]]:
+        """
+        Fetch the TXT records and the negative caching TTL of a zone. Failures are only logged.
+
+        :param list record_ttls: The TTLs requested for the records of the zone.
+        :returns: The TXT records (empty if unknown) and the negative caching TTL (None if unknown).
+        :rtype: tuple
+        """
+
+        try:
+            snapshot = self._snapshot_txt_records(domain)
+        except Exception as err:
+            logger.debug('Unable to fetch the TXT records of %s, not reconciling them: %s', domain, err)
+            snapshot = []
+        return snapshot, self._negative_ttl(domain, record_ttls)
+
+    def _negative_ttl(self, domain: str, record_ttls: Iterable[int]) -> Optional[int]:
+        """
+        Return how long resolvers may cache negative answers of the zone, fetched once per zone.
+
+        It is not fetched (and None returned) if it cannot lower any of the requested TTLs.
+        """
+
+        if not _needs_negative_ttl(record_ttls):
+            return None
+        if domain not in self.negativeTtls:
+            try:
+                self.negativeTtls[domain] = _soa_negative_ttl(
+                    self._call_api('nameserver.info', {'domain': domain, 'type': 'SOA'}))
+            except Exception as err:
+                logger.debug('Unable to determine the negative caching TTL of %s: %s', domain, err)
+                self.negativeTtls[domain] = None
+        return self.negativeTtls[domain]
+
+    def _snapshot_txt_records(self, domain: str) -> List[dict]:
+        """
+        Fetch all TXT records of a zone with a single request.
+        """
+
+        return self._call_api('nameserver.info', {'domain': domain, 'type': 'TXT'}).get('record', [])
+
+    def _reconcile(self, domain: str, records: list, snapshot: List[dict]) -> Tuple[list, List[dict]]:
+        """
+        Compare the records to add with the TXT records already present in their zone.
+
+        Existing records with identical name and content are taken over instead of being created
+        again and will be deleted on cleanup like created ones; further identical copies are
+        redundant. If `orphan_age` is set, challenge records which have been seen for longer than
+        that are considered left over by an earlier run. Their age is tracked in the persistent cache.
+
+        :param str domain: The zone of the records.
+        :param list records: Tuples of (source, record_name, record_content, record_ttl) of the zone.
+        :param list snapshot: The TXT records of the zone as returned by `nameserver.info`.
+        :returns: The records which need to be created and the existing records to delete.
+        :rtype: tuple
+        """
+
+        existing = {}
+        for record in snapshot:
+            existing.setdefault((record['name'], record['content']), []).append(record)
+
+        missing = []
+        for record in records:
+            copies = existing.get((record[1], record[2]))
+            if copies:
+                logger.debug('TXT record %s with identical content already exists, reusing it', record[1])
+                self.metrics.increment('records_reconciled_total', action='reused')
+                record_id = copies.pop(0)['id']
+                with self.recordIdLock:
+                    ids = self.recordIds.setdefault((record[1], record[2]), [])
+                    # Known if the record is added again, e.g. when a failed daemon batch is repeated
+                    known = record_id in ids
+                    if not known:
+                        ids.append(record_id)
+                if self.journal is not None and not known:
+                    self.journal.created(domain, record[1], record[2], record_id)
+            else:
+                missing.append(record)
+
+        wanted = {(record[1], record[2]) for record in records}
+        names = {record[1] for record in records}
+        stale = []
+        now = time.time()
+        for key, copies in existing.items():
+            for record in copies:
+                if key in wanted:
+                    stale.append(record)
+                elif (record['name'].startswith('_acme-challenge.') or record['name'] in names) \
+                        and now - self._first_seen(record['id'], now) > self.orphanAge > 0:
+                    stale.append(record)
+        return missing, stale
+
+    def _first_seen(self, record_id: int, now: float) -> float:
+        """
+        Return when a record has been seen for the first time, remembering it if it is new.
+
+        Without a persistent cache, every record counts as new.
+        """
+
+        if self.cache is None or self.orphanAge <= 0:
+            return now
+        key = f'seen:{self.url}:{record_id}'
+        seen = self.cache.get(key)
+        if seen is None:
+            seen = now
+            self.cache.set(key, seen, ttl=self.orphanAge + self.cache.ttl)
+        return seen
+
+    def _delete_orphans(self, records: List[dict]) -> None:
+        """
+        Delete redundant and left over TXT records. Failures are only logged.
+        """
+
+        results = self._run_concurrently(lambda record: self._call_api('nameserver.deleteRecord',
+                                                                       {'id': record['id']}), records)
+        for record, (_, err) in zip(records, results):
+            if _orphan_deleted(record, err, self.metrics) and self.journal is not None:
+                self.journal.deleted(record['id'])
+
+    def _recover_leftovers(self, records: list) -> None:
+        """
+        Deal with the records journaled by runs which have been interrupted before their cleanup.
+
+        Left over records matching a record to add are kept, to be taken over by :meth:`_reconcile`
+        instead of being created again. All others are deleted in one batch by their ID, without
+        looking up their zones. This happens once per client.
+
+        :param list records: Tuples whose second and third elements are the record name and content.
+        """
+
+        if self.journal is None or self.journalRecovered:
+            return
+        self.journalRecovered = True
+        wanted = {(record[1], record[2]) for record in records}
+        leftovers = [entry for entry in self.journal.leftovers() if (entry['name'], entry['content']) not in wanted]
+        if leftovers:
+            logger.info('Deleting %d TXT record(s) left over by interrupted runs', len(leftovers))
+            self._delete_orphans(leftovers)
+            self.journal.compact()
+
+    def _create_txt_record(self, domain: str, record_name: str, record_content: str, record_ttl: int):
+        """
+        Create a TXT record in the given zone and remember its ID for the deletion.
+
+        If the zone was taken from the persistent cache and the creation fails, the zone index
+        is refreshed and the creation retried once in case the cached zone was outdated.
+        """
+
+        params = {'domain': domain, 'name': record_name, 'type': 'TXT', 'content': record_content,
+                  'ttl': record_ttl}
+        try:
+            result = self._call_api('nameserver.createRecord', params)
+        except Exception:
+            live = self._revalidate_domain(record_name, domain)
+            if live is None:
+                raise
+            logger.debug('Cached zone %s for %s is outdated, retrying with %s', domain, record_name, live)
+            self.metrics.increment('retries_total', reason='stale_zone')
+            params = dict(params, domain=live)
+            result = self._call_api('nameserver.createRecord', params)
+
+        if 'id' in result:
+            with self.recordIdLock:
+                self.recordIds.setdefault((record_name, record_content), []).append(result['id'])
+            if self.journal is not None:
+                self.journal.created(params['domain'], record_name, record_content, result['id'])
+            self._first_seen(result['id'], time.time())
+
     def del_txt_record(self, source: str, record_name: str, record_content: str):
         """
         Delete a TXT record using the supplied information.
@@ -174,62 +1484,376 @@ class _INWXClient:
         """
 
         try:
-            domain = self._find_domain(record_name)
+            record_id = self._pop_record_id(record_name, record_content)
+            if record_id is None and self.journal is not None:
+                # The record may have been created by an earlier run
+                entry = self.journal.find(record_name, record_content)
+                record_id = entry['id'] if entry is not None else None
+            if record_id is None:
+                # The record has not been created by this client, so its ID needs to be looked up
+                domain = self._find_domain(record_name)
 
-            info = self._call_api('nameserver.info',
-                                  {'domain': domain, 'name': record_name, 'content': record_content})
-            if (not 'record' in info) or 0 == info['count']:
-                raise Exception(f'record has been removed/altered')
+                record_id = _found_record_id(self._call_api(
+                    'nameserver.info', {'domain': domain, 'name': record_name, 'content': record_content}))
 
-            self._call_api('nameserver.deleteRecord', {'id': info['record'][0]['id']})
+            self._call_api('nameserver.deleteRecord', {'id': record_id})
+            if self.journal is not None:
+                self.journal.deleted(record_id)
         except Exception as err:
+            self.recordCache.invalidate(record_name)
             raise errors.PluginError(
                 f'Failed to delete TXT DNS record {record_name} for {source}: {err}')
 
+    def _pop_record_id(self, record_name: str, record_content: str) -> Optional[int]:
+        """
+        Return and forget the ID of a record created by this client, or None if it is unknown.
+        """
+
+        with self.recordIdLock:
+            ids = self.recordIds.get((record_name, record_content))
+            if not ids:
+                return None
+            record_id = ids.pop()
+            if not ids:
+                del self.recordIds[(record_name, record_content)]
+            return record_id
+
+    def del_txt_records(self, records: List[Tuple[str, str, str]]):
+        """
+        Delete multiple TXT records at once.
+
+        A failure on a single record does not prevent the remaining records from being
+        deleted; all failures are reported together.
+
+        :param list records: Tuples of (source, record_name, record_content) as accepted by
+                             :meth:`del_txt_record`.
+        :raises certbot.errors.PluginError: if any of the records could not be deleted
+        """
+
+        self._prefetch_record_ids(records)
+        results = self._run_concurrently(lambda record: self.del_txt_record(*record), records)
+        if self.journal is not None:
+            self.journal.compact()
+        failures = [str(err) for _, err in results if err is not None]
+        if failures:
+            raise errors.PluginError('; '.join(failures))
+
+    def _prefetch_record_ids(self, records: List[Tuple[str, str, str]]) -> None:
+        """
+        Look up the IDs of records not created by this client once per record name.
+
+        The validation records of a domain and its wildcard share a name, so instead of one
+        lookup per record, all TXT records of such a name are fetched at once. Names with a
+        single unknown record are left to :meth:`del_txt_record`. Failures are only logged.
+        """
+
+        unknown = {}
+        with self.recordIdLock:
+            for _, record_name, record_content in records:
+                if not self.recordIds.get((record_name, record_content)):
+                    unknown.setdefault(record_name, set()).add(record_content)
+        if self.journal is not None:
+            for record_name, contents in unknown.items():
+                if len(contents) > 1:
+                    contents.difference_update([content for content in contents
+                                                if self.journal.find(record_name, content) is not None])
+        names = [name for name, contents in unknown.items() if len(contents) > 1]
+
+        def lookup(record_name):
+            domain = self._find_domain(record_name)
+            return self._call_api('nameserver.info', {'domain': domain, 'name': record_name,
+                                                      'type': 'TXT'}).get('record', [])
+
+        for record_name, (existing, err) in zip(names, self._run_concurrently(lookup, names)):
+            if err is not None:
+                logger.debug('Looking up the TXT records of %s failed: %s', record_name, err)
+                continue
+            with self.recordIdLock:
+                for record in existing:
+                    if record.get('content') in unknown[record_name]:
+                        self.recordIds.setdefault((record_name, record['content']), []).append(record['id'])
+
+    def _run_concurrently(self, func: Callable[[Any], Any], items: Iterable) -> List[Tuple[Any, Exception]]:
+        """
+        Apply `func` to all items using up to `max_workers` threads.
+
+        :returns: A (result, error) tuple for every item, in the order of the items.
+        :rtype: list
+        """
+
+        def call(item):
+            try:
+                return func(item), None
+            except Exception as err:
+                return None, err
+
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [call(item) for item in items]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(call, items))
+
     def _call_api(self, api_method: str, method_params: dict = None) -> dict:
+        attempt = 0
+        while True:
+            try:
+                return self._call_api_once(api_method, method_params)
+            except _TransientError as err:
+                if attempt >= self.max_retries or not self.retryBudget.take():
+                    raise Exception(f'INWX API request failed: {err}')
+                delay = _retry_delay(attempt)
+                logger.debug('INWX API request %s failed (%s), retrying in %.1f seconds', api_method, err, delay)
+                self.metrics.increment('retries_total', reason='transient')
+                time.sleep(delay)
+                attempt += 1
+            except Exception as err:
+                raise Exception(f'INWX API request failed: {err}')
+
+    def _call_api_once(self, api_method: str, method_params: dict = None) -> dict:
+        """
+        Perform a single API request.
+
+        :raises _TransientError: if the request failed in a way that may succeed when retried
+        """
+
+        generation = self.sessionGeneration
+        result = self._send(api_method, method_params)
+        if result['code'] == self.AUTHENTICATION_ERROR and self._renew_reused_session(generation):
+            self.metrics.increment('retries_total', reason='session_expired')
+            result = self._send(api_method, method_params)
+        if result['code'] == self.AUTHENTICATION_ERROR:
+            self.sessionRejected = True
+        return _api_result(result)
+
+    def _send(self, api_method: str, method_params: dict = None) -> dict:
+        """
+        Send a single rate limited request to the API and record its duration and result code.
+
+        Requests are refused while the circuit breaker is open. Transport failures are raised
+        as `_TransientError` if the request can safely be repeated.
+        """
+
+        trial = self.circuitBreaker.check()
+        code = 'exception'
+        start = time.monotonic()
         try:
+            self.rateLimiter.acquire()
+            start = time.monotonic()
             result = self.inwx.call_api(api_method, method_params)
-            if result['code'] == 2201:
-                raise Exception(
-                    f'insufficient authorization. Have you added the \'DNS management\' role to your API account?')
-            elif result['code'] != 1000:
-                raise Exception(f"{result['msg']} ({result['code']})")
-            elif 'resData' in result:
-                return result['resData']
-            else:
-                return {}
-        except Exception as err:
-            raise Exception(f'INWX API request failed: {err}')
+            code = result['code']
+            return result
+        except requests.exceptions.RequestException as err:
+            if self._is_transient(api_method, err):
+                raise _TransientError(str(err))
+            raise
+        finally:
+            self.metrics.observe('api_request_duration_seconds', time.monotonic() - start, method=api_method)
+            self.metrics.increment('api_requests_total', method=api_method, code=code)
+            self.circuitBreaker.record(code not in self.TRANSIENT_ERRORS and code != 'exception', trial)
+
+    def _is_transient(self, api_method: str, err: requests.exceptions.RequestException) -> bool:
+        """
+        Decide whether a request failing with a transport error may be repeated.
+
+        Requests which are not idempotent are only repeated if they never reached the server.
+        """
+
+        if isinstance(err, requests.exceptions.ConnectTimeout):
+            return True
+        if api_method in self.NON_IDEMPOTENT_METHODS:
+            return False
+        if isinstance(err, requests.exceptions.HTTPError):
+            return _is_transient_status(api_method, err.response.status_code if err.response is not None else 0)
+        return isinstance(err, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    def _renew_reused_session(self, generation: int) -> bool:
+        """
+        Log in again once if the session taken from the session store has been rejected.
+
+        :param int generation: The session generation the rejected request was sent with.
+        :returns: Whether a new session has been established since that request.
+        :rtype: bool
+        """
+
+        with self.sessionLock:
+            if self.sessionGeneration != generation:
+                return True
+            if not self.sessionReused:
+                return False
+            logger.debug('Stored INWX API session has expired, logging in again')
+            self.sessionReused = False
+            self.inwx.api_session.cookies.clear()
+            self._login()
+            self.sessionGeneration += 1
+            return True
+
+    def _group_by_domain(self, records: list, failures: List[str]) -> dict:
+        """
+        Group records by their base domain, preserving the order of the records.
+
+        The base domains of distinct record names are looked up concurrently.
+
+        Records for which no base domain can be determined are reported in `failures`.
+
+        :param list records: Tuples whose first two elements are the source and the record name.
+        :param list failures: List to which a message is appended for every unresolvable record.
+        :returns: A mapping of base domain to the list of its records.
+        :rtype: dict
+        """
+
+        names = list(dict.fromkeys(record[1] for record in records))
+        domains = dict(zip(names, self._run_concurrently(self._find_domain, names)))
+
+        grouped = {}
+        for record in records:
+            source, record_name = record[0], record[1]
+            domain, err = domains[record_name]
+            if err is not None:
+                failures.append(f'{record_name} for {source}: {err}')
+                continue
+            grouped.setdefault(domain, []).append(record)
+        return grouped
 
     def _find_domain(self, record_name: str):
         """
         Find the base domain name for a given domain name.
-        
+
+        The base domain is looked up in the index of all zones of the account, which is
+        fetched once and only refreshed if a lookup misses.
+
         :param str record_name: The domain record name for which to find the corresponding base domain.
         :returns: The base domain name, if found.
         :rtype: str
         :raises certbot.errors.PluginError: if no matching domain is found.
         """
 
-        if record_name in self.recordCache:
-            return self.recordCache[record_name]
+        domain = self.recordCache.get(record_name)
+        if domain is not None:
+            return domain
 
-        # Get list of domain name candidates (stripping the TLD as those cannot be registered with INWX)
-        domain_name_guesses = dns_common.base_domain_name_guesses(record_name)[:-1]
+        with self.metrics.timed('zone_lookup_duration_seconds'):
+            index = self.zoneIndex
+            domain = index.lookup(record_name) if index is not None else None
+            self.metrics.cache_lookup('zone_index', domain is not None)
+            if domain is None:
+                logger.debug('No zone known for %s, refreshing zone index...', record_name)
+                try:
+                    domain = self._refresh_zone_index(index).lookup(record_name)
+                except Exception as err:
+                    raise errors.PluginError(f'Unable to determine base domain for {record_name}: {err}')
+            if domain is None:
+                raise errors.PluginError(
+                    f'Unable to determine base domain for {record_name}: no matching domain found')
 
-        # Iterate in reverse order so we begin with the most probable match
-        for guess in reversed(domain_name_guesses):
-            logging.debug(f'Testing {guess} for domain {record_name}...')
-            try:
-                info = self._call_api('nameserver.list', {'domain': guess})
-            except:
-                continue
-            if int(info['count']) > 0:
-                for domain in info['domains']:
-                    # Only consider an exact match and domains for which the INWX nameservers are the master
-                    if domain['domain'] == guess and domain['type'] == 'MASTER':
-                        self.recordCache[record_name] = guess
-                        return guess
-
-        raise errors.PluginError(
-            f'Unable to determine base domain for {record_name} using names: {domain_name_guesses}')
+        self.recordCache.set(record_name, domain)
+        return domain
+
+    def _refresh_zone_index(self, stale: Optional['_ZoneIndex']) -> '_ZoneIndex':
+        """
+        Replace the zone index unless another thread already replaced the given stale one.
+        """
+
+        with self.zoneIndexLock:
+            if self.zoneIndex is stale:
+                zones = self._list_zones()
+                self.zoneIndex = _ZoneIndex(zones)
+                if self.cache is not None:
+                    self.cache.set('zones', zones)
+            return self.zoneIndex
+
+    def _revalidate_domain(self, record_name: str, domain: str) -> Optional[str]:
+        """
+        Determine the base domain of a record again using a live zone index.
+
+        :returns: The live base domain if it differs from `domain`, otherwise None.
+        :rtype: str
+        """
+
+        index = self.zoneIndex
+        if index is not None and index.cached:
+            index = self._refresh_zone_index(index)
+        live = index.lookup(record_name) if index is not None else None
+        if live is None or live == domain:
+            return None
+        self.recordCache.set(record_name, live)
+        return live
+
+    def _list_zones(self) -> List[str]:
+        """
+        Fetch the names of all zones for which the INWX nameservers are the master.
+
+        :returns: The zone names.
+        :rtype: list
+        """
+
+        listing = _ZoneListing(self.ZONE_PAGE_LIMIT)
+        while listing.add(self._call_api('nameserver.list', listing.params())):
+            pass
+        return listing.zones
+
+
+class _ZoneIndex:
+    """
+    Longest suffix index over the zone names of an account.
+    """
+
+    def __init__(self, zones: Iterable[str], cached: bool = False) -> None:
+        """
+        :param list zones: The zone names.
+        :param bool cached: Whether the zone names were taken from the persistent cache.
+        """
+        self.zones = {zone.lower().rstrip('.') for zone in zones}
+        self.cached = cached
+
+    def lookup(self, record_name: str) -> Optional[str]:
+        """
+        Find the most specific zone the given name belongs to.
+
+        :param str record_name: The domain name to look up.
+        :returns: The zone name or None if the name does not belong to any zone.
+        :rtype: str
+        """
+
+        for guess in dns_common.base_domain_name_guesses(record_name.lower().rstrip('.')):
+            if guess in self.zones:
+                return guess
+        return None
+
+
+class _ZoneListing:
+    """
+    Collects the names of the zones for which the INWX nameservers are the master from the
+    pages of `nameserver.list`.
+    """
+
+    def __init__(self, page_limit: int) -> None:
+        """
+        :param int page_limit: The number of zones requested per page.
+        """
+        self.page_limit = page_limit
+        self.page = 1
+        self.fetched = 0
+        self.zones = []
+
+    def params(self) -> dict:
+        """
+        Return the parameters of the request for the next page.
+        """
+        return {'page': self.page, 'pagelimit': self.page_limit}
+
+    def add(self, info: dict) -> bool:
+        """
+        Add the zones of a page.
+
+        :param dict info: The result of the request for the page.
+        :returns: Whether further pages need to be fetched.
+        :rtype: bool
+        """
+        domains = info.get('domains', [])
+        self.fetched += len(domains)
+        self.zones.extend(domain['domain'] for domain in domains if domain['type'] == 'MASTER')
+        self.page += 1
+        return bool(domains) and self.fetched < int(info.get('count', 0))
@@ -0,0 +1,180 @@
+"""Crash-safe journal of the validation records created on this host."""
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+from certbot.compat import filesystem
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Distinguishes this process from earlier ones with the same PID, e.g. in a container started anew
+RUN_ID = uuid.uuid4().hex
+
+
+class Journal:
+    """
+    Append-only log of created and deleted records, one JSON object per line.
+
+    Every line is flushed to disk before the API request it follows is considered done, so
+    records created by a run which is killed before its cleanup are known to the next one.
+    Records are attributed to the run that created them; those of runs whose process is not
+    running anymore are left overs. Concurrent processes share the file under a lock. Failing
+    to access the journal is only logged.
+    """
+
+    # Age in seconds after which records are left overs even if their run seems to go on
+    MAX_AGE = 86400
+
+    def __init__(self, path: str) -> None:
+        """
+        :param str path: Path of the journal file. Its directory is created if necessary.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+    def created(self, zone: str, name: str, content: str, record_id: int) -> None:
+        """
+        Record that this process created, or took over, a record.
+        """
+        self._append({'op': 'create', 'zone': zone, 'name': name, 'content': content, 'id': record_id,
+                      'pid': os.getpid(), 'run': RUN_ID, 'time': time.time()})
+
+    def deleted(self, record_id: int) -> None:
+        """
+        Record that a record has been deleted.
+        """
+        self._append({'op': 'delete', 'id': record_id})
+
+    def outstanding(self) -> List[dict]:
+        """
+        Return the entries of all records which have been created but not deleted yet.
+        """
+        try:
+            with self._locked():
+                return list(self._read().values())
+        except OSError as err:
+            logger.warning('Unable to read the record journal %s: %s', self.path, err)
+            return []
+
+    def find(self, name: str, content: str) -> Optional[dict]:
+        """
+        Return the entry of an outstanding record with the given name and content, if any.
+        """
+        for entry in self.outstanding():
+            if entry['name'] == name and entry['content'] == content:
+                return entry
+        return None
+
+    def leftovers(self) -> List[dict]:
+        """
+        Return the outstanding records created by runs which are over or older than `MAX_AGE`.
+        """
+        now = time.time()
+        return [entry for entry in self.outstanding()
+                if now - entry['time'] > self.MAX_AGE or not _is_active(entry)]
+
+    def compact(self) -> None:
+        """
+        Rewrite the journal with only the outstanding records, removing it if there are none.
+        """
+        try:
+            with self._locked():
+                entries = self._read()
+                if not entries:
+                    if os.path.exists(self.path):
+                        os.unlink(self.path)
+                    return
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.journal-')
+                try:
+                    with os.fdopen(fd, 'w') as file:
+                        file.writelines(json.dumps(entry) + '\n' for entry in entries.values())
+                        file.flush()
+                        os.fsync(file.fileno())
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    with contextlib.suppress(OSError):
+                        os.unlink(tmp_path)
+                    raise
+        except OSError as err:
+            logger.warning('Unable to compact the record journal %s: %s', self.path, err)
+
+    def _append(self, entry: dict) -> None:
+        try:
+            with self._locked():
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                with os.fdopen(fd, 'a') as file:
+                    file.write(json.dumps(entry) + '\n')
+                    file.flush()
+                    os.fsync(file.fileno())
+        except OSError as err:
+            logger.warning('Unable to write to the record journal %s: %s', self.path, err)
+
+    def _read(self) -> Dict[int, dict]:
+        entries = {}
+        try:
+            with open(self.path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                        if entry['op'] == 'create':
+                            entries[entry['id']] = entry
+                        else:
+                            entries.pop(entry['id'], None)
+                    except (ValueError, KeyError, TypeError):
+                        # A line torn by a crash while it was written
+                        continue
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            logger.warning('Unable to read the record journal %s: %s', self.path, err)
+        return entries
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if not os.path.isdir(directory):
+                filesystem.makedirs(directory, 0o700)
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _is_active(entry: dict) -> bool:
+    """
+    Decide whether the run which created a journal entry may still be going on.
+    """
+    if entry['pid'] == os.getpid():
+        # Entries of an earlier process with the same PID, or without a run ID, are left over
+        return entry.get('run') == RUN_ID
+    return _is_running(entry['pid'])
+
+
+def _is_running(pid: int) -> bool:
+    if os.name == 'nt':
+        # Signalling a process on Windows terminates it, rely on the age of the records instead
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,163 @@
+"""Bounded in-memory caches shared by the plugin's process wide state."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from certbot_dns_inwx._internal.metrics import Metrics
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe mapping bounded in size and age.
+
+    Every entry expires after its own TTL. When the cache is full, the least recently used
+    entry is evicted. Lookups are counted as hits and misses, both in the statistics of the
+    cache and, if given, in the metrics of the plugin. Item access and membership tests behave
+    like those of a dictionary but are not counted.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl: float = 3600,
+                 metrics: Optional[Metrics] = None,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None) -> None:
+        """
+        :param str name: Name of the cache in the statistics and metrics.
+        :param int max_entries: Maximum number of entries kept.
+        :param float ttl: Default number of seconds an entry stays valid.
+        :param Metrics metrics: Metrics to count lookups and evictions in.
+        :param callable on_evict: Called with the key and value of every entry which is evicted,
+                                  expires, is invalidated or replaced, e.g. to release its resources.
+        """
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.metrics = metrics
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(('hits', 'misses', 'evictions', 'expirations', 'invalidations'), 0)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the value stored for the given key, or `default` if it is unknown or has expired.
+        """
+        value = self._lookup(key)
+        hit = value is not _MISSING
+        with self.lock:
+            self.counts['hits' if hit else 'misses'] += 1
+        if self.metrics is not None:
+            self.metrics.cache_lookup(self.name, hit)
+        return value if hit else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        :param float ttl: Number of seconds the entry stays valid instead of the default.
+        """
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        released = []
+        with self.lock:
+            replaced = self.entries.get(key)
+            if replaced is not None and replaced[0] is not value:
+                released.append((key, replaced[0]))
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            evicted = 0
+            while len(self.entries) > self.max_entries:
+                evicted_key, (evicted_value, _) = self.entries.popitem(last=False)
+                released.append((evicted_key, evicted_value))
+                evicted += 1
+            self.counts['evictions'] += evicted
+        if evicted:
+            self._count_eviction('size', evicted)
+        self._release(released)
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Forget the entry of the given key, typically after it led to an API error.
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            self.counts['invalidations'] += 1
+        self._count_eviction('invalidated')
+        self._release([(key, entry[0])])
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove and return the value stored for the given key, even if it has expired.
+
+        The removal is neither counted nor reported to `on_evict`; the caller takes over the value.
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def keys(self) -> List[Hashable]:
+        """
+        Return the keys of all entries, including expired ones which have not been removed yet.
+        """
+        with self.lock:
+            return list(self.entries)
+
+    def clear(self) -> None:
+        """
+        Forget all entries and statistics, without reporting the entries to `on_evict`.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.counts = dict.fromkeys(self.counts, 0)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of hits, misses, evictions, expirations and invalidations and the current size.
+
+        :rtype: dict
+        """
+        with self.lock:
+            return dict(self.counts, size=len(self.entries))
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+    def _lookup(self, key: Hashable) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                self.counts['expirations'] += 1
+            else:
+                self.entries.move_to_end(key)
+                return value
+        self._count_eviction('expired')
+        self._release([(key, value)])
+        return _MISSING
+
+    def _count_eviction(self, reason: str, amount: int = 1) -> None:
+        if self.metrics is not None:
+            self.metrics.increment('cache_evictions_total', amount, cache=self.name, reason=reason)
+
+    def _release(self, entries: List[tuple]) -> None:
+        if self.on_evict is not None:
+            for key, value in entries:
+                self.on_evict(key, value)
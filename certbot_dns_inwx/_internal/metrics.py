@@ -0,0 +1,190 @@
+"""Collection and export of metrics about the work done by the plugin."""
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'certbot_dns_inwx_'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DESCRIPTIONS = {
+    'api_request_duration_seconds': 'Duration of INWX API requests.',
+    'api_requests_total': 'Number of INWX API requests by method and result code.',
+    'zone_lookup_duration_seconds': 'Duration of base domain lookups.',
+    'cname_resolution_duration_seconds': 'Duration of CNAME resolution stages.',
+    'cache_requests_total': 'Number of cache lookups by cache and result.',
+    'cache_evictions_total': 'Number of entries removed from in-memory caches by cache and reason.',
+    'retries_total': 'Number of retried operations by reason.',
+    'records_reconciled_total': 'Number of existing TXT records reused or deleted by action.',
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and latency histograms.
+
+    Metrics are identified by a name and a set of labels. They can be exported as a JSON
+    summary or in the Prometheus text format understood by node_exporter's textfile collector.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        """Increase a counter."""
+        key = self._labels(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record a value, typically a duration in seconds, in a histogram."""
+        key = self._labels(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextlib.contextmanager
+    def timed(self, name: str, **labels: str) -> Iterator[None]:
+        """Record the duration of the enclosed block in a histogram."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    def cache_lookup(self, cache: str, hit: bool) -> None:
+        """Count a hit or miss of the given cache."""
+        self.increment('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    def counts(self, name: str, label: str) -> Dict[str, float]:
+        """
+        Sum up a counter by the values of one of its labels.
+
+        :rtype: dict
+        """
+        totals = {}
+        with self.lock:
+            for key, value in self.counters.get(name, {}).items():
+                group = dict(key).get(label)
+                totals[group] = totals.get(group, 0) + value
+        return totals
+
+    def mean(self, name: str) -> Optional[float]:
+        """
+        Return the mean of all values recorded in a histogram, or None if it is empty.
+        """
+        with self.lock:
+            series = self.histograms.get(name, {}).values()
+            count = sum(histogram['count'] for histogram in series)
+            return sum(histogram['sum'] for histogram in series) / count if count else None
+
+    def reset(self) -> None:
+        """Forget all recorded values."""
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def to_json(self) -> dict:
+        """
+        Summarize all metrics including the hit ratio of each cache.
+
+        :rtype: dict
+        """
+        with self.lock:
+            summary = {
+                'counters': {name: [{'labels': dict(key), 'value': value} for key, value in sorted(series.items())]
+                             for name, series in sorted(self.counters.items())},
+                'histograms': {name: [{'labels': dict(key), 'count': histogram['count'],
+                                       'sum': round(histogram['sum'], 6),
+                                       'buckets': dict(zip((str(bound) for bound in BUCKETS),
+                                                           histogram['buckets']))}
+                                      for key, histogram in sorted(series.items())]
+                               for name, series in sorted(self.histograms.items())},
+            }
+            caches = {}
+            for key, value in self.counters.get('cache_requests_total', {}).items():
+                labels = dict(key)
+                caches.setdefault(labels['cache'], {'hit': 0, 'miss': 0})[labels['result']] += value
+        summary['cache_hit_ratios'] = {cache: round(counts['hit'] / (counts['hit'] + counts['miss']), 4)
+                                       for cache, counts in sorted(caches.items())}
+        return summary
+
+    def to_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        :rtype: str
+        """
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                self._header(lines, name, 'counter')
+                for key, value in sorted(series.items()):
+                    lines.append(f'{PREFIX}{name}{self._format(key)} {value}')
+            for name, series in sorted(self.histograms.items()):
+                self._header(lines, name, 'histogram')
+                for key, histogram in sorted(series.items()):
+                    for bound, count in zip(BUCKETS, histogram['buckets']):
+                        lines.append(f'{PREFIX}{name}_bucket{self._format(key + (("le", str(bound)),))} {count}')
+                    lines.append(f'{PREFIX}{name}_bucket{self._format(key + (("le", "+Inf"),))} '
+                                 f'{histogram["count"]}')
+                    lines.append(f'{PREFIX}{name}_sum{self._format(key)} {histogram["sum"]}')
+                    lines.append(f'{PREFIX}{name}_count{self._format(key)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """
+        Atomically write all metrics to a file.
+
+        Files ending in `.prom` are written in the Prometheus text format, all others as JSON.
+        Failures are logged but never raised.
+        """
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_json(), indent=2) + '\n'
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.metrics-')
+            try:
+                with os.fdopen(fd, 'w') as file:
+                    file.write(content)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+                raise
+        except OSError as err:
+            logger.warning('Unable to write metrics to %s: %s', path, err)
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _format(key: Labels) -> str:
+        if not key:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in key)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + '}'
+
+    @staticmethod
+    def _header(lines: list, name: str, metric_type: str) -> None:
+        if name in DESCRIPTIONS:
+            lines.append(f'# HELP {PREFIX}{name} {DESCRIPTIONS[name]}')
+        lines.append(f'# TYPE {PREFIX}{name} {metric_type}')
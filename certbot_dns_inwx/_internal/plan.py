@@ -0,0 +1,158 @@
+"""Dry run reporting what performing and cleaning up the challenges of a certificate would cost.
+
+Only read requests are sent to the INWX API: CNAMEs are followed, zones are looked up and the
+existing TXT records of every zone are fetched, exactly like a real run would do. The records
+to be created and deleted are then reported together with the expected API calls and time.
+"""
+import argparse
+import json
+import logging
+import math
+import sys
+import time
+from typing import List
+
+from certbot import errors
+
+from certbot_dns_inwx._internal import standalone
+from certbot_dns_inwx._internal.dns_inwx import Authenticator, _choose_ttls
+
+logger = logging.getLogger(__name__)
+
+# Assumed duration of an API request if no request had to be sent while planning
+DEFAULT_LATENCY = 0.1
+
+
+def make_plan(authenticator: Authenticator, domains: List[str]) -> dict:
+    """
+    Plan the challenges of a certificate for the given domains without changing any DNS records.
+
+    :returns: The planned records, the affected zones, the API calls per method and the estimated seconds.
+    :rtype: dict
+    """
+    metrics = Authenticator.metrics
+    before = metrics.counts('api_requests_total', 'method')
+    start = time.monotonic()
+
+    challenges = [(domain, '_acme-challenge.' + domain[2:] if domain.startswith('*.') else '_acme-challenge.' + domain)
+                  for domain in domains]
+    cache = authenticator._get_persistent_cache()
+    warm_names = {validation_name for _, validation_name in challenges
+                  if validation_name in Authenticator.nameCache
+                  or (cache is not None and cache.get('cname:' + validation_name) is not None)}
+    resolved = authenticator._resolve_validation_names({validation_name: domain
+                                                        for domain, validation_name in challenges})
+
+    clients = {}
+    logins = 0
+    records = []
+    zones = {}
+    for domain, validation_name in challenges:
+        record_name = resolved[validation_name]
+        account = authenticator._get_account(record_name)
+        if account not in clients:
+            clients[account] = authenticator._get_inwx_client(account)
+            logins += 0 if clients[account].sessionReused else 1
+        client = clients[account]
+
+        index = client.zoneIndex
+        warm_zone = record_name in client.recordCache or (index is not None and index.lookup(record_name) is not None)
+        record = {'domain': domain, 'validation_name': validation_name, 'record_name': record_name,
+                  'account': account, 'cname_cache': 'warm' if validation_name in warm_names else 'cold',
+                  'zone_cache': 'warm' if warm_zone else 'cold', 'zone': None, 'ttl': None, 'error': None}
+        try:
+            record['zone'] = client._find_domain(record_name)
+        except errors.PluginError as err:
+            record['error'] = str(err)
+        records.append(record)
+        if record['zone'] is not None:
+            zones.setdefault((account, record['zone']), []).append(record)
+
+    zone_plans = []
+    for (account, zone), zone_records in zones.items():
+        record_ttls = {authenticator._get_ttl(record['record_name']) for record in zone_records}
+        snapshot, negative_ttl = clients[account]._inspect_zone(zone, record_ttls)
+        names = {record['record_name'] for record in zone_records}
+        ttls = _choose_ttls(zone, record_ttls, negative_ttl)
+        for record in zone_records:
+            record['ttl'] = ttls[authenticator._get_ttl(record['record_name'])]
+        zone_plans.append({'account': account, 'zone': zone, 'records': len(zone_records),
+                           'negative_ttl': negative_ttl,
+                           'existing_challenge_records': sum(1 for existing in snapshot
+                                                             if existing['name'].startswith('_acme-challenge.')
+                                                             or existing['name'] in names)})
+    discovery = time.monotonic() - start
+
+    planned = sum(1 for record in records if record['error'] is None)
+    reads = {method: count - before.get(method, 0)
+             for method, count in metrics.counts('api_requests_total', 'method').items()
+             if count > before.get(method, 0)}
+    calls = {'account.login': logins, **reads}
+    calls['nameserver.createRecord'] = calls.get('nameserver.createRecord', 0) + planned
+    calls['nameserver.deleteRecord'] = calls.get('nameserver.deleteRecord', 0) + planned
+
+    latency = metrics.mean('api_request_duration_seconds') or DEFAULT_LATENCY
+    workers = max(1, authenticator.conf('max-workers') or 1)
+    rate = authenticator.conf('rate-limit')
+
+    def batch_seconds(count: int) -> float:
+        seconds = math.ceil(count / workers) * latency
+        return max(seconds, count / rate) if rate else seconds
+
+    return {
+        'records': records,
+        'zones': zone_plans,
+        'api_calls': dict(sorted(calls.items())),
+        'estimated_seconds': {
+            'perform': round(discovery + batch_seconds(planned), 3),
+            'propagation': authenticator.conf('propagation-seconds'),
+            'cleanup': round(batch_seconds(planned), 3),
+        },
+    }
+
+
+def format_plan(plan: dict) -> str:
+    """
+    Render a plan as a human readable report.
+    """
+    lines = ['Records to create (and delete on cleanup):']
+    for record in plan['records']:
+        target = f"zone {record['zone']}, TTL {record['ttl']}" if record['error'] is None else record['error']
+        account = f" via account {record['account']}" if record['account'] else ''
+        lines.append(f"  {record['record_name']} for {record['domain']}{account}: {target} "
+                     f"(CNAME cache {record['cname_cache']}, zone cache {record['zone_cache']})")
+    lines.append('Zones:')
+    for zone in plan['zones']:
+        lines.append(f"  {zone['zone']}: {zone['records']} record(s), {zone['existing_challenge_records']} "
+                     f"existing challenge record(s), negative TTL {zone['negative_ttl']}")
+    lines.append('API calls:')
+    for method, count in plan['api_calls'].items():
+        lines.append(f'  {method}: {count}')
+    lines.append('Estimated seconds: ' + ', '.join(f'{stage} {seconds}'
+                                                   for stage, seconds in plan['estimated_seconds'].items()))
+    return '\n'.join(lines)
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-d', '--domain', action='append', required=True, dest='domains',
+                        help='Domain of the certificate, may be given multiple times.')
+    parser.add_argument('--json', action='store_true', help='Print the plan as JSON.')
+    standalone.add_arguments(parser)
+    parsed = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    try:
+        authenticator = standalone.make_authenticator(parsed, 'domains', 'json')
+        authenticator._setup_credentials()
+        plan = make_plan(authenticator, parsed.domains)
+    except errors.Error as err:
+        logger.error('%s', err)
+        return 1
+
+    print(json.dumps(plan, indent=2) if parsed.json else format_plan(plan))
+    return 1 if any(record['error'] for record in plan['records']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Active checking of the propagation of validation records to the authoritative nameservers.
+
+This module requires the optional dependency dnspython.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Set, Tuple
+
+import dns.exception
+import dns.message
+import dns.name
+import dns.query
+import dns.rdatatype
+import dns.resolver
+
+logger = logging.getLogger(__name__)
+
+
+class PropagationChecker:
+    """
+    Polls the authoritative nameservers of the affected zones until all validation records
+    are served by every one of them.
+    """
+
+    QUERY_TIMEOUT = 2.0
+
+    def __init__(self, timeout: float, max_workers: int = 8, initial_delay: float = 1.0,
+                 max_delay: float = 8.0) -> None:
+        """
+        :param float timeout: Maximum number of seconds to wait for the records.
+        :param int max_workers: Maximum number of DNS queries sent concurrently.
+        :param float initial_delay: Seconds to wait after the first unsuccessful round.
+        :param float max_delay: Upper bound of the exponentially growing delay between rounds.
+        """
+        self.timeout = timeout
+        self.max_workers = max(1, max_workers)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.nameservers = {}
+
+    def wait(self, records: List[Tuple[str, str, str]]) -> bool:
+        """
+        Wait until all records are visible on all authoritative nameservers of their zone.
+
+        Records sharing a name, like those of a domain and its wildcard, are checked with a
+        single query per nameserver. Records whose nameservers cannot be determined are never
+        considered visible, so the full timeout is waited for them.
+
+        :param list records: Tuples of (zone, record_name, record_content).
+        :returns: Whether all records became visible before the timeout.
+        :rtype: bool
+        """
+        deadline = time.monotonic() + self.timeout
+        pending = {}
+        for zone, name, content in records:
+            pending.setdefault((zone, name), set()).add(content)
+        delay = self.initial_delay
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                checks = [(key, server) for key in pending for server in self._get_nameservers(key[0])]
+                visible = dict.fromkeys(pending, True)
+                results = executor.map(lambda check: self._is_visible(check[0][1], pending[check[0]], check[1]),
+                                       checks)
+                for (key, _), result in zip(checks, results):
+                    visible[key] = visible[key] and result
+                for key, result in visible.items():
+                    if result and self.nameservers.get(key[0]):
+                        logger.debug('TXT record(s) %s are served by all nameservers of %s', key[1], key[0])
+                        del pending[key]
+
+                remaining = deadline - time.monotonic()
+                if not pending or remaining <= 0:
+                    return not pending
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, self.max_delay)
+
+    def _get_nameservers(self, zone: str) -> List[str]:
+        """
+        Determine the addresses of the authoritative nameservers of a zone, once per zone.
+        """
+        if zone not in self.nameservers:
+            addresses = []
+            try:
+                for ns in dns.resolver.resolve(zone, dns.rdatatype.NS):
+                    addresses.extend(self._resolve_address(ns.target))
+            except dns.exception.DNSException as err:
+                logger.warning('Unable to determine the nameservers of %s: %s', zone, err)
+            self.nameservers[zone] = sorted(set(addresses))
+        return self.nameservers[zone]
+
+    @staticmethod
+    def _resolve_address(host: dns.name.Name) -> List[str]:
+        for rdtype in (dns.rdatatype.A, dns.rdatatype.AAAA):
+            try:
+                return [rdata.address for rdata in dns.resolver.resolve(host, rdtype)]
+            except dns.exception.DNSException:
+                continue
+        return []
+
+    def _is_visible(self, name: str, contents: Set[str], server: str) -> bool:
+        """
+        Check whether the given nameserver serves all of the TXT values of a name.
+        """
+        query = dns.message.make_query(name, dns.rdatatype.TXT)
+        try:
+            response, _ = dns.query.udp_with_fallback(query, server, timeout=self.QUERY_TIMEOUT)
+        except (dns.exception.DNSException, OSError) as err:
+            logger.debug('Querying %s for %s failed: %s', server, name, err)
+            return False
+        return contents.issubset(self._txt_values(response))
+
+    @staticmethod
+    def _txt_values(response: dns.message.Message) -> List[str]:
+        values = []
+        for rrset in response.answer:
+            if rrset.rdtype == dns.rdatatype.TXT:
+                values.extend(b''.join(rdata.strings).decode('utf-8', 'replace') for rdata in rrset)
+        return values
@@ -0,0 +1,71 @@
+"""Persistence of authenticated INWX API sessions across certbot runs."""
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Stores the cookies of an authenticated API session in a file only readable by its owner.
+    """
+
+    def __init__(self, path: str, max_age: float = 86400) -> None:
+        """
+        :param str path: Path of the session file.
+        :param float max_age: Number of seconds after which a stored session is no longer used.
+        """
+        self.path = path
+        self.max_age = max_age
+
+    def load(self, url: str, username: str) -> Optional[List[dict]]:
+        """
+        Return the stored cookies of a session of the given account.
+
+        :returns: The cookies or None if there is no usable session.
+        :rtype: list
+        """
+        try:
+            with open(self.path, 'r') as file:
+                content = json.load(file)
+            if content['url'] != url or content['username'] != username:
+                return None
+            if content['saved'] + self.max_age <= time.time():
+                return None
+            return [{'name': cookie['name'], 'value': cookie['value'], 'domain': cookie['domain'],
+                     'path': cookie['path']} for cookie in content['cookies']]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            logger.debug('Ignoring unusable session file %s: %s', self.path, err)
+            return None
+
+    def save(self, url: str, username: str, cookies: List[dict]) -> None:
+        """
+        Store the cookies of a session of the given account, replacing the file atomically.
+        """
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                            prefix='.inwx-session-')
+            try:
+                with os.fdopen(fd, 'w') as file:
+                    json.dump({'url': url, 'username': username, 'saved': time.time(), 'cookies': cookies}, file)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+                raise
+        except OSError as err:
+            logger.warning('Unable to store INWX API session in %s: %s', self.path, err)
+
+    def discard(self) -> None:
+        """
+        Remove the stored session.
+        """
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
@@ -0,0 +1,42 @@
+"""Helpers for entry points running the authenticator outside of certbot."""
+import argparse
+import logging
+import types
+
+from certbot.compat import misc
+
+from certbot_dns_inwx._internal.dns_inwx import Authenticator
+
+logger = logging.getLogger(__name__)
+
+
+class StandaloneAuthenticator(Authenticator):
+    """
+    Authenticator without a certbot display, reporting progress to the log instead.
+    """
+
+    def _notify(self, message: str) -> None:
+        logger.info(message)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the plugin options, without their `--dns-inwx-` prefix, and the work directory to the parser.
+    """
+    parser.add_argument('--work-dir', default=misc.get_default_folder('work'),
+                        help='Directory of the persistent cache.')
+    Authenticator.add_parser_arguments(
+        lambda name, **kwargs: name != 'daemon-socket' and parser.add_argument('--' + name, **kwargs))
+
+
+def make_authenticator(args: argparse.Namespace, *ignored: str) -> Authenticator:
+    """
+    Create an authenticator from a command line parsed with the arguments of :func:`add_arguments`.
+
+    :param ignored: Names of further parsed arguments which are no plugin options.
+    """
+    options = {name: value for name, value in vars(args).items() if name not in ('work_dir', *ignored)}
+    options['daemon_socket'] = None
+    config = types.SimpleNamespace(work_dir=args.work_dir,
+                                   **{'dns_inwx_' + name: value for name, value in options.items()})
+    return StandaloneAuthenticator(config, 'dns-inwx')
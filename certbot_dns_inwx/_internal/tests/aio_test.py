@@ -0,0 +1,267 @@
+"""Tests for certbot_dns_inwx._internal.aio."""
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+import pytest
+from certbot import errors
+
+from certbot_dns_inwx._internal.aio import AsyncINWXClient, EventLoopThread
+from certbot_dns_inwx._internal.tests.fake_domrobot import FakeDomrobot
+
+ZONES = ['a.test', 'b.test']
+
+
+class AsyncINWXClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = FakeDomrobot(ZONES).start()
+        self.addCleanup(self.server.stop)
+
+    def _client(self, **kwargs) -> AsyncINWXClient:
+        return AsyncINWXClient(self.server.url, 'user', 'password', None, **kwargs)
+
+    def test_add_del_txt_records(self):
+        async def run():
+            async with self._client(max_workers=4) as client:
+                await client.add_txt_records([('a', '_acme.a.test', 'content-a', 600),
+                                              ('b', '_acme.x.b.test', 'content-b', 600),
+                                              ('c', '_acme.a.test', 'content-c', 600)])
+                created = self.server.records()
+                await client.del_txt_records([('a', '_acme.a.test', 'content-a'),
+                                              ('b', '_acme.x.b.test', 'content-b'),
+                                              ('c', '_acme.a.test', 'content-c')])
+            return created
+
+        created = asyncio.run(run())
+        assert sorted((record['domain'], record['name'], record['content'], record['ttl']) for record in created) == [
+            ('a.test', '_acme.a.test', 'content-a', 600),
+            ('a.test', '_acme.a.test', 'content-c', 600),
+            ('b.test', '_acme.x.b.test', 'content-b', 600),
+        ]
+        assert self.server.records() == []
+        assert self.server.calls == {'account.login': 1, 'nameserver.list': 1, 'nameserver.info': 2,
+                                     'nameserver.createRecord': 3, 'nameserver.deleteRecord': 3}
+
+    def test_journal_off_loop(self):
+        threads = []
+        journal = mock.MagicMock()
+        for operation in (journal.leftovers, journal.created, journal.find, journal.deleted, journal.compact):
+            operation.side_effect = lambda *args: threads.append(threading.current_thread())
+        journal.leftovers.side_effect = lambda: threads.append(threading.current_thread()) or []
+
+        async def run():
+            async with self._client(journal=journal) as client:
+                await client.add_txt_records([('a', '_acme.a.test', 'content', 300)])
+                await client.del_txt_records([('a', '_acme.a.test', 'content'), ('b', '_acme.b.test', 'content')])
+
+        with pytest.raises(errors.PluginError, match='removed/altered'):
+            asyncio.run(run())
+        assert sorted(call[0] for call in journal.mock_calls) == ['compact', 'created', 'deleted', 'find', 'leftovers']
+        # The blocking file operations of the journal do not run on the event loop's thread
+        assert threading.current_thread() not in threads
+
+    def test_add_txt_records_partial_failure(self):
+        async def run():
+            async with self._client() as client:
+                await client.add_txt_records([('a', '_acme.a.test', 'content', 600),
+                                              ('c', '_acme.c.unknown', 'content', 600)])
+
+        with pytest.raises(errors.PluginError) as err:
+            asyncio.run(run())
+        assert '_acme.c.unknown for c: Unable to determine base domain' in str(err.value)
+        assert len(self.server.records('a.test')) == 1
+
+    def test_del_txt_record_unknown_id(self):
+        self.server.zones['a.test'][99] = {'id': 99, 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content',
+                                           'ttl': 300}
+
+        async def run():
+            async with self._client() as client:
+                await client.del_txt_record('a', '_acme.a.test', 'content')
+                with pytest.raises(errors.PluginError, match='removed/altered'):
+                    await client.del_txt_record('a', '_acme.a.test', 'content')
+
+        asyncio.run(run())
+        assert self.server.records() == []
+
+    def test_concurrency_limit(self):
+        self.server.latency = 0.02
+
+        async def run():
+            async with self._client(max_workers=2) as client:
+                await client.add_txt_records([('s', f'_acme{i}.a.test', 'content', 300) for i in range(8)])
+
+        asyncio.run(run())
+        assert self.server.peak_in_flight == 2
+
+    def test_add_txt_records_cancelled(self):
+        self.server.latency = 0.05
+
+        async def run():
+            async with self._client(max_workers=4) as client:
+                task = asyncio.ensure_future(client.add_txt_records(
+                    [('s', f'_acme{i}.a.test', 'content', 300) for i in range(8)]))
+                while not self.server.calls['nameserver.createRecord']:
+                    await asyncio.sleep(0.01)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                return client.recordIds
+
+        assert asyncio.run(run()) == {}
+        assert self.server.calls['nameserver.createRecord'] > 0
+        assert self.server.records() == []
+
+    def test_del_txt_records_cancelled(self):
+        self.server.latency = 0.05
+
+        async def run():
+            async with self._client(max_workers=4) as client:
+                records = [('s', f'_acme{i}.a.test', 'content') for i in range(4)]
+                await client.add_txt_records([record + (300,) for record in records])
+                task = asyncio.ensure_future(client.del_txt_records(records))
+                await asyncio.sleep(0.01)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                # The deletions go on in the background
+                for _ in range(100):
+                    if not self.server.records():
+                        break
+                    await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        assert self.server.records() == []
+
+    @mock.patch('random.uniform', return_value=0)
+    def test_transient_retry(self, unused_uniform_mock):
+        async def run():
+            async with self._client(max_retries=2) as client:
+                self.server.error_rate = 1.0
+                with pytest.raises(errors.PluginError, match='Injected failure'):
+                    await client.add_txt_records([('a', '_acme.a.test', 'content', 300)])
+
+        asyncio.run(run())
+        assert self.server.calls['nameserver.list'] == 3
+
+    def test_circuit_open(self):
+        async def run():
+            async with self._client() as client:
+                self.server.error_rate = 1.0
+                for _ in range(client.circuitBreaker.threshold):
+                    with pytest.raises(errors.PluginError, match='Injected failure'):
+                        await client.add_txt_record('a', '_acme.a.test', 'content', 300)
+                with pytest.raises(errors.PluginError, match='not contacted'):
+                    await client.add_txt_record('a', '_acme.a.test', 'content', 300)
+                return client.circuitBreaker.threshold
+
+        threshold = asyncio.run(run())
+        assert self.server.calls['nameserver.list'] == threshold
+
+    def test_session_renewed(self):
+        self.server.session_lifetime = 0.5
+
+        async def run():
+            async with self._client() as client:
+                await client.add_txt_record('a', '_acme.a.test', 'content', 300)
+                await asyncio.sleep(0.6)
+                await client.del_txt_record('a', '_acme.a.test', 'content')
+                return client.sessionRejected
+
+        assert asyncio.run(run()) is False
+        assert self.server.calls['account.login'] == 2
+        assert self.server.records() == []
+
+    def test_stale_cached_zone(self):
+        cache = mock.MagicMock()
+        cache.get.return_value = ['test']
+
+        async def run():
+            async with self._client(cache=cache) as client:
+                await client.add_txt_records([('a', '_acme.a.test', 'content', 300)])
+
+        asyncio.run(run())
+        assert [record['name'] for record in self.server.records('a.test')] == ['_acme.a.test']
+        cache.set.assert_called_once_with('zones', ZONES)
+
+    def test_leftovers_deleted(self):
+        self.server.zones['a.test'][99] = {'id': 99, 'name': '_acme.a.test', 'type': 'TXT', 'content': 'old',
+                                           'ttl': 300}
+        journal = mock.MagicMock()
+        journal.leftovers.return_value = [{'zone': 'a.test', 'name': '_acme.a.test', 'content': 'old', 'id': 99}]
+
+        async def run():
+            async with self._client(journal=journal) as client:
+                await client.add_txt_records([('a', '_acme.a.test', 'content', 300)])
+                await client.add_txt_records([('b', '_acme.b.test', 'content', 300)])
+
+        asyncio.run(run())
+        assert [record['content'] for record in self.server.records('a.test')] == ['content']
+        journal.leftovers.assert_called_once_with()
+        journal.deleted.assert_called_once_with(99)
+        journal.compact.assert_called_once_with()
+
+    def test_login_failure(self):
+        self.server.error_rate = 1.0
+        self.server.error_code = 2200
+
+        async def run():
+            async with self._client():
+                pass
+
+        with pytest.raises(errors.PluginError, match='INWX login failed: Injected failure'):
+            asyncio.run(run())
+
+    def test_connection_failure(self):
+        self.server.stop()
+        self.addCleanup(self.server.start)
+        client = self._client(max_retries=0)
+
+        async def run():
+            try:
+                await client.login()
+            finally:
+                await client.close()
+
+        with pytest.raises(errors.PluginError, match='INWX login failed'):
+            asyncio.run(run())
+
+
+class EventLoopThreadTest(unittest.TestCase):
+    def test_run(self):
+        loop = EventLoopThread()
+
+        async def answer():
+            await asyncio.sleep(0)
+            return 42
+
+        assert loop.run(answer()) == 42
+
+    def test_run_interrupted(self):
+        loop = EventLoopThread()
+        started = asyncio.run_coroutine_threadsafe(asyncio.sleep(0), loop.loop)
+        started.result()
+        cancelled = []
+
+        async def wait():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with mock.patch('concurrent.futures.Future.result', side_effect=KeyboardInterrupt):
+            with pytest.raises(KeyboardInterrupt):
+                loop.run(wait())
+        for _ in range(100):
+            if cancelled:
+                break
+            time.sleep(0.01)
+        assert cancelled == [True]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
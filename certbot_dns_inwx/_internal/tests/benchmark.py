@@ -0,0 +1,128 @@
+"""Offline benchmark of Authenticator.perform/cleanup against a local Domrobot stand-in.
+
+Run e.g. ``python -m certbot_dns_inwx._internal.tests.benchmark --sans 1 10 100 500 --latency 0.02``.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from typing import List
+
+from acme import messages
+from certbot import achallenges
+from certbot.compat import os
+from certbot.plugins import dns_test_common
+from certbot.tests import acme_util
+from certbot.tests import util as test_util
+
+from certbot_dns_inwx._internal.dns_inwx import Authenticator
+from certbot_dns_inwx._internal.tests.fake_domrobot import FakeDomrobot
+
+
+def make_achalls(sans: int, zones: List[str]) -> List[achallenges.KeyAuthorizationAnnotatedChallenge]:
+    """Create one dns-01 challenge per name, spreading the names over the given zones."""
+    return [achallenges.KeyAuthorizationAnnotatedChallenge(
+        challb=acme_util.DNS01,
+        identifier=messages.Identifier(typ=messages.IDENTIFIER_FQDN, value=f'host{i}.{zones[i % len(zones)]}'),
+        account_key=dns_test_common.KEY) for i in range(sans)]
+
+
+def make_config(workdir: str, url: str, **options) -> types.SimpleNamespace:
+    """
+    Create a configuration with the defaults of all plugin options and a credentials file.
+
+    :param dict options: Plugin options to override, named like their attribute without prefix.
+    """
+    defaults = {}
+    Authenticator.add_parser_arguments(lambda name, **kwargs: defaults.__setitem__(name, kwargs.get('default')))
+    credentials = os.path.join(workdir, 'inwx.cfg')
+    dns_test_common.write({'dns_inwx_url': url, 'dns_inwx_username': 'bench', 'dns_inwx_password': 'bench',
+                           'dns_inwx_shared_secret': 'unused'}, credentials)
+    defaults.update({'credentials': credentials, 'propagation-seconds': 0, 'follow-cnames': False})
+    defaults.update({name.replace('_', '-'): value for name, value in options.items()})
+    return types.SimpleNamespace(work_dir=workdir, config_dir=workdir,
+                                 **{'dns_inwx_' + name.replace('-', '_'): value for name, value in defaults.items()})
+
+
+def reset_caches() -> None:
+    """Forget all process wide state of the plugin, so every run starts cold."""
+    Authenticator._close_async_clients()
+    Authenticator.clientCache.clear()
+    Authenticator.clientUsers = {}
+    Authenticator.discardedClients = set()
+    Authenticator.nameCache.clear()
+    Authenticator.persistentCache = {}
+    Authenticator.cnameResolver = None
+
+
+def run(sans: int, zones: int = 10, latency: float = 0.0, error_rate: float = 0.0, **options) -> dict:
+    """
+    Drive a full perform/cleanup cycle for a certificate with `sans` names.
+
+    :returns: Wall times, API call counts and the peak memory of the cycle.
+    :rtype: dict
+    """
+    zone_names = [f'zone{i}.test' for i in range(zones)]
+    reset_caches()
+    with FakeDomrobot(zone_names, latency=latency, error_rate=error_rate, seed=0) as server, \
+            tempfile.TemporaryDirectory() as workdir, test_util.patch_display_util():
+        options.setdefault('rate_limit', 0)
+        auth = Authenticator(make_config(workdir, server.url, **options), 'dns-inwx')
+        achalls = make_achalls(sans, zone_names)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        error = None
+        try:
+            auth.perform(achalls)
+            performed = time.perf_counter()
+            auth.cleanup(achalls)
+        except Exception as err:
+            performed = time.perf_counter()
+            error = str(err)
+        end = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'sans': sans,
+            'perform_seconds': round(performed - start, 4),
+            'cleanup_seconds': round(end - performed, 4),
+            'api_calls': sum(server.calls.values()),
+            'api_calls_by_method': dict(sorted(server.calls.items())),
+            'connections': server.connections,
+            'peak_memory_kib': round(peak / 1024, 1),
+            'leaked_records': len(server.records()),
+            'error': error,
+        }
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sans', type=int, nargs='+', default=[1, 10, 100, 500],
+                        help='Numbers of names per certificate to benchmark.')
+    parser.add_argument('--zones', type=int, default=10, help='Number of zones of the fake account.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds every API call is delayed.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of an API call to fail.')
+    parser.add_argument('--max-workers', type=int, default=4, help='Value of --dns-inwx-max-workers.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    parsed = parser.parse_args(args)
+
+    results = [run(sans, parsed.zones, parsed.latency, parsed.error_rate, max_workers=parsed.max_workers)
+               for sans in parsed.sans]
+    if parsed.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'SANs':>6} {'perform s':>10} {'cleanup s':>10} {'API calls':>10} {'conns':>6} {'peak KiB':>10}  error")
+        for result in results:
+            print(f"{result['sans']:>6} {result['perform_seconds']:>10.3f} {result['cleanup_seconds']:>10.3f} "
+                  f"{result['api_calls']:>10} {result['connections']:>6} {result['peak_memory_kib']:>10.1f}  "
+                  f"{result['error'] or ''}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Tests for certbot_dns_inwx._internal.tests.benchmark."""
+import sys
+import unittest
+
+import pytest
+
+from certbot_dns_inwx._internal.tests import benchmark
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_api_call_budget(self):
+        result = benchmark.run(10, zones=3)
+        assert result['error'] is None
+        assert result['leaked_records'] == 0
+        assert result['api_calls_by_method'] == {
+            'account.login': 1,
+            'nameserver.createRecord': 10,
+            'nameserver.deleteRecord': 10,
+            'nameserver.info': 3,
+            'nameserver.list': 1,
+        }
+
+    def test_api_call_budget_ttl(self):
+        # The SOA record of every zone is only fetched if its negative caching TTL may lower the TTL
+        result = benchmark.run(10, zones=3, ttl=3600)
+        assert result['error'] is None
+        assert result['api_calls_by_method']['nameserver.info'] == 6
+
+    def test_async_client(self):
+        result = benchmark.run(10, zones=3, async_client=True)
+        assert result['error'] is None
+        assert result['leaked_records'] == 0
+        assert result['api_calls_by_method'] == {
+            'account.login': 1,
+            'nameserver.createRecord': 10,
+            'nameserver.deleteRecord': 10,
+            'nameserver.list': 1,
+        }
+
+    def test_connection_reuse(self):
+        result = benchmark.run(10, zones=3, max_workers=1)
+        assert result['connections'] == 1
+
+    def test_error_injection(self):
+        result = benchmark.run(10, zones=3, error_rate=1.0)
+        assert 'INWX login failed' in result['error']
+
+    def test_main(self):
+        assert benchmark.main(['--sans', '1', '--json']) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
@@ -0,0 +1,110 @@
+"""Tests for certbot_dns_inwx._internal.cache."""
+import json
+import sys
+from unittest import mock
+
+import pytest
+from certbot.compat import filesystem
+from certbot.compat import os
+from certbot.tests import util as test_util
+
+from certbot_dns_inwx._internal.cache import PersistentCache
+
+
+class PersistentCacheTest(test_util.TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.path = os.path.join(self.tempdir, 'dns-inwx', 'cache.json')
+
+    def test_roundtrip(self):
+        cache = PersistentCache(self.path, 60)
+        assert cache.get('key') is None
+        cache.set('key', ['value'])
+        assert cache.get('key') == ['value']
+        cache.flush()
+
+        assert PersistentCache(self.path, 60).get('key') == ['value']
+        assert filesystem.check_mode(self.path, 0o600)
+
+    def test_expiry(self):
+        cache = PersistentCache(self.path, 60)
+        with mock.patch('time.time', return_value=1000.0):
+            cache.set('short', 'value', ttl=10)
+            cache.set('long', 'value')
+            cache.flush()
+        with mock.patch('time.time', return_value=1030.0):
+            reloaded = PersistentCache(self.path, 60)
+            assert reloaded.get('short') is None
+            assert reloaded.get('long') == 'value'
+
+    def test_eviction(self):
+        cache = PersistentCache(self.path, 60, max_entries=2)
+        for i in range(3):
+            with mock.patch('time.time', return_value=1000.0 + i):
+                cache.set(f'key{i}', i)
+        with mock.patch('time.time', return_value=1010.0):
+            cache.flush()
+            reloaded = PersistentCache(self.path, 60)
+            assert reloaded.get('key0') is None
+            assert reloaded.get('key1') == 1
+            assert reloaded.get('key2') == 2
+
+    def test_invalidate(self):
+        cache = PersistentCache(self.path, 60)
+        cache.set('key', 'value')
+        cache.flush()
+        cache.invalidate('key')
+        assert cache.get('key') is None
+        cache.flush()
+        assert PersistentCache(self.path, 60).get('key') is None
+
+    def test_merge_concurrent_writers(self):
+        first = PersistentCache(self.path, 60)
+        second = PersistentCache(self.path, 60)
+        first.set('first', 1)
+        second.set('second', 2)
+        first.flush()
+        second.flush()
+
+        reloaded = PersistentCache(self.path, 60)
+        assert reloaded.get('first') == 1
+        assert reloaded.get('second') == 2
+
+    def test_corrupt_file(self):
+        filesystem.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as file:
+            file.write('{not json')
+        cache = PersistentCache(self.path, 60)
+        assert cache.get('key') is None
+        cache.set('key', 'value')
+        cache.flush()
+        assert PersistentCache(self.path, 60).get('key') == 'value'
+
+    def test_invalid_entries(self):
+        filesystem.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as file:
+            json.dump({'version': PersistentCache.VERSION, 'entries': {
+                'broken': {'value': 'value'},
+                'valid': {'value': 'value', 'stored': 0, 'expires': 2 ** 40},
+            }}, file)
+        cache = PersistentCache(self.path, 60)
+        assert cache.get('broken') is None
+        assert cache.get('valid') == 'value'
+
+    def test_other_version(self):
+        filesystem.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as file:
+            json.dump({'version': 0, 'entries': {'key': {'value': 'value', 'stored': 0, 'expires': 2 ** 40}}}, file)
+        assert PersistentCache(self.path, 60).get('key') is None
+
+    def test_flush_failure(self):
+        cache = PersistentCache(os.path.join(self.tempdir, 'file', 'cache.json'), 60)
+        with open(os.path.join(self.tempdir, 'file'), 'w'):
+            pass
+        cache.set('key', 'value')
+        cache.flush()
+        assert cache.get('key') == 'value'
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
@@ -0,0 +1,129 @@
+"""Tests for certbot_dns_inwx._internal.cnames."""
+import asyncio
+import sys
+import unittest
+from unittest import mock
+
+import dns.exception
+import dns.message
+import dns.name
+import dns.rdatatype
+import dns.resolver
+import dns.rrset
+import pytest
+from certbot import errors
+
+from certbot_dns_inwx._internal.cnames import CNAMEResolver
+
+
+class _FakeResolver:
+    """Answers CNAME queries from a static mapping and counts the queries per name."""
+
+    def __init__(self, cnames: dict, ttl: int = 300, soa_ttl: int = None) -> None:
+        self.cnames = {dns.name.from_text(name): dns.name.from_text(target) for name, target in cnames.items()}
+        self.ttl = ttl
+        self.soa_ttl = soa_ttl
+        self.queries = {}
+
+    async def resolve(self, qname, rdtype):
+        assert rdtype == dns.rdatatype.CNAME
+        self.queries[qname.to_text(True)] = self.queries.get(qname.to_text(True), 0) + 1
+        await asyncio.sleep(0)
+        if qname not in self.cnames:
+            response = dns.message.make_response(dns.message.make_query(qname, dns.rdatatype.CNAME))
+            if self.soa_ttl is not None:
+                response.authority.append(dns.rrset.from_text(
+                    'example.com.', 3600, 'IN', 'SOA', f'ns.example.com. hostmaster.example.com. 1 2 3 4 {self.soa_ttl}'))
+            raise dns.resolver.NoAnswer(response=response)
+        answer = mock.MagicMock()
+        answer.__len__.return_value = 1
+        answer.__getitem__.return_value = mock.MagicMock(target=self.cnames[qname])
+        answer.rrset.ttl = self.ttl
+        return answer
+
+
+class CNAMEResolverTest(unittest.TestCase):
+    def test_resolve_all_shared_chain(self):
+        fake = _FakeResolver({'_acme-challenge.a.example.com': '_shared.example.com',
+                              '_acme-challenge.b.example.com': '_shared.example.com',
+                              '_shared.example.com': '_final.example.org'})
+        result = CNAMEResolver(fake).resolve_all(['_acme-challenge.a.example.com', '_acme-challenge.b.example.com',
+                                                  '_acme-challenge.c.example.com'])
+        assert result == {'_acme-challenge.a.example.com': '_final.example.org',
+                          '_acme-challenge.b.example.com': '_final.example.org',
+                          '_acme-challenge.c.example.com': '_acme-challenge.c.example.com'}
+        assert fake.queries['_shared.example.com'] == 1
+        assert fake.queries['_final.example.org'] == 1
+
+    def test_positive_cache(self):
+        fake = _FakeResolver({'_acme-challenge.example.com': '_final.example.com'}, ttl=300)
+        resolver = CNAMEResolver(fake)
+        with mock.patch('time.monotonic', return_value=1000.0):
+            resolver.resolve_all(['_acme-challenge.example.com'])
+        with mock.patch('time.monotonic', return_value=1299.0):
+            assert resolver.resolve_all(['_acme-challenge.example.com']) == {
+                '_acme-challenge.example.com': '_final.example.com'}
+        assert fake.queries['_acme-challenge.example.com'] == 1
+        with mock.patch('time.monotonic', return_value=1300.0):
+            resolver.resolve_all(['_acme-challenge.example.com'])
+        assert fake.queries['_acme-challenge.example.com'] == 2
+
+    def test_ttl(self):
+        fake = _FakeResolver({'_acme-challenge.example.com': '_final.example.com'}, ttl=300, soa_ttl=30)
+        resolver = CNAMEResolver(fake)
+        assert resolver.ttl('_acme-challenge.example.com') == 0
+        with mock.patch('time.monotonic', return_value=1000.0):
+            resolver.resolve_all(['_acme-challenge.example.com'])
+        # The absence of a CNAME on the final name is cached shortest
+        with mock.patch('time.monotonic', return_value=1010.0):
+            assert resolver.ttl('_acme-challenge.example.com') == 20
+        with mock.patch('time.monotonic', return_value=1030.0):
+            assert resolver.ttl('_acme-challenge.example.com') == 0
+
+    def test_negative_cache_soa(self):
+        fake = _FakeResolver({}, soa_ttl=30)
+        resolver = CNAMEResolver(fake)
+        with mock.patch('time.monotonic', return_value=1000.0):
+            resolver.resolve_all(['_acme-challenge.example.com'])
+        with mock.patch('time.monotonic', return_value=1029.0):
+            resolver.resolve_all(['_acme-challenge.example.com'])
+        assert fake.queries['_acme-challenge.example.com'] == 1
+        with mock.patch('time.monotonic', return_value=1030.0):
+            resolver.resolve_all(['_acme-challenge.example.com'])
+        assert fake.queries['_acme-challenge.example.com'] == 2
+
+    def test_negative_cache_default(self):
+        resolver = CNAMEResolver(_FakeResolver({}))
+        with mock.patch('time.monotonic', return_value=1000.0):
+            resolver.resolve_all(['_acme-challenge.example.com'])
+            assert resolver.cache[dns.name.from_text('_acme-challenge.example.com')] == (
+                None, 1000.0 + CNAMEResolver.NEGATIVE_TTL)
+
+    def test_cache_bounded(self):
+        names = ['_acme-challenge.a.example.com', '_acme-challenge.b.example.com', '_acme-challenge.c.example.com']
+        resolver = CNAMEResolver(_FakeResolver({}, soa_ttl=30), max_entries=2)
+        with mock.patch('time.monotonic', return_value=1000.0):
+            resolver.resolve_all(names)
+            assert len(resolver.cache) == 2
+        # Expired entries are dropped instead of being skipped
+        with mock.patch('time.monotonic', return_value=1030.0):
+            assert [resolver.ttl(name) for name in names] == [0, 0, 0]
+            assert len(resolver.cache) == 0
+
+    def test_loop(self):
+        fake = _FakeResolver({'_acme-challenge.example.com': '_a.example.com',
+                              '_a.example.com': '_b.example.com',
+                              '_b.example.com': '_a.example.com'})
+        result = CNAMEResolver(fake).resolve_all(['_acme-challenge.example.com'])
+        assert result == {'_acme-challenge.example.com': '_b.example.com'}
+        assert sum(fake.queries.values()) == 3
+
+    def test_failure(self):
+        resolver = mock.MagicMock()
+        resolver.resolve = mock.AsyncMock(side_effect=dns.exception.Timeout())
+        result = CNAMEResolver(resolver).resolve_all(['_acme-challenge.example.com'])
+        assert isinstance(result['_acme-challenge.example.com'], errors.PluginError)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
@@ -0,0 +1,148 @@
+"""Tests for certbot_dns_inwx._internal.daemon."""
+import socket
+import sys
+import threading
+import time
+from unittest import mock
+
+import pytest
+from certbot import errors
+from certbot.compat import os
+from certbot.compat import filesystem
+from certbot.tests import util as test_util
+
+from certbot_dns_inwx._internal.daemon import ChallengeDaemon, DaemonClient
+from certbot_dns_inwx._internal.standalone import StandaloneAuthenticator
+from certbot_dns_inwx._internal.tests import benchmark
+from certbot_dns_inwx._internal.tests.fake_domrobot import FakeDomrobot
+
+
+class ChallengeDaemonTest(test_util.TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        benchmark.reset_caches()
+        self.server = FakeDomrobot(['a.test', 'b.test']).start()
+        self.authenticator = StandaloneAuthenticator(benchmark.make_config(self.tempdir, self.server.url,
+                                                                        rate_limit=0), 'dns-inwx')
+        self.authenticator._setup_credentials()
+        self.path = os.path.join(self.tempdir, 'daemon.sock')
+        self.daemon = ChallengeDaemon(self.authenticator, self.path, coalesce_delay=0.2).start()
+        self.client = DaemonClient(self.path)
+
+    def tearDown(self) -> None:
+        self.daemon.stop()
+        self.server.stop()
+        benchmark.reset_caches()
+        super().tearDown()
+
+    def test_perform_cleanup(self):
+        challenges = [('a.test', '_acme-challenge.a.test', 'token-a'), ('b.test', '_acme-challenge.b.test', 'token-b')]
+        self.client.request('perform', challenges=challenges, propagation_seconds=0)
+        assert sorted(record['content'] for record in self.server.records()) == ['token-a', 'token-b']
+        self.client.request('cleanup', challenges=challenges)
+        assert self.server.records() == []
+        assert self.server.calls['account.login'] == 1
+
+    def test_socket_permissions(self):
+        assert filesystem.check_mode(self.path, 0o600)
+
+    def test_running_daemon_kept(self):
+        with pytest.raises(errors.Error, match='already listening'):
+            ChallengeDaemon(self.authenticator, self.path).start()
+        self.client.request('perform', challenges=[('a.test', '_acme-challenge.a.test', 'token-a')],
+                            propagation_seconds=0)
+
+    def test_stale_socket_replaced(self):
+        path = os.path.join(self.tempdir, 'stale.sock')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(path)
+        daemon = ChallengeDaemon(self.authenticator, path).start()
+        try:
+            DaemonClient(path).request('perform', challenges=[('a.test', '_acme-challenge.a.test', 'token-a')],
+                                       propagation_seconds=0)
+        finally:
+            daemon.stop()
+
+    def test_cleanup_metrics(self):
+        path = os.path.join(self.tempdir, 'metrics.json')
+        self.authenticator.config.dns_inwx_metrics_file = path
+        challenges = [('a.test', '_acme-challenge.a.test', 'token-a')]
+        self.client.request('perform', challenges=challenges, propagation_seconds=0)
+        self.client.request('cleanup', challenges=challenges)
+        with open(path) as file:
+            assert 'nameserver.deleteRecord' in file.read()
+
+    def test_coalesce(self):
+        self.authenticator._wait_for_propagation = mock.MagicMock()
+        challenges = [('a.test', f'_acme-challenge.{i}.a.test', f'token-{i}') for i in range(4)]
+        threads = [threading.Thread(target=self.client.request, args=('perform',),
+                                    kwargs={'challenges': [challenge], 'propagation_seconds': i})
+                   for i, challenge in enumerate(challenges)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(self.server.records()) == 4
+        assert self.server.calls['nameserver.info'] == 1
+        # Every request waits for its own records up to its own deadline
+        assert sorted(call[0][1] for call in self.authenticator._wait_for_propagation.call_args_list) == [0, 1, 2, 3]
+        assert sorted(call[0][0][0][2] for call in self.authenticator._wait_for_propagation.call_args_list) == [
+            f'token-{i}' for i in range(4)]
+
+    def test_no_wait_for_earlier_batch(self):
+        first = threading.Thread(target=self.client.request, args=('perform',),
+                                 kwargs={'challenges': [('a.test', '_acme-challenge.a.test', 'token-a')],
+                                         'propagation_seconds': 2})
+        first.start()
+        while not self.server.records():
+            time.sleep(0.01)
+        start = time.monotonic()
+        self.client.request('perform', challenges=[('b.test', '_acme-challenge.b.test', 'token-b')],
+                            propagation_seconds=0)
+        # Served while the first request still waits for the propagation of its record
+        assert time.monotonic() - start < 1
+        assert first.is_alive()
+        first.join()
+
+    def test_failed_request_in_batch(self):
+        results = {}
+
+        def perform(name, challenge):
+            try:
+                self.client.request('perform', challenges=[challenge], propagation_seconds=0)
+                results[name] = None
+            except errors.PluginError as err:
+                results[name] = str(err)
+
+        threads = [threading.Thread(target=perform, args=('good', ('a.test', '_acme-challenge.a.test', 'token'))),
+                   threading.Thread(target=perform, args=('bad', ('c.test', '_acme-challenge.c.test', 'token')))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results['good'] is None
+        assert 'Unable to determine base domain' in results['bad']
+        assert len(self.server.records()) == 1
+        # Repeating the request reused the record created by the batch without remembering its ID twice
+        assert list(self.authenticator._get_inwx_client().recordIds.values()) == [[self.server.records()[0]['id']]]
+
+    def test_unknown_action(self):
+        with pytest.raises(errors.PluginError, match='unknown action'):
+            self.client.request('restart')
+
+    def test_invalid_request(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            sock.sendall(b'not json\n')
+            with sock.makefile('rb') as file:
+                assert b'"ok": false' in file.readline()
+
+
+class DaemonClientTest(test_util.TempDirTestCase):
+    def test_unreachable(self):
+        with pytest.raises(errors.PluginError, match='Unable to reach the challenge daemon'):
+            DaemonClient(os.path.join(self.tempdir, 'missing.sock')).request('cleanup', challenges=[])
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
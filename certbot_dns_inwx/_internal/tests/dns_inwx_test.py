@@ -1,10 +1,17 @@
 """Tests for certbot_dns_inwx._internal.dns_inwx."""
+import asyncio
 import sys
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 
+import dns.exception
 import dns.name
+import dns.resolver
 import pytest
+import requests
 from certbot import errors
 from certbot.compat import os
 from certbot.plugins import dns_test_common
@@ -13,7 +20,8 @@ from certbot.tests import util as test_util
 from dns.name import Name
 from dns.rdatatype import RdataType
 
-from certbot_dns_inwx._internal.dns_inwx import Authenticator, _INWXClient
+from certbot_dns_inwx._internal.dns_inwx import Authenticator, _CircuitBreaker, _INWXClient, _RateLimiter, \
+    _RetryBudget, _TransportAdapter, _ZoneIndex, _choose_ttls
 
 KEY = 'config'
 URL = 'https://test-api.example.com'
@@ -35,10 +43,23 @@ class AuthenticatorTest(test_util.TempDirTestCase, dns_test_common.BaseAuthentic
         }, path)
 
         self.config = mock.MagicMock(dns_inwx_credentials=path, dns_inwx_propagation_seconds=0,
-                                     dns_inwx_follow_cnames=False)
+                                     dns_inwx_follow_cnames=False, dns_inwx_max_workers=1,
+                                     dns_inwx_rate_limit=0, dns_inwx_persistent_cache=False,
+                                     dns_inwx_cache_ttl=3600, dns_inwx_session_cache=False,
+                                     dns_inwx_propagation_polling=False, dns_inwx_metrics_file=None,
+                                     dns_inwx_max_retries=0, dns_inwx_orphan_age=0, dns_inwx_daemon_socket=None,
+                                     dns_inwx_connect_timeout=10, dns_inwx_read_timeout=60,
+                                     dns_inwx_ttl=300, dns_inwx_zone_ttl=None, dns_inwx_journal=False,
+                                     dns_inwx_async_client=False,
+                                     work_dir=self.tempdir)
         self.auth = Authenticator(self.config, "dns-inwx")
-        Authenticator.nameCache = {}
-        Authenticator.clientCache = {}
+        Authenticator.nameCache.clear()
+        Authenticator.clientCache.clear()
+        Authenticator.clientUsers = {}
+        Authenticator.discardedClients = set()
+        Authenticator.persistentCache = {}
+        Authenticator.cnameResolver = None
+        Authenticator.metrics.reset()
 
         self.mock_client = mock.MagicMock()
 
@@ -47,47 +68,237 @@ class AuthenticatorTest(test_util.TempDirTestCase, dns_test_common.BaseAuthentic
         self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
         self.auth.perform([self.achall])
 
-        expected = [mock.call.add_txt_record(DOMAIN, '_acme-challenge.' + DOMAIN, mock.ANY, mock.ANY)]
+        expected = [mock.call.add_txt_records([(DOMAIN, '_acme-challenge.' + DOMAIN, mock.ANY, mock.ANY)])]
+        assert self.mock_client.mock_calls == expected
+
+    @test_util.patch_display_util()
+    def test_perform_batch(self, unused_mock_get_utility):
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        other = mock.MagicMock()
+        other.identifier.value = 'other.' + DOMAIN
+        other.validation_domain_name.return_value = '_acme-challenge.other.' + DOMAIN
+        other.validation.return_value = 'other-validation'
+        responses = self.auth.perform([self.achall, other])
+
+        assert len(responses) == 2
+        expected = [mock.call.add_txt_records([
+            (DOMAIN, '_acme-challenge.' + DOMAIN, mock.ANY, mock.ANY),
+            ('other.' + DOMAIN, '_acme-challenge.other.' + DOMAIN, 'other-validation', mock.ANY),
+        ])]
         assert self.mock_client.mock_calls == expected
 
     @test_util.patch_display_util()
     def test_perform_cnames(self, unused_mock_get_utility):
         self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
-        self.auth._follow_cnames = mock.MagicMock(return_value='_final.' + DOMAIN)
+        self.auth._follow_all_cnames = mock.MagicMock(return_value={'_acme-challenge.' + DOMAIN: '_final.' + DOMAIN})
         self.auth.perform([self.achall])
 
-        expected = [mock.call.add_txt_record(DOMAIN, '_final.' + DOMAIN, mock.ANY, mock.ANY)]
+        self.auth._follow_all_cnames.assert_called_once_with({'_acme-challenge.' + DOMAIN: DOMAIN})
+        expected = [mock.call.add_txt_records([(DOMAIN, '_final.' + DOMAIN, mock.ANY, mock.ANY)])]
+        assert self.mock_client.mock_calls == expected
+
+    @test_util.patch_display_util()
+    def test_perform_failure_invalidates_names(self, unused_mock_get_utility):
+        self.mock_client.add_txt_records.side_effect = errors.PluginError('failed')
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        self.auth._follow_all_cnames = mock.MagicMock(return_value={'_acme-challenge.' + DOMAIN: '_final.' + DOMAIN})
+        with pytest.raises(errors.PluginError):
+            self.auth.perform([self.achall])
+        assert '_acme-challenge.' + DOMAIN not in Authenticator.nameCache
+
+        self.mock_client.add_txt_records.side_effect = None
+        self.auth.perform([self.achall])
+        assert self.auth._follow_all_cnames.call_count == 2
+
+    @mock.patch('time.monotonic')
+    def test_resolve_validation_names_ttl(self, monotonic_mock):
+        self.config.dns_inwx_cache_ttl = 60
+        self.auth._follow_all_cnames = mock.MagicMock(return_value={'_acme-challenge.' + DOMAIN: '_final.' + DOMAIN})
+        monotonic_mock.return_value = 1000.0
+        self.auth._resolve_validation_name(DOMAIN, '_acme-challenge.' + DOMAIN)
+        monotonic_mock.return_value = 1059.0
+        self.auth._resolve_validation_name(DOMAIN, '_acme-challenge.' + DOMAIN)
+        self.auth._follow_all_cnames.assert_called_once()
+        monotonic_mock.return_value = 1060.0
+        self.auth._resolve_validation_name(DOMAIN, '_acme-challenge.' + DOMAIN)
+        assert self.auth._follow_all_cnames.call_count == 2
+
+    @test_util.patch_display_util()
+    def test_perform_wildcard(self, unused_mock_get_utility):
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        self.auth._follow_all_cnames = mock.MagicMock(return_value={'_acme-challenge.' + DOMAIN: '_final.' + DOMAIN})
+        wildcard = mock.MagicMock()
+        wildcard.identifier.value = '*.' + DOMAIN
+        wildcard.validation_domain_name.return_value = '_acme-challenge.' + DOMAIN
+        wildcard.validation.return_value = 'wildcard-validation'
+        self.auth.perform([self.achall, wildcard])
+
+        # The shared validation name is resolved once, both values are added in one batch
+        self.auth._follow_all_cnames.assert_called_once_with({'_acme-challenge.' + DOMAIN: '*.' + DOMAIN})
+        expected = [mock.call.add_txt_records([
+            (DOMAIN, '_final.' + DOMAIN, mock.ANY, mock.ANY),
+            ('*.' + DOMAIN, '_final.' + DOMAIN, 'wildcard-validation', mock.ANY),
+        ])]
         assert self.mock_client.mock_calls == expected
 
+    @test_util.patch_display_util()
+    def test_perform_persistent_cache(self, unused_mock_get_utility):
+        self.config.dns_inwx_persistent_cache = True
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        self.auth._follow_all_cnames = mock.MagicMock(return_value={'_acme-challenge.' + DOMAIN: '_final.' + DOMAIN})
+        self.auth.perform([self.achall])
+
+        # A new run resolves the CNAME from disk
+        Authenticator.nameCache.clear()
+        Authenticator.persistentCache = {}
+        self.auth.perform([self.achall])
+        self.auth._follow_all_cnames.assert_called_once()
+        assert self.mock_client.add_txt_records.call_count == 2
+        assert self.mock_client.add_txt_records.call_args[0][0][0][1] == '_final.' + DOMAIN
+
+    @test_util.patch_display_util()
+    def test_perform_failure_invalidates_persistent_cname(self, unused_mock_get_utility):
+        self.config.dns_inwx_persistent_cache = True
+        self.mock_client.add_txt_records.side_effect = errors.PluginError('failed')
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        self.auth._follow_all_cnames = mock.MagicMock(return_value={'_acme-challenge.' + DOMAIN: '_final.' + DOMAIN})
+        with pytest.raises(errors.PluginError):
+            self.auth.perform([self.achall])
+
+        Authenticator.persistentCache = {}
+        assert self.auth._get_persistent_cache().get('cname:_acme-challenge.' + DOMAIN) is None
+
+    @mock.patch('time.monotonic')
+    def test_resolve_validation_names_dns_ttl(self, monotonic_mock):
+        self.config.dns_inwx_follow_cnames = True
+        self.config.dns_inwx_persistent_cache = True
+        Authenticator.cnameResolver = mock.MagicMock()
+        Authenticator.cnameResolver.resolve_all.return_value = {'_acme-challenge.' + DOMAIN: '_final.' + DOMAIN}
+        Authenticator.cnameResolver.ttl.return_value = 30
+        monotonic_mock.return_value = 1000.0
+        self.auth._resolve_validation_name(DOMAIN, '_acme-challenge.' + DOMAIN)
+        cache = self.auth._get_persistent_cache()
+        entry = cache.entries['cname:_acme-challenge.' + DOMAIN]
+        assert entry['expires'] - entry['stored'] == 30
+
+        # The in-memory entry expires with the smallest TTL along the chain, not after cache-ttl
+        monotonic_mock.return_value = 1029.0
+        self.auth._resolve_validation_name(DOMAIN, '_acme-challenge.' + DOMAIN)
+        assert Authenticator.cnameResolver.resolve_all.call_count == 1
+        monotonic_mock.return_value = 1030.0
+        cache.invalidate('cname:_acme-challenge.' + DOMAIN)
+        self.auth._resolve_validation_name(DOMAIN, '_acme-challenge.' + DOMAIN)
+        assert Authenticator.cnameResolver.resolve_all.call_count == 2
+
+    @test_util.patch_display_util()
+    @mock.patch('certbot_dns_inwx._internal.propagation.PropagationChecker')
+    def test_perform_propagation_polling(self, checker_mock, unused_mock_get_utility):
+        self.config.dns_inwx_propagation_polling = True
+        self.config.dns_inwx_propagation_seconds = 120
+        self.mock_client._find_domain.return_value = DOMAIN
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        with mock.patch('time.sleep') as sleep_mock:
+            self.auth.perform([self.achall])
+        assert not sleep_mock.called
+        checker_mock.assert_called_once_with(120, 1)
+        checker_mock.return_value.wait.assert_called_once_with([(DOMAIN, '_acme-challenge.' + DOMAIN, mock.ANY)])
+
+    @test_util.patch_display_util()
+    def test_perform_propagation_sleep(self, unused_mock_get_utility):
+        self.config.dns_inwx_propagation_seconds = 120
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        with mock.patch('time.sleep') as sleep_mock:
+            self.auth.perform([self.achall])
+        sleep_mock.assert_called_once_with(120)
+
     def test_cleanup(self):
         Authenticator.nameCache['_acme-challenge.' + DOMAIN] = '_final.' + DOMAIN
         self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
         self.auth._attempt_cleanup = True
         self.auth.cleanup([self.achall])
 
-        expected = [mock.call.del_txt_record(DOMAIN, '_final.' + DOMAIN, mock.ANY)]
+        expected = [mock.call.del_txt_records([(DOMAIN, '_final.' + DOMAIN, mock.ANY)])]
         assert self.mock_client.mock_calls == expected
 
-    @mock.patch('dns.resolver.Resolver')
+    @test_util.patch_display_util()
+    def test_cleanup_names_of_perform(self, unused_mock_get_utility):
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        self.auth._follow_all_cnames = mock.MagicMock(return_value={'_acme-challenge.' + DOMAIN: '_final.' + DOMAIN})
+        self.auth.perform([self.achall])
+        # The resolved name expired and the CNAME has been changed or cannot be resolved anymore
+        Authenticator.nameCache.clear()
+        self.auth._follow_all_cnames.side_effect = errors.PluginError('failed')
+        self.auth.cleanup([self.achall])
+
+        self.mock_client.del_txt_records.assert_called_once_with([(DOMAIN, '_final.' + DOMAIN, mock.ANY)])
+        assert self.auth.resolvedNames == {}
+
+    @mock.patch('certbot_dns_inwx._internal.daemon.DaemonClient.request')
+    def test_perform_daemon(self, request_mock):
+        self.config.dns_inwx_daemon_socket = os.path.join(self.tempdir, 'daemon.sock')
+        self.config.dns_inwx_credentials = os.path.join(self.tempdir, 'missing.cfg')
+        self.auth._get_inwx_client = mock.MagicMock()
+        self.auth.perform([self.achall])
+        request_mock.assert_called_once_with('perform', challenges=[(DOMAIN, '_acme-challenge.' + DOMAIN, mock.ANY)],
+                                             propagation_seconds=0)
+        assert not self.auth._get_inwx_client.called
+
+    def test_get_ttl(self):
+        self.config.dns_inwx_zone_ttl = 'example.org=600, sub.example.org=60'
+        assert self.auth._get_ttl('_acme-challenge.' + DOMAIN) == 300
+        assert self.auth._get_ttl('_acme-challenge.example.org') == 600
+        assert self.auth._get_ttl('_acme-challenge.www.sub.example.org') == 60
+
+    def test_get_ttl_invalid(self):
+        self.config.dns_inwx_zone_ttl = 'example.org=long'
+        with pytest.raises(errors.PluginError):
+            self.auth._get_ttl('_acme-challenge.example.org')
+
+    @mock.patch('certbot_dns_inwx._internal.daemon.DaemonClient.request')
+    def test_cleanup_daemon(self, request_mock):
+        self.config.dns_inwx_daemon_socket = os.path.join(self.tempdir, 'daemon.sock')
+        self.auth._get_inwx_client = mock.MagicMock()
+        self.auth._attempt_cleanup = True
+        self.auth.cleanup([self.achall])
+        request_mock.assert_called_once_with('cleanup', challenges=[(DOMAIN, '_acme-challenge.' + DOMAIN, mock.ANY)])
+        assert not self.auth._get_inwx_client.called
+
+    def test_cleanup_metrics(self):
+        path = os.path.join(self.tempdir, 'metrics.prom')
+        self.config.dns_inwx_metrics_file = path
+        Authenticator.nameCache['_acme-challenge.' + DOMAIN] = '_final.' + DOMAIN
+        Authenticator.metrics.increment('api_requests_total', method='test', code=1000)
+        self.auth._get_inwx_client = mock.MagicMock(return_value=self.mock_client)
+        self.auth._attempt_cleanup = True
+        self.auth.cleanup([self.achall])
+
+        with open(path) as file:
+            assert 'certbot_dns_inwx_api_requests_total{code="1000",method="test"} 1' in file.read()
+        assert Authenticator.metrics.counters == {}
+
+    @mock.patch('dns.asyncresolver.Resolver')
     def test_follow_cnames_off(self, resolver_mock):
         result = self.auth._follow_cnames(DOMAIN, '_acme-challenge.' + DOMAIN)
         assert result == '_acme-challenge.' + DOMAIN
         assert not resolver_mock.called
 
-    @mock.patch('dns.resolver.Resolver')
+    @mock.patch('dns.asyncresolver.Resolver')
     def test_follow_cnames(self, resolver_mock):
         test_resolver = mock.MagicMock()
 
-        def resolve(qname: Name | str, rdtype: RdataType | str) -> []:
+        async def resolve(qname: Name | str, rdtype: RdataType | str) -> []:
             assert rdtype == dns.rdatatype.CNAME
             rrset = mock.MagicMock()
-            answer = [rrset]
+            answer = mock.MagicMock()
+            answer.__len__.return_value = 1
+            answer.__getitem__.return_value = rrset
+            answer.rrset.ttl = 300
             if qname == dns.name.from_text('_acme-challenge.' + DOMAIN):
                 rrset.target = dns.name.from_text('_intermediate.' + DOMAIN)
             elif qname == dns.name.from_text('_intermediate.' + DOMAIN):
                 rrset.target = dns.name.from_text('_final.' + DOMAIN)
             elif qname == dns.name.from_text('_final.' + DOMAIN):
-                return []
+                raise dns.resolver.NoAnswer()
             else:
                 assert False
             return answer
@@ -98,14 +309,17 @@ class AuthenticatorTest(test_util.TempDirTestCase, dns_test_common.BaseAuthentic
         result = self.auth._follow_cnames(DOMAIN, '_acme-challenge.' + DOMAIN)
         assert result == '_final.' + DOMAIN
 
-    @mock.patch('dns.resolver.Resolver')
+    @mock.patch('dns.asyncresolver.Resolver')
     def test_follow_cnames_finite_loop(self, resolver_mock):
         test_resolver = mock.MagicMock()
 
-        def resolve(qname: Name | str, rdtype: RdataType | str) -> []:
+        async def resolve(qname: Name | str, rdtype: RdataType | str) -> []:
             assert rdtype == dns.rdatatype.CNAME
             rrset = mock.MagicMock()
-            answer = [rrset]
+            answer = mock.MagicMock()
+            answer.__len__.return_value = 1
+            answer.__getitem__.return_value = rrset
+            answer.rrset.ttl = 300
             if qname == dns.name.from_text('_acme-challenge.' + DOMAIN):
                 rrset.target = dns.name.from_text('_intermediate.' + DOMAIN)
             elif qname == dns.name.from_text('_intermediate.' + DOMAIN):
@@ -120,15 +334,25 @@ class AuthenticatorTest(test_util.TempDirTestCase, dns_test_common.BaseAuthentic
         result = self.auth._follow_cnames(DOMAIN, '_acme-challenge.' + DOMAIN)
         assert result == '_intermediate.' + DOMAIN
 
-    @mock.patch('dns.resolver.Resolver')
+    @mock.patch('dns.asyncresolver.Resolver')
     def test_follow_cnames_no_cname(self, resolver_mock):
         test_resolver = mock.MagicMock()
-        test_resolver.resolve = mock.MagicMock(return_value=[])
+        test_resolver.resolve = mock.AsyncMock(side_effect=dns.resolver.NXDOMAIN())
         resolver_mock.return_value = test_resolver
         self.config.dns_inwx_follow_cnames = True
         result = self.auth._follow_cnames(DOMAIN, '_acme-challenge.' + DOMAIN)
         assert result == '_acme-challenge.' + DOMAIN
 
+    @mock.patch('dns.asyncresolver.Resolver')
+    def test_follow_cnames_failure(self, resolver_mock):
+        test_resolver = mock.MagicMock()
+        test_resolver.resolve = mock.AsyncMock(side_effect=dns.exception.Timeout())
+        resolver_mock.return_value = test_resolver
+        self.config.dns_inwx_follow_cnames = True
+        with pytest.raises(errors.PluginError) as err:
+            self.auth._follow_cnames(DOMAIN, '_acme-challenge.' + DOMAIN)
+        assert DOMAIN in str(err.value)
+
     @mock.patch('certbot_dns_inwx._internal.dns_inwx._INWXClient')
     def test_get_inwx_client(self, client_mock):
         test_client = mock.MagicMock()
@@ -136,41 +360,417 @@ class AuthenticatorTest(test_util.TempDirTestCase, dns_test_common.BaseAuthentic
 
         self.auth._setup_credentials()
         self.auth._get_inwx_client()
-        assert client_mock.called
+        client_mock.assert_called_once_with(URL, USERNAME, PASSWORD, SHARED_SECRET, 1, 0, None, None, Authenticator.metrics, 0, 0, 10, 60, None)
         assert Authenticator.clientCache[self.auth.conf('credentials')] is test_client
 
+    @mock.patch('certbot_dns_inwx._internal.dns_inwx._INWXClient')
+    def test_get_inwx_client_session_cache(self, client_mock):
+        self.config.dns_inwx_session_cache = True
+        self.auth._setup_credentials()
+        self.auth._get_inwx_client()
+        store = client_mock.call_args[0][7]
+        assert store.path == os.path.abspath(self.auth.conf('credentials')) + '.session'
+
+    def _setUpAccounts(self) -> None:
+        path = os.path.join(self.tempdir, 'accounts.cfg')
+        dns_test_common.write({
+            'dns_inwx_url': URL,
+            'dns_inwx_username': USERNAME,
+            'dns_inwx_password': PASSWORD,
+            'dns_inwx_shared_secret': SHARED_SECRET,
+            'dns_inwx_accounts': 'customer, sub',
+            'dns_inwx_customer_zones': 'example.org, example.net',
+            'dns_inwx_customer_username': 'customer-user',
+            'dns_inwx_customer_password': 'customer-password',
+            'dns_inwx_sub_zones': 'sub.example.org',
+            'dns_inwx_sub_url': 'https://sub-api.example.com',
+            'dns_inwx_sub_username': 'sub-user',
+            'dns_inwx_sub_password': 'sub-password',
+        }, path)
+        self.config.dns_inwx_credentials = path
+        self.auth._setup_credentials()
+
+    def test_get_account(self):
+        self._setUpAccounts()
+        assert self.auth._get_account('_acme-challenge.' + DOMAIN) is None
+        assert self.auth._get_account('_acme-challenge.www.Example.ORG') == 'customer'
+        assert self.auth._get_account('_acme-challenge.example.net') == 'customer'
+        assert self.auth._get_account('_acme-challenge.sub.example.org') == 'sub'
+        assert self.auth._get_account('_acme-challenge.notexample.org') is None
+
+    def test_accounts_incomplete(self):
+        path = os.path.join(self.tempdir, 'accounts.cfg')
+        dns_test_common.write({'dns_inwx_url': URL, 'dns_inwx_username': USERNAME, 'dns_inwx_password': PASSWORD,
+                               'dns_inwx_shared_secret': SHARED_SECRET, 'dns_inwx_accounts': 'customer',
+                               'dns_inwx_customer_zones': 'example.org'}, path)
+        self.config.dns_inwx_credentials = path
+        with pytest.raises(errors.PluginError, match='dns_inwx_customer_username'):
+            self.auth._setup_credentials()
+
+    @mock.patch('certbot_dns_inwx._internal.dns_inwx._INWXClient')
+    def test_get_inwx_client_account(self, client_mock):
+        self._setUpAccounts()
+        self.config.dns_inwx_session_cache = True
+        self.auth._get_inwx_client('customer')
+        self.auth._get_inwx_client('sub')
+        assert client_mock.call_args_list[0][0][:4] == (URL, 'customer-user', 'customer-password', None)
+        assert client_mock.call_args_list[1][0][:4] == ('https://sub-api.example.com', 'sub-user', 'sub-password',
+                                                        None)
+        assert client_mock.call_args_list[1][0][7].path == os.path.abspath(self.auth.conf('credentials')) + \
+            '.sub.session'
+        assert len(Authenticator.clientCache) == 2
+
+    @test_util.patch_display_util()
+    def test_perform_accounts(self, unused_mock_get_utility):
+        self._setUpAccounts()
+        clients = {None: mock.MagicMock(), 'customer': mock.MagicMock()}
+        self.auth._get_inwx_client = mock.MagicMock(side_effect=lambda account=None: clients[account])
+        other = mock.MagicMock()
+        other.identifier.value = 'example.org'
+        other.validation_domain_name.return_value = '_acme-challenge.example.org'
+        self.auth.perform([self.achall, other])
+        clients[None].add_txt_records.assert_called_once_with(
+            [(DOMAIN, '_acme-challenge.' + DOMAIN, mock.ANY, mock.ANY)])
+        clients['customer'].add_txt_records.assert_called_once_with(
+            [('example.org', '_acme-challenge.example.org', mock.ANY, mock.ANY)])
+
+    @test_util.patch_display_util()
+    def test_perform_accounts_failure(self, unused_mock_get_utility):
+        self._setUpAccounts()
+        clients = {None: mock.MagicMock(), 'customer': mock.MagicMock()}
+        clients['customer'].add_txt_records.side_effect = errors.PluginError('customer failed')
+        self.auth._get_inwx_client = mock.MagicMock(side_effect=lambda account=None: clients[account])
+        other = mock.MagicMock()
+        other.identifier.value = 'example.org'
+        other.validation_domain_name.return_value = '_acme-challenge.example.org'
+        with pytest.raises(errors.PluginError, match='customer failed'):
+            self.auth.perform([self.achall, other])
+        clients[None].add_txt_records.assert_called_once()
+
+    @mock.patch('certbot_dns_inwx._internal.aio.AsyncINWXClient')
+    def test_get_async_client_closed(self, client_mock):
+        client_mock.side_effect = lambda *args, **kwargs: mock.MagicMock(
+            sessionRejected=False, login=mock.AsyncMock(), close=mock.AsyncMock())
+        self.auth._setup_credentials()
+        loop = self.auth._get_event_loop()
+        first = loop.run(self.auth._get_async_client())
+        assert loop.run(self.auth._get_async_client()) is first
+        first.sessionRejected = True
+        second = loop.run(self.auth._get_async_client())
+        assert second is not first
+        # The rejected client is closed in the background
+        loop.run(asyncio.sleep(0.01))
+        first.close.assert_awaited_once()
+        assert not second.close.called
+
+        Authenticator._close_async_clients()
+        second.close.assert_awaited_once()
+        assert Authenticator.clientCache.keys() == []
+
+    @mock.patch('certbot_dns_inwx._internal.dns_inwx._INWXClient')
+    def test_held_client_expired(self, client_mock):
+        client_mock.side_effect = lambda *args, **kwargs: mock.MagicMock(sessionRejected=False)
+        self.auth._setup_credentials()
+        challenges = [(DOMAIN, '_acme-challenge.' + DOMAIN, 'validation')]
+        self.auth._add_challenges(challenges)
+        client = Authenticator.clientCache[self.auth.conf('credentials')]
+        # The client expires between perform and cleanup
+        Authenticator.clientCache.invalidate(self.auth.conf('credentials'))
+        self.auth._remove_challenges(challenges)
+        client.del_txt_records.assert_called_once()
+        assert client_mock.call_count == 1
+        assert self.auth.clients == {}
+        assert Authenticator.clientUsers == {}
+
+    @mock.patch('certbot_dns_inwx._internal.aio.AsyncINWXClient')
+    def test_held_async_client_closed_once_released(self, client_mock):
+        client_mock.side_effect = lambda *args, **kwargs: mock.MagicMock(
+            sessionRejected=False, login=mock.AsyncMock(), close=mock.AsyncMock())
+        self.auth._setup_credentials()
+        loop = self.auth._get_event_loop()
+        self.auth.resolvedNames['_acme-challenge.' + DOMAIN] = '_acme-challenge.' + DOMAIN
+        client = loop.run(self.auth._get_async_client())
+        Authenticator.clientCache.invalidate('async:' + self.auth.conf('credentials'))
+        # Still held for the pending cleanup
+        self.auth._release_clients()
+        loop.run(asyncio.sleep(0.01))
+        assert not client.close.called
+        assert loop.run(self.auth._get_async_client()) is client
+
+        self.auth.resolvedNames.clear()
+        self.auth._release_clients()
+        loop.run(asyncio.sleep(0.01))
+        client.close.assert_awaited_once()
+        assert Authenticator.discardedClients == set()
+
+    @mock.patch('certbot_dns_inwx._internal.aio.AsyncINWXClient')
+    def test_get_async_client_login_failure(self, client_mock):
+        client_mock.return_value.login = mock.AsyncMock(side_effect=errors.PluginError('INWX login failed'))
+        client_mock.return_value.close = mock.AsyncMock()
+        self.auth._setup_credentials()
+        with pytest.raises(errors.PluginError):
+            self.auth._get_event_loop().run(self.auth._get_async_client())
+        client_mock.return_value.close.assert_awaited_once()
+
+    def test_use_async_client_disabled(self):
+        with mock.patch.dict(sys.modules):
+            sys.modules.pop('certbot_dns_inwx._internal.aio', None)
+            sys.modules.pop('aiohttp', None)
+            assert not self.auth._use_async_client()
+            # Synchronous runs do not pay for importing aiohttp
+            assert 'certbot_dns_inwx._internal.aio' not in sys.modules
+            assert 'aiohttp' not in sys.modules
+        self.config.dns_inwx_async_client = True
+        assert self.auth._use_async_client()
+
+    def test_get_journal(self):
+        self.config.dns_inwx_journal = True
+        journal = self.auth._get_journal()
+        assert journal.path.startswith(os.path.join(self.tempdir, 'dns-inwx', 'journal-'))
+        assert self.auth._get_journal('customer').path != journal.path
+
     def test_get_inwx_client_cached(self):
-        test_client = mock.MagicMock()
+        test_client = mock.MagicMock(sessionRejected=False)
         Authenticator.clientCache[self.auth.conf('credentials')] = test_client
         assert self.auth._get_inwx_client() is test_client
 
+    @mock.patch('certbot_dns_inwx._internal.dns_inwx._INWXClient')
+    def test_get_inwx_client_rejected(self, client_mock):
+        self.auth._setup_credentials()
+        Authenticator.clientCache[self.auth.conf('credentials')] = mock.MagicMock(sessionRejected=True)
+        assert self.auth._get_inwx_client() is client_mock.return_value
+        assert Authenticator.clientCache[self.auth.conf('credentials')] is client_mock.return_value
+        assert Authenticator.clientCache.stats()['invalidations'] == 1
+
+    @mock.patch('certbot_dns_inwx._internal.dns_inwx._INWXClient')
+    def test_get_inwx_client_concurrent(self, client_mock):
+        self.auth._setup_credentials()
+        client_mock.side_effect = lambda *args, **kwargs: time.sleep(0.05) or mock.MagicMock(sessionRejected=False)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            clients = list(executor.map(lambda _: self.auth._get_inwx_client(), range(4)))
+        # Only the first thread logs in, the others wait for and share its client
+        assert client_mock.call_count == 1
+        assert all(client is clients[0] for client in clients)
+
+
+class TransportAdapterTest(unittest.TestCase):
+    @mock.patch('requests.adapters.HTTPAdapter.send')
+    def test_default_timeout(self, send_mock):
+        adapter = _TransportAdapter(2, (5, 30))
+        adapter.send(mock.sentinel.request)
+        adapter.send(mock.sentinel.request, timeout=1)
+        assert send_mock.mock_calls == [mock.call(mock.sentinel.request, timeout=(5, 30)),
+                                        mock.call(mock.sentinel.request, timeout=1)]
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    @mock.patch('time.monotonic')
+    def test_half_open(self, monotonic_mock):
+        monotonic_mock.return_value = 100.0
+        breaker = _CircuitBreaker(threshold=2, reset_timeout=30.0)
+        breaker.record(False)
+        breaker.check()
+        breaker.record(False)
+        with pytest.raises(Exception):
+            breaker.check()
+        monotonic_mock.return_value = 130.0
+        assert breaker.check()
+        breaker.record(False, trial=True)
+        with pytest.raises(Exception):
+            breaker.check()
+
+    @mock.patch('time.monotonic')
+    def test_single_trial(self, monotonic_mock):
+        monotonic_mock.return_value = 100.0
+        breaker = _CircuitBreaker(threshold=1, reset_timeout=30.0)
+        breaker.record(False)
+        monotonic_mock.return_value = 130.0
+        assert breaker.check()
+        # Concurrent requests are refused until the trial request reports back
+        with pytest.raises(Exception):
+            breaker.check()
+        breaker.record(True, trial=True)
+        assert not breaker.check()
+        assert not breaker.check()
+
+    @mock.patch('time.monotonic', return_value=100.0)
+    def test_reset_on_success(self, unused_monotonic_mock):
+        breaker = _CircuitBreaker(threshold=2)
+        breaker.record(False)
+        breaker.record(True)
+        breaker.record(False)
+        breaker.check()
+
+
+class RetryBudgetTest(unittest.TestCase):
+    @mock.patch('time.monotonic')
+    def test_refill(self, monotonic_mock):
+        monotonic_mock.return_value = 100.0
+        budget = _RetryBudget(2, 0.1)
+        assert budget.take()
+        assert budget.take()
+        assert not budget.take()
+        monotonic_mock.return_value = 109.0
+        assert not budget.take()
+        monotonic_mock.return_value = 110.0
+        assert budget.take()
+        # Never more than the capacity is regained
+        monotonic_mock.return_value = 1000.0
+        assert budget.take()
+        assert budget.take()
+        assert not budget.take()
+
+
+class RateLimiterTest(unittest.TestCase):
+    @mock.patch('time.sleep')
+    @mock.patch('time.monotonic', return_value=100.0)
+    def test_acquire(self, unused_monotonic_mock, sleep_mock):
+        limiter = _RateLimiter(4)
+        limiter.acquire()
+        limiter.acquire()
+        limiter.acquire()
+        assert sleep_mock.mock_calls == [mock.call(0.25), mock.call(0.5)]
+
+    @mock.patch('time.sleep')
+    def test_acquire_disabled(self, sleep_mock):
+        limiter = _RateLimiter(0)
+        for _ in range(10):
+            limiter.acquire()
+        assert not sleep_mock.called
+
 
 class INWXClientTest(unittest.TestCase):
-    @mock.patch('INWX.Domrobot.ApiClient.__new__')
-    def _setUpClient(self, client_mock) -> _INWXClient:
+    @mock.patch('INWX.Domrobot.ApiClient')
+    def _setUpClient(self, client_mock, max_workers: int = 1, cache=None, session_store=None,
+                     max_retries: int = 0, fetch_soa: bool = False) -> _INWXClient:
         test_client = mock.MagicMock()
         test_client.login = mock.MagicMock(return_value={'code': 1000})
         client_mock.return_value = test_client
-        return _INWXClient(URL, USERNAME, PASSWORD, SHARED_SECRET)
+        client = _INWXClient(URL, USERNAME, PASSWORD, SHARED_SECRET, max_workers, cache=cache,
+                             session_store=session_store, max_retries=max_retries)
+        if not fetch_soa:
+            client._negative_ttl = mock.MagicMock(return_value=None)
+        return client
 
-    @mock.patch('INWX.Domrobot.ApiClient.__new__')
+    @mock.patch('INWX.Domrobot.ApiClient')
     def test_login(self, client_mock):
         test_client = mock.MagicMock()
         test_client.login = mock.MagicMock(return_value={'code': 1000})
         client_mock.return_value = test_client
         _INWXClient(URL, USERNAME, PASSWORD, SHARED_SECRET)
-        client_mock.assert_called_with(mock.ANY, URL)
+        client_mock.assert_called_with(URL)
         test_client.login.assert_called_once_with(USERNAME, PASSWORD, SHARED_SECRET)
 
-    @mock.patch('INWX.Domrobot.ApiClient.__new__')
+    @mock.patch('INWX.Domrobot.ApiClient')
     def test_login_failure(self, client_mock):
         test_client = mock.MagicMock()
         test_client.login = mock.MagicMock(return_value={'code': 2200, 'msg': 'error'})
         client_mock.return_value = test_client
         with pytest.raises(errors.PluginError):
             _INWXClient(URL, USERNAME, PASSWORD, SHARED_SECRET)
-        client_mock.assert_called_with(mock.ANY, URL)
+        client_mock.assert_called_with(URL)
+        test_client.login.assert_called_once_with(USERNAME, PASSWORD, SHARED_SECRET)
+
+    @mock.patch('INWX.Domrobot.ApiClient')
+    def test_login_session_store(self, client_mock):
+        test_client = mock.MagicMock()
+        test_client.login = mock.MagicMock(return_value={'code': 1000})
+        test_client.api_session.cookies = [mock.MagicMock(value='cookie-value', domain='api.test', path='/')]
+        test_client.api_session.cookies[0].name = 'domrobot'
+        client_mock.return_value = test_client
+        store = mock.MagicMock()
+        store.load.return_value = None
+        _INWXClient(URL, USERNAME, PASSWORD, SHARED_SECRET, session_store=store)
         test_client.login.assert_called_once_with(USERNAME, PASSWORD, SHARED_SECRET)
+        store.save.assert_called_once_with(URL, USERNAME, [{'name': 'domrobot', 'value': 'cookie-value',
+                                                            'domain': 'api.test', 'path': '/'}])
+
+    @mock.patch('INWX.Domrobot.ApiClient')
+    def test_login_session_reuse(self, client_mock):
+        test_client = mock.MagicMock()
+        client_mock.return_value = test_client
+        store = mock.MagicMock()
+        store.load.return_value = [{'name': 'domrobot', 'value': 'cookie-value', 'domain': 'api.test', 'path': '/'}]
+        _INWXClient(URL, USERNAME, PASSWORD, SHARED_SECRET, session_store=store)
+        assert not test_client.login.called
+        store.load.assert_called_once_with(URL, USERNAME)
+        test_client.api_session.cookies.set.assert_called_once_with('domrobot', 'cookie-value',
+                                                                    domain='api.test', path='/')
+
+    @mock.patch('INWX.Domrobot.ApiClient')
+    def test_call_api_session_expired(self, client_mock):
+        test_client = mock.MagicMock()
+        test_client.login = mock.MagicMock(return_value={'code': 1000})
+        test_client.call_api = mock.MagicMock(side_effect=[{'code': 2200, 'msg': 'Authentication error'},
+                                                           {'code': 1000, 'resData': {'test': True}},
+                                                           {'code': 2200, 'msg': 'Authentication error'}])
+        client_mock.return_value = test_client
+        store = mock.MagicMock()
+        store.load.return_value = []
+        client = _INWXClient(URL, USERNAME, PASSWORD, SHARED_SECRET, session_store=store)
+        assert client._call_api('test', {}) == {'test': True}
+        test_client.login.assert_called_once_with(USERNAME, PASSWORD, SHARED_SECRET)
+        assert test_client.call_api.call_count == 2
+        store.save.assert_called_once()
+
+        # Only a single login is attempted
+        with pytest.raises(Exception):
+            client._call_api('test', {})
+        test_client.login.assert_called_once()
+
+    def test_call_api_authentication_error(self):
+        test_client = self._setUpClient()
+        test_client.inwx.call_api = mock.MagicMock(return_value={'code': 2200, 'msg': 'Authentication error'})
+        with pytest.raises(Exception):
+            test_client._call_api('test', {})
+        test_client.inwx.call_api.assert_called_once()
+        test_client.inwx.login.assert_called_once()
+
+    def test_discard_session(self):
+        store = mock.MagicMock()
+        store.load.return_value = None
+        test_client = self._setUpClient(session_store=store)
+        test_client.discard_session()
+        test_client.inwx.logout.assert_called_once_with()
+        store.discard.assert_called_once_with()
+        assert test_client.inwx.api_session.mount.call_count == 4
+
+    @mock.patch('INWX.Domrobot.ApiClient')
+    def test_transport(self, client_mock):
+        test_client = mock.MagicMock()
+        test_client.login = mock.MagicMock(return_value={'code': 1000})
+        client_mock.return_value = test_client
+        _INWXClient(URL, USERNAME, PASSWORD, SHARED_SECRET, 3, connect_timeout=5, read_timeout=0)
+        test_client.api_session.mount.assert_any_call('https://', mock.ANY)
+        adapter = test_client.api_session.mount.call_args[0][1]
+        assert adapter.timeout == (5, None)
+        assert adapter._pool_maxsize == 3
+        assert adapter._pool_block
+
+    def test_call_api_metrics(self):
+        test_client = self._setUpClient()
+        test_client.inwx.call_api = mock.MagicMock(side_effect=[{'code': 1000}, {'code': 2400, 'msg': 'error'},
+                                                                ConnectionError()])
+        test_client._call_api('nameserver.list', {})
+        for _ in range(2):
+            with pytest.raises(Exception):
+                test_client._call_api('nameserver.list', {})
+        summary = test_client.metrics.to_json()
+        assert summary['counters']['api_requests_total'] == [
+            {'labels': {'code': '1000', 'method': 'nameserver.list'}, 'value': 1},
+            {'labels': {'code': '2400', 'method': 'nameserver.list'}, 'value': 1},
+            {'labels': {'code': 'exception', 'method': 'nameserver.list'}, 'value': 1},
+        ]
+        assert summary['histograms']['api_request_duration_seconds'][0]['count'] == 3
+
+    def test_find_domain_metrics(self):
+        test_client = self._setUpClient()
+        test_client.inwx.call_api = mock.MagicMock(
+            return_value={'code': 1000, 'resData': {'count': 1, 'domains': [{'domain': 'b.a', 'type': 'MASTER'}]}})
+        test_client._find_domain('d.c.b.a')
+        test_client._find_domain('d.c.b.a')
+        test_client._find_domain('e.b.a')
+        assert test_client.metrics.to_json()['cache_hit_ratios'] == {'record': 0.3333, 'zone_index': 0.5}
 
     def test_call_api_data(self):
         test_client = self._setUpClient()
@@ -197,12 +797,117 @@ class INWXClientTest(unittest.TestCase):
             test_client._call_api('test', params)
         test_client.inwx.call_api.assert_called_once_with('test', params)
 
+    @mock.patch('time.sleep')
+    def test_call_api_retry(self, sleep_mock):
+        test_client = self._setUpClient(max_retries=3)
+        test_client.inwx.call_api = mock.MagicMock(side_effect=[
+            {'code': 2400, 'msg': 'Command failed'}, requests.exceptions.ConnectionError(), {'code': 1000}])
+        with mock.patch('random.uniform', side_effect=lambda low, high: high) as uniform_mock:
+            assert test_client._call_api('nameserver.info', {}) == {}
+        assert uniform_mock.mock_calls == [mock.call(0, 0.5), mock.call(0, 1.0)]
+        assert sleep_mock.mock_calls == [mock.call(0.5), mock.call(1.0)]
+        assert test_client.metrics.to_json()['counters']['retries_total'] == [
+            {'labels': {'reason': 'transient'}, 'value': 2}]
+
+    @mock.patch('time.sleep')
+    def test_call_api_retry_exhausted(self, sleep_mock):
+        test_client = self._setUpClient(max_retries=2)
+        test_client.inwx.call_api = mock.MagicMock(return_value={'code': 2400, 'msg': 'Command failed'})
+        with pytest.raises(Exception, match='Command failed'):
+            test_client._call_api('nameserver.info', {})
+        assert test_client.inwx.call_api.call_count == 3
+        assert sleep_mock.call_count == 2
+
+    @mock.patch('time.sleep')
+    def test_call_api_retry_budget(self, unused_sleep_mock):
+        test_client = self._setUpClient(max_retries=3)
+        test_client.retryBudget = _RetryBudget(1, 0)
+        test_client.inwx.call_api = mock.MagicMock(return_value={'code': 2400, 'msg': 'Command failed'})
+        with pytest.raises(Exception):
+            test_client._call_api('nameserver.info', {})
+        with pytest.raises(Exception):
+            test_client._call_api('nameserver.info', {})
+        assert test_client.inwx.call_api.call_count == 3
+
+    @mock.patch('time.sleep')
+    def test_call_api_no_retry_permanent(self, sleep_mock):
+        test_client = self._setUpClient(max_retries=3)
+        test_client.inwx.call_api = mock.MagicMock(return_value={'code': 2303, 'msg': 'Object does not exist'})
+        with pytest.raises(Exception):
+            test_client._call_api('nameserver.info', {})
+        test_client.inwx.call_api.assert_called_once()
+        assert not sleep_mock.called
+
+    @mock.patch('time.sleep')
+    def test_call_api_no_retry_create_timeout(self, sleep_mock):
+        test_client = self._setUpClient(max_retries=3)
+        test_client.inwx.call_api = mock.MagicMock(side_effect=requests.exceptions.ReadTimeout())
+        with pytest.raises(Exception):
+            test_client._call_api('nameserver.createRecord', {})
+        test_client.inwx.call_api.assert_called_once()
+        assert not sleep_mock.called
+
+    @mock.patch('time.sleep')
+    def test_call_api_retry_create_connect_timeout(self, unused_sleep_mock):
+        test_client = self._setUpClient(max_retries=3)
+        test_client.inwx.call_api = mock.MagicMock(side_effect=[requests.exceptions.ConnectTimeout(),
+                                                                {'code': 1000, 'resData': {'id': 1}}])
+        assert test_client._call_api('nameserver.createRecord', {}) == {'id': 1}
+
+    def test_call_api_circuit_open(self):
+        test_client = self._setUpClient()
+        test_client.inwx.call_api = mock.MagicMock(return_value={'code': 2400, 'msg': 'Command failed'})
+        for _ in range(test_client.circuitBreaker.threshold):
+            with pytest.raises(Exception, match='Command failed'):
+                test_client._call_api('nameserver.info', {})
+        with pytest.raises(Exception, match='not contacted'):
+            test_client._call_api('nameserver.info', {})
+        assert test_client.inwx.call_api.call_count == test_client.circuitBreaker.threshold
+
     def test_find_domain(self):
         test_client = self._setUpClient()
         test_client.inwx.call_api = mock.MagicMock(
             return_value={'code': 1000, 'resData': {'count': 1, 'domains': [{'domain': 'b.a', 'type': 'MASTER'}]}})
         result = test_client._find_domain('d.c.b.a')
         assert result == 'b.a'
+        test_client.inwx.call_api.assert_called_once_with('nameserver.list', {'page': 1, 'pagelimit': 1000})
+
+    def test_find_domain_longest_suffix(self):
+        test_client = self._setUpClient()
+        test_client.inwx.call_api = mock.MagicMock(
+            return_value={'code': 1000, 'resData': {'count': 2, 'domains': [{'domain': 'b.a', 'type': 'MASTER'},
+                                                                            {'domain': 'c.b.a', 'type': 'MASTER'}]}})
+        assert test_client._find_domain('e.d.c.b.a') == 'c.b.a'
+        assert test_client._find_domain('e.d.b.a') == 'b.a'
+        assert test_client._find_domain('_acme-challenge.C.B.A') == 'c.b.a'
+        test_client.inwx.call_api.assert_called_once()
+
+    def test_find_domain_paginated(self):
+        test_client = self._setUpClient()
+        test_client.ZONE_PAGE_LIMIT = 2
+        test_client.inwx.call_api = mock.MagicMock(side_effect=[
+            {'code': 1000, 'resData': {'count': 3, 'domains': [{'domain': 'a.test', 'type': 'MASTER'},
+                                                               {'domain': 'b.test', 'type': 'MASTER'}]}},
+            {'code': 1000, 'resData': {'count': 3, 'domains': [{'domain': 'c.test', 'type': 'MASTER'}]}},
+        ])
+        assert test_client._find_domain('_acme-challenge.c.test') == 'c.test'
+        assert test_client.inwx.call_api.mock_calls == [
+            mock.call('nameserver.list', {'page': 1, 'pagelimit': 2}),
+            mock.call('nameserver.list', {'page': 2, 'pagelimit': 2}),
+        ]
+
+    def test_find_domain_refresh_on_miss(self):
+        test_client = self._setUpClient()
+        test_client.inwx.call_api = mock.MagicMock(side_effect=[
+            {'code': 1000, 'resData': {'count': 1, 'domains': [{'domain': 'a.test', 'type': 'MASTER'}]}},
+            {'code': 1000, 'resData': {'count': 2, 'domains': [{'domain': 'a.test', 'type': 'MASTER'},
+                                                               {'domain': 'b.test', 'type': 'MASTER'}]}},
+        ])
+        assert test_client._find_domain('_acme-challenge.a.test') == 'a.test'
+        assert test_client._find_domain('_acme-challenge.x.a.test') == 'a.test'
+        assert test_client.inwx.call_api.call_count == 1
+        assert test_client._find_domain('_acme-challenge.b.test') == 'b.test'
+        assert test_client.inwx.call_api.call_count == 2
 
     def test_find_domain_failure(self):
         test_client = self._setUpClient()
@@ -210,12 +915,18 @@ class INWXClientTest(unittest.TestCase):
         with pytest.raises(errors.PluginError):
             test_client._find_domain('d.c.b.a')
         expected = [
-            mock.call('nameserver.list', {'domain': 'b.a'}),
-            mock.call('nameserver.list', {'domain': 'c.b.a'}),
-            mock.call('nameserver.list', {'domain': 'd.c.b.a'}),
+            mock.call('nameserver.list', {'page': 1, 'pagelimit': 1000}),
         ]
         assert test_client.inwx.call_api.mock_calls == expected
 
+    def test_find_domain_api_failure(self):
+        test_client = self._setUpClient()
+        test_client.inwx.call_api = mock.MagicMock(return_value={'code': 2400, 'msg': 'error'})
+        with pytest.raises(errors.PluginError) as err:
+            test_client._find_domain('d.c.b.a')
+        assert 'error (2400)' in str(err.value)
+        assert test_client.zoneIndex is None
+
     def test_find_domain_nonmatching(self):
         test_client = self._setUpClient()
         test_client.inwx.call_api = mock.MagicMock(
@@ -230,6 +941,47 @@ class INWXClientTest(unittest.TestCase):
         with pytest.raises(errors.PluginError):
             test_client._find_domain('d.c.b.a')
 
+    def test_find_domain_persistent_cache(self):
+        cache = mock.MagicMock()
+        cache.get.return_value = ['a.test']
+        test_client = self._setUpClient(cache=cache)
+        test_client.inwx.call_api = mock.MagicMock()
+        assert test_client._find_domain('_acme-challenge.a.test') == 'a.test'
+        cache.get.assert_called_once_with('zones')
+        assert not test_client.inwx.call_api.called
+
+    def test_find_domain_persistent_cache_store(self):
+        cache = mock.MagicMock()
+        cache.get.return_value = None
+        test_client = self._setUpClient(cache=cache)
+        test_client.inwx.call_api = mock.MagicMock(
+            return_value={'code': 1000, 'resData': {'count': 1, 'domains': [{'domain': 'a.test', 'type': 'MASTER'}]}})
+        assert test_client._find_domain('_acme-challenge.a.test') == 'a.test'
+        cache.set.assert_called_once_with('zones', ['a.test'])
+
+    def test_add_txt_record_stale_persistent_cache(self):
+        cache = mock.MagicMock()
+        cache.get.return_value = ['a.test']
+        test_client = self._setUpClient(cache=cache)
+        test_client.inwx.call_api = mock.MagicMock(side_effect=[
+            {'code': 2303, 'msg': 'Object does not exist'},
+            {'code': 1000, 'resData': {'count': 1, 'domains': [{'domain': 'b.a.test', 'type': 'MASTER'}]}},
+            {'code': 1000, 'resData': {'id': 1}},
+        ])
+        test_client.add_txt_record('source', '_acme-challenge.b.a.test', 'content', 300)
+        assert test_client.inwx.call_api.mock_calls[2] == mock.call(
+            'nameserver.createRecord', {'domain': 'b.a.test', 'name': '_acme-challenge.b.a.test', 'type': 'TXT',
+                                        'content': 'content', 'ttl': 300})
+        assert test_client._find_domain('_acme-challenge.b.a.test') == 'b.a.test'
+
+    def test_add_txt_record_failure_live_index(self):
+        test_client = self._setUpClient()
+        test_client.zoneIndex = _ZoneIndex(['a.test'])
+        test_client.inwx.call_api = mock.MagicMock(return_value={'code': 2303, 'msg': 'Object does not exist'})
+        with pytest.raises(errors.PluginError):
+            test_client.add_txt_record('source', '_acme-challenge.a.test', 'content', 300)
+        test_client.inwx.call_api.assert_called_once()
+
     def test_add_txt_record(self):
         test_client = self._setUpClient()
         test_client._call_api = mock.MagicMock(return_value={})
@@ -240,6 +992,222 @@ class INWXClientTest(unittest.TestCase):
                                                       {'domain': 'test', 'name': DOMAIN, 'type': 'TXT',
                                                        'content': 'content', 'ttl': 999})
 
+    def test_add_txt_records(self):
+        test_client = self._setUpClient()
+        test_client._call_api = mock.MagicMock(return_value={})
+        test_client._find_domain = mock.MagicMock(side_effect=lambda name: name.split('.', 1)[1])
+        test_client.add_txt_records([('a', '_acme.a.test', 'content-a', 999),
+                                     ('b', '_acme.b.other', 'content-b', 999),
+                                     ('c', '_acme.a.test', 'content-c', 999)])
+        expected = [
+            mock.call('nameserver.info', {'domain': 'a.test', 'type': 'TXT'}),
+            mock.call('nameserver.info', {'domain': 'b.other', 'type': 'TXT'}),
+            mock.call('nameserver.createRecord',
+                      {'domain': 'a.test', 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content-a', 'ttl': 999}),
+            mock.call('nameserver.createRecord',
+                      {'domain': 'a.test', 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content-c', 'ttl': 999}),
+            mock.call('nameserver.createRecord',
+                      {'domain': 'b.other', 'name': '_acme.b.other', 'type': 'TXT', 'content': 'content-b',
+                       'ttl': 999}),
+        ]
+        assert test_client._call_api.mock_calls == expected
+
+    def test_add_txt_records_partial_failure(self):
+        test_client = self._setUpClient()
+        test_client._call_api = mock.MagicMock(side_effect=[Exception('create failed'), {}])
+        test_client._snapshot_txt_records = mock.MagicMock(return_value=[])
+
+        def find_domain(name):
+            if name.endswith('.unknown'):
+                raise errors.PluginError('no domain')
+            return 'test'
+
+        test_client._find_domain = mock.MagicMock(side_effect=find_domain)
+        with pytest.raises(errors.PluginError) as err:
+            test_client.add_txt_records([('a', '_acme.a.test', 'content', 999),
+                                         ('b', '_acme.b.test', 'content', 999),
+                                         ('c', '_acme.c.unknown', 'content', 999)])
+        assert '_acme.a.test for a: create failed' in str(err.value)
+        assert '_acme.c.unknown for c: no domain' in str(err.value)
+        assert '_acme.b.test' not in str(err.value)
+        assert test_client._call_api.call_count == 2
+
+    def test_add_txt_records_failure_invalidates_zone(self):
+        test_client = self._setUpClient()
+        test_client._call_api = mock.MagicMock(side_effect=Exception('create failed'))
+        test_client._snapshot_txt_records = mock.MagicMock(return_value=[])
+        test_client.recordCache.set('_acme.a.test', 'a.test')
+        test_client.recordCache.set('_acme.b.test', 'b.test')
+        with pytest.raises(errors.PluginError):
+            test_client.add_txt_records([('a', '_acme.a.test', 'content', 999)])
+        assert '_acme.a.test' not in test_client.recordCache
+        assert '_acme.b.test' in test_client.recordCache
+
+    def test_add_txt_records_concurrent(self):
+        test_client = self._setUpClient(max_workers=8)
+        barrier = threading.Barrier(4, timeout=5)
+
+        def find_domain(name):
+            # All lookups have to be in flight at the same time to pass the barrier
+            barrier.wait()
+            return name.split('.', 1)[1]
+
+        test_client._call_api = mock.MagicMock(return_value={})
+        test_client._snapshot_txt_records = mock.MagicMock(return_value=[])
+        test_client._find_domain = mock.MagicMock(side_effect=find_domain)
+        records = [('s', f'_acme.{i}.test', 'content', 999) for i in range(4)]
+        test_client.add_txt_records(records)
+        assert test_client._find_domain.call_count == 4
+        assert test_client._call_api.call_count == 4
+
+    def test_add_txt_records_reuse_existing(self):
+        test_client = self._setUpClient()
+        snapshot = [{'id': 1, 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content-a'},
+                    {'id': 2, 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content-a'},
+                    {'id': 3, 'name': 'other.a.test', 'type': 'TXT', 'content': 'content-b'}]
+        test_client._call_api = mock.MagicMock(side_effect=[{'count': 3, 'record': snapshot}, {'id': 4}, {}])
+        test_client._find_domain = mock.MagicMock(return_value='a.test')
+        test_client.add_txt_records([('a', '_acme.a.test', 'content-a', 999),
+                                     ('a', '_acme.a.test', 'content-c', 999)])
+        assert test_client._call_api.mock_calls[1:] == [
+            mock.call('nameserver.createRecord',
+                      {'domain': 'a.test', 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content-c', 'ttl': 999}),
+            mock.call('nameserver.deleteRecord', {'id': 2}),
+        ]
+        assert test_client.recordIds == {('_acme.a.test', 'content-a'): [1], ('_acme.a.test', 'content-c'): [4]}
+        assert test_client.metrics.to_json()['counters']['records_reconciled_total'] == [
+            {'labels': {'action': 'deleted'}, 'value': 1}, {'labels': {'action': 'reused'}, 'value': 1}]
+
+    def test_add_txt_records_snapshot_failure(self):
+        test_client = self._setUpClient()
+        test_client._call_api = mock.MagicMock(side_effect=[Exception('info failed'), {'id': 1}])
+        test_client._find_domain = mock.MagicMock(return_value='a.test')
+        test_client.add_txt_records([('a', '_acme.a.test', 'content-a', 999)])
+        assert test_client.recordIds == {('_acme.a.test', 'content-a'): [1]}
+
+    @mock.patch('time.time')
+    def test_add_txt_records_orphans(self, time_mock):
+        cache = mock.MagicMock(ttl=3600)
+        cache.get.side_effect = lambda key: {f'seen:{URL}:1': 1000.0, f'seen:{URL}:2': 4500.0}.get(key)
+        test_client = self._setUpClient(cache=cache)
+        test_client.orphanAge = 3600
+        time_mock.return_value = 5000.0
+        snapshot = [{'id': 1, 'name': '_acme-challenge.old.a.test', 'type': 'TXT', 'content': 'x'},
+                    {'id': 2, 'name': '_acme-challenge.new.a.test', 'type': 'TXT', 'content': 'y'},
+                    {'id': 3, 'name': 'spf.a.test', 'type': 'TXT', 'content': 'v=spf1'}]
+        test_client._call_api = mock.MagicMock(side_effect=[{'count': 3, 'record': snapshot}, {'id': 4}, {}])
+        test_client._find_domain = mock.MagicMock(return_value='a.test')
+        test_client.add_txt_records([('a', '_acme-challenge.a.test', 'content-a', 999)])
+        assert test_client._call_api.mock_calls[2:] == [mock.call('nameserver.deleteRecord', {'id': 1})]
+        cache.set.assert_called_once_with(f'seen:{URL}:4', 5000.0, ttl=7200)
+
+    def test_add_txt_records_orphan_failure(self):
+        test_client = self._setUpClient()
+        snapshot = [{'id': 1, 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content-a'},
+                    {'id': 2, 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content-a'}]
+        test_client._call_api = mock.MagicMock(side_effect=[{'count': 2, 'record': snapshot},
+                                                            Exception('delete failed')])
+        test_client._find_domain = mock.MagicMock(return_value='a.test')
+        test_client.add_txt_records([('a', '_acme.a.test', 'content-a', 999)])
+
+    def test_add_txt_records_ttl(self):
+        test_client = self._setUpClient(fetch_soa=True)
+        soa = {'id': 1, 'name': 'a.test', 'type': 'SOA', 'ttl': 86400,
+               'content': 'ns.inwx.de hostmaster.inwx.de 2024010101 10800 3600 604800 600'}
+        test_client._call_api = mock.MagicMock(side_effect=[{'count': 0}, {'count': 1, 'record': [soa]}, {}, {}])
+        test_client._find_domain = mock.MagicMock(return_value='a.test')
+        test_client.add_txt_records([('a', '_acme.a.test', 'content-a', 3600), ('a', '_acme.a.test', 'content-b', 60)])
+        assert test_client._call_api.mock_calls[1] == mock.call('nameserver.info', {'domain': 'a.test', 'type': 'SOA'})
+        assert [c[1][1]['ttl'] for c in test_client._call_api.mock_calls[2:]] == [600, 300]
+
+    def test_negative_ttl_cached(self):
+        test_client = self._setUpClient(fetch_soa=True)
+        soa = {'id': 1, 'name': 'a.test', 'type': 'SOA', 'ttl': 300,
+               'content': 'ns.inwx.de hostmaster.inwx.de 2024010101 10800 3600 604800 3600'}
+        test_client._call_api = mock.MagicMock(return_value={'count': 1, 'record': [soa]})
+        assert test_client._negative_ttl('a.test', [3600]) == 300
+        assert test_client._negative_ttl('a.test', [600]) == 300
+        test_client._call_api.assert_called_once()
+
+    def test_negative_ttl_not_needed(self):
+        test_client = self._setUpClient(fetch_soa=True)
+        test_client._call_api = mock.MagicMock()
+        assert test_client._negative_ttl('a.test', [60, 300]) is None
+        assert not test_client._call_api.called
+
+    def test_negative_ttl_failure(self):
+        test_client = self._setUpClient(fetch_soa=True)
+        test_client._call_api = mock.MagicMock(return_value={'count': 0})
+        assert test_client._negative_ttl('a.test', [3600]) is None
+        assert _choose_ttls('a.test', [3600], None) == {3600: 3600}
+
+    def test_choose_ttls_logged_per_zone(self):
+        with self.assertLogs('certbot_dns_inwx._internal.dns_inwx', level='INFO') as logs:
+            assert _choose_ttls('a.test', [60, 600, 3600], 600) == {60: 300, 600: 600, 3600: 600}
+        assert logs.output == ['INFO:certbot_dns_inwx._internal.dns_inwx:Using a TTL of 300/600 seconds for '
+                               'validation records in a.test (negative answers are cached for 600 seconds)']
+
+    def test_add_txt_records_journal(self):
+        journal = mock.MagicMock()
+        journal.leftovers.return_value = [
+            {'zone': 'a.test', 'name': '_acme.a.test', 'content': 'content-a', 'id': 1},
+            {'zone': 'b.test', 'name': '_acme.b.test', 'content': 'stale', 'id': 2},
+        ]
+        test_client = self._setUpClient()
+        test_client.journal = journal
+        snapshot = [{'id': 1, 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content-a'}]
+        test_client._call_api = mock.MagicMock(side_effect=[{}, {'count': 1, 'record': snapshot}, {'id': 3}])
+        test_client._find_domain = mock.MagicMock(return_value='a.test')
+        test_client.add_txt_records([('a', '_acme.a.test', 'content-a', 999), ('a', '_acme.a.test', 'content-c', 999)])
+        assert test_client._call_api.mock_calls[0] == mock.call('nameserver.deleteRecord', {'id': 2})
+        assert journal.mock_calls[1:] == [
+            mock.call.deleted(2), mock.call.compact(),
+            mock.call.created('a.test', '_acme.a.test', 'content-a', 1),
+            mock.call.created('a.test', '_acme.a.test', 'content-c', 3),
+        ]
+        test_client._call_api.reset_mock(side_effect=True)
+        test_client._call_api.return_value = {}
+        test_client.add_txt_records([])
+        journal.leftovers.assert_called_once()
+
+    def test_del_txt_record_journal(self):
+        journal = mock.MagicMock()
+        journal.find.return_value = {'zone': 'a.test', 'name': '_acme.a.test', 'content': 'content', 'id': 5}
+        test_client = self._setUpClient()
+        test_client.journal = journal
+        test_client._call_api = mock.MagicMock(return_value={})
+        test_client.del_txt_records([('a', '_acme.a.test', 'content')])
+        test_client._call_api.assert_called_once_with('nameserver.deleteRecord', {'id': 5})
+        assert journal.mock_calls == [mock.call.find('_acme.a.test', 'content'), mock.call.deleted(5),
+                                      mock.call.compact()]
+
+    def test_run_concurrently_order(self):
+        test_client = self._setUpClient(max_workers=4)
+
+        def func(item):
+            time.sleep(0.01 * (5 - item))
+            if item == 3:
+                raise Exception('three')
+            return item * 2
+
+        results = test_client._run_concurrently(func, range(5))
+        assert [result for result, _ in results] == [0, 2, 4, None, 8]
+        assert [str(err) if err else None for _, err in results] == [None, None, None, 'three', None]
+
+    def test_del_txt_records(self):
+        test_client = self._setUpClient()
+
+        def del_txt_record(source, name, content):
+            if source == 'b':
+                raise errors.PluginError(f'Failed to delete TXT DNS record {name} for {source}')
+
+        test_client.del_txt_record = mock.MagicMock(side_effect=del_txt_record)
+        with pytest.raises(errors.PluginError) as err:
+            test_client.del_txt_records([('a', '_acme.a', 'content'), ('b', '_acme.b', 'content')])
+        assert test_client.del_txt_record.mock_calls == [mock.call('a', '_acme.a', 'content'),
+                                                         mock.call('b', '_acme.b', 'content')]
+        assert str(err.value) == 'Failed to delete TXT DNS record _acme.b for b'
+
     def test_del_txt_record(self):
         test_client = self._setUpClient()
         test_client._call_api = mock.MagicMock(return_value={'count': 1, 'record': [{'id': 999}]})
@@ -252,6 +1220,52 @@ class INWXClientTest(unittest.TestCase):
             mock.call('nameserver.deleteRecord', {'id': 999})]
         assert test_client._call_api.mock_calls == expected
 
+    def test_del_txt_record_known_id(self):
+        test_client = self._setUpClient()
+        test_client._call_api = mock.MagicMock(return_value={'id': 42})
+        test_client._find_domain = mock.MagicMock(return_value='test')
+        test_client.add_txt_record('source', DOMAIN, 'content', 999)
+        test_client._call_api.reset_mock()
+        test_client._find_domain.reset_mock()
+
+        test_client.del_txt_record('source', DOMAIN, 'content')
+        assert not test_client._find_domain.called
+        test_client._call_api.assert_called_once_with('nameserver.deleteRecord', {'id': 42})
+        assert test_client.recordIds == {}
+
+    def test_del_txt_record_duplicate_ids(self):
+        test_client = self._setUpClient()
+        test_client._call_api = mock.MagicMock(side_effect=[{'id': 1}, {'id': 2}, {}, {}])
+        test_client._snapshot_txt_records = mock.MagicMock(return_value=[])
+        test_client._find_domain = mock.MagicMock(return_value='test')
+        test_client.add_txt_records([('a', DOMAIN, 'content', 999), ('b', DOMAIN, 'content', 999)])
+        test_client.del_txt_records([('a', DOMAIN, 'content'), ('b', DOMAIN, 'content')])
+        deleted = sorted(c[1][1]['id'] for c in test_client._call_api.mock_calls[2:])
+        assert deleted == [1, 2]
+
+    def test_del_txt_records_shared_name(self):
+        test_client = self._setUpClient()
+        test_client._find_domain = mock.MagicMock(return_value='test')
+        test_client._call_api = mock.MagicMock(side_effect=[
+            {'count': 3, 'record': [{'id': 1, 'content': 'apex'}, {'id': 2, 'content': 'other'},
+                                    {'id': 3, 'content': 'wildcard'}]}, {}, {}])
+        test_client.del_txt_records([('a', DOMAIN, 'apex'), ('*.a', DOMAIN, 'wildcard')])
+        test_client._find_domain.assert_called_once_with(DOMAIN)
+        assert test_client._call_api.mock_calls[0] == mock.call('nameserver.info',
+                                                                {'domain': 'test', 'name': DOMAIN, 'type': 'TXT'})
+        deleted = sorted(c[1][1]['id'] for c in test_client._call_api.mock_calls[1:])
+        assert deleted == [1, 3]
+        assert test_client.recordIds == {}
+
+    def test_del_txt_records_shared_name_lookup_failure(self):
+        test_client = self._setUpClient()
+        test_client._find_domain = mock.MagicMock(return_value='test')
+        test_client._call_api = mock.MagicMock(side_effect=[
+            errors.PluginError('unavailable'),
+            {'count': 1, 'record': [{'id': 1}]}, {}, {'count': 1, 'record': [{'id': 3}]}, {}])
+        test_client.del_txt_records([('a', DOMAIN, 'apex'), ('*.a', DOMAIN, 'wildcard')])
+        assert test_client._call_api.call_count == 5
+
     def test_del_txt_record_noexist(self):
         test_client = self._setUpClient()
         test_client._call_api = mock.MagicMock(return_value={'count': 0, 'record': []})
@@ -0,0 +1,241 @@
+"""Local stand-in for the INWX Domrobot XML-RPC API used by benchmarks and integration tests."""
+import collections
+import itertools
+import math
+import random
+import secrets
+import socketserver
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from xmlrpc.server import SimpleXMLRPCRequestHandler
+from xmlrpc.server import SimpleXMLRPCServer
+
+
+class _RequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/xmlrpc/',)
+    # Keep connections alive like the real API does
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.instance.connection_opened()
+
+    def do_POST(self) -> None:
+        # Calls are dispatched in the thread of their connection, which lets them see its session
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        self.server.instance.local.session = cookie['domrobot'].value if 'domrobot' in cookie else None
+        self.server.instance.local.new_session = None
+        super().do_POST()
+
+    def end_headers(self) -> None:
+        session = getattr(self.server.instance.local, 'new_session', None)
+        if session is not None:
+            self.send_header('Set-Cookie', f'domrobot={session}; Path=/')
+            self.server.instance.local.new_session = None
+        super().end_headers()
+
+
+class _ThreadingXMLRPCServer(socketserver.ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+class FakeDomrobot:
+    """
+    Serves an in-memory account with zones and records over XML-RPC on a local port.
+
+    Like the real API, a login starts a session identified by a cookie, which all other calls
+    require, and records with the same name, type and content cannot be created twice.
+
+    Every API call is counted per method. Calls can be delayed by a fixed or random latency,
+    randomly fail with configurable result codes and be refused if they exceed a rate limit.
+    Connections are kept alive and counted, as is the peak number of calls processed concurrently.
+    """
+
+    AUTHENTICATION_ERROR = 2200
+
+    def __init__(self, zones: Iterable[str] = (), latency: Union[float, Callable[[random.Random], float]] = 0.0,
+                 error_rate: float = 0.0, error_code: int = 2400, seed: Optional[int] = None,
+                 errors: Optional[Dict[int, float]] = None, rate_limit: float = 0.0,
+                 rate_limit_code: int = 2502, session_lifetime: Optional[float] = None) -> None:
+        """
+        :param list zones: Names of the zones of the account, all served as MASTER.
+        :param latency: Seconds every API call is delayed, or a function drawing them from the
+                        given random number generator, e.g. :func:`lognormal_latency`.
+        :param float error_rate: Probability of an API call to fail with `error_code`.
+        :param int error_code: The result code of injected failures.
+        :param int seed: Seed of the random number generator used for latencies and failures.
+        :param dict errors: Further result codes of injected failures and their probabilities.
+        :param float rate_limit: Maximum number of API calls within any second (0 to disable).
+        :param int rate_limit_code: The result code of calls exceeding the rate limit.
+        :param float session_lifetime: Seconds after which sessions expire (None to never expire).
+        """
+        self.zones = {zone: {} for zone in zones}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.errors = dict(errors or {})
+        self.rate_limit = rate_limit
+        self.rate_limit_code = rate_limit_code
+        self.rate_limited = 0
+        self.recent_calls = collections.deque()
+        self.session_lifetime = session_lifetime
+        self.sessions = {}
+        self.local = threading.local()
+        self.random = random.Random(seed)
+        self.calls = collections.Counter()
+        self.connections = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        """The URL to configure as `dns_inwx_url`."""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeDomrobot':
+        """Start serving in a background thread."""
+        self.server = _ThreadingXMLRPCServer(('127.0.0.1', 0), requestHandler=_RequestHandler,
+                                             logRequests=False, allow_none=True)
+        self.server.register_instance(self)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self) -> 'FakeDomrobot':
+        return self.start()
+
+    def __exit__(self, *unused_args) -> None:
+        self.stop()
+
+    def records(self, zone: Optional[str] = None) -> List[dict]:
+        """Return a copy of all records, optionally only those of a single zone."""
+        with self.lock:
+            return [dict(record, domain=name) for name, records in self.zones.items()
+                    if zone is None or name == zone for record in records.values()]
+
+    def connection_opened(self) -> None:
+        with self.lock:
+            self.connections += 1
+
+    def _dispatch(self, method: str, params: tuple) -> dict:
+        with self.lock:
+            self.calls[method] += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            limited = self._exceeds_rate_limit()
+            error = self._draw_error()
+            latency = self.latency(self.random) if callable(self.latency) else self.latency
+        try:
+            if latency:
+                time.sleep(latency)
+            if limited:
+                return {'code': self.rate_limit_code, 'msg': 'Rate limit exceeded'}
+            if error is not None:
+                return {'code': error, 'msg': 'Injected failure'}
+
+            handler = getattr(self, '_' + method.replace('.', '_'), None)
+            if handler is None:
+                return {'code': 2000, 'msg': 'Command unrecognized'}
+            with self.lock:
+                if method != 'account.login' and not self._has_session():
+                    return {'code': self.AUTHENTICATION_ERROR, 'msg': 'Authentication error'}
+                return handler(params[0] if params else {})
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _exceeds_rate_limit(self) -> bool:
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        while self.recent_calls and self.recent_calls[0] <= now - 1.0:
+            self.recent_calls.popleft()
+        if len(self.recent_calls) >= self.rate_limit:
+            self.rate_limited += 1
+            return True
+        self.recent_calls.append(now)
+        return False
+
+    def _draw_error(self) -> Optional[int]:
+        draw = self.random.random()
+        for code, probability in [(self.error_code, self.error_rate), *self.errors.items()]:
+            if draw < probability:
+                return code
+            draw -= probability
+        return None
+
+    def _has_session(self) -> bool:
+        started = self.sessions.get(getattr(self.local, 'session', None))
+        if started is None:
+            return False
+        if self.session_lifetime is not None and time.monotonic() - started > self.session_lifetime:
+            del self.sessions[self.local.session]
+            return False
+        return True
+
+    def _account_login(self, params: dict) -> dict:
+        session = secrets.token_hex(16)
+        self.sessions[session] = time.monotonic()
+        self.local.new_session = session
+        return {'code': 1000, 'msg': 'Command completed successfully', 'resData': {'tfa': '0'}}
+
+    def _account_logout(self, params: dict) -> dict:
+        self.sessions.pop(self.local.session, None)
+        return {'code': 1500, 'msg': 'Command completed successfully; ending session'}
+
+    def _nameserver_list(self, params: dict) -> dict:
+        zones = sorted(zone for zone in self.zones if params.get('domain') in (None, zone))
+        page = int(params.get('page', 1))
+        limit = int(params.get('pagelimit', 20))
+        domains = [{'domain': zone, 'type': 'MASTER'} for zone in zones[(page - 1) * limit:page * limit]]
+        return {'code': 1000, 'resData': {'count': len(zones), 'domains': domains}}
+
+    def _nameserver_info(self, params: dict) -> dict:
+        if params.get('domain') not in self.zones:
+            return {'code': 2303, 'msg': 'Object does not exist'}
+        if params.get('type') == 'SOA':
+            soa = {'id': 0, 'name': params['domain'], 'type': 'SOA', 'ttl': 86400,
+                   'content': 'ns.inwx.de hostmaster.inwx.de 2024010101 10800 3600 604800 3600'}
+            return {'code': 1000, 'resData': {'domain': params['domain'], 'count': 1, 'record': [soa]}}
+        records = [record for record in self.zones[params['domain']].values()
+                   if all(params[key] == record[key] for key in ('name', 'type', 'content') if key in params)]
+        return {'code': 1000, 'resData': {'domain': params['domain'], 'count': len(records),
+                                          'record': [dict(record) for record in records]}}
+
+    def _nameserver_createRecord(self, params: dict) -> dict:
+        if params.get('domain') not in self.zones:
+            return {'code': 2303, 'msg': 'Object does not exist'}
+        if any(all(record[key] == params.get(key) for key in ('name', 'type', 'content'))
+               for record in self.zones[params['domain']].values()):
+            return {'code': 2302, 'msg': 'Object exists'}
+        record_id = next(self.ids)
+        self.zones[params['domain']][record_id] = {
+            'id': record_id, 'name': params['name'], 'type': params['type'], 'content': params['content'],
+            'ttl': params.get('ttl', 3600)}
+        return {'code': 1000, 'resData': {'id': record_id}}
+
+    def _nameserver_deleteRecord(self, params: dict) -> dict:
+        for records in self.zones.values():
+            if records.pop(params.get('id'), None) is not None:
+                return {'code': 1000}
+        return {'code': 2303, 'msg': 'Object does not exist'}
+
+
+def lognormal_latency(median: float, sigma: float = 0.5) -> Callable[[random.Random], float]:
+    """
+    Latency distribution of a FakeDomrobot with the given median in seconds and a long tail.
+    """
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
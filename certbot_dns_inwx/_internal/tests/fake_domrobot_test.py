@@ -0,0 +1,81 @@
+"""Tests for certbot_dns_inwx._internal.tests.fake_domrobot."""
+import random
+import statistics
+import sys
+import time
+import unittest
+import xmlrpc.client
+
+import pytest
+
+from certbot_dns_inwx._internal.dns_inwx import _INWXClient
+from certbot_dns_inwx._internal.tests.fake_domrobot import FakeDomrobot, lognormal_latency
+
+
+class FakeDomrobotTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = FakeDomrobot(['a.test']).start()
+        self.addCleanup(self.server.stop)
+
+    def _client(self) -> _INWXClient:
+        return _INWXClient(self.server.url, 'user', 'password', None)
+
+    def test_session_required(self):
+        proxy = xmlrpc.client.ServerProxy(self.server.url + '/xmlrpc/')
+        assert proxy.nameserver.list({})['code'] == 2200
+        assert self._client()._call_api('nameserver.list', {})['count'] == 1
+
+    def test_session_expiry(self):
+        client = self._client()
+        self.server.session_lifetime = 0.01
+        time.sleep(0.02)
+        with pytest.raises(Exception, match=r'Authentication error \(2200\)'):
+            client._call_api('nameserver.list', {})
+        assert client.sessionRejected
+
+    def test_logout(self):
+        client = self._client()
+        session = client.inwx.api_session.cookies.get('domrobot')
+        client.inwx.logout()
+        # The logout replaced the HTTP session, present the ended session again
+        client.inwx.api_session.cookies.set('domrobot', session)
+        with pytest.raises(Exception, match=r'\(2200\)'):
+            client._call_api('nameserver.list', {})
+
+    def test_duplicate_record(self):
+        client = self._client()
+        params = {'domain': 'a.test', 'name': '_acme.a.test', 'type': 'TXT', 'content': 'content'}
+        client._call_api('nameserver.createRecord', params)
+        with pytest.raises(Exception, match=r'Object exists \(2302\)'):
+            client._call_api('nameserver.createRecord', params)
+
+    def test_rate_limit(self):
+        client = self._client()
+        self.server.rate_limit = 3
+        self.server.recent_calls.clear()
+        for _ in range(3):
+            client._call_api('nameserver.list', {})
+        with pytest.raises(Exception, match=r'Rate limit exceeded \(2502\)'):
+            client._call_api('nameserver.list', {})
+        assert self.server.rate_limited == 1
+
+    def test_error_codes(self):
+        client = self._client()
+        self.server.errors = {2201: 1.0}
+        with pytest.raises(Exception, match='insufficient authorization'):
+            client._call_api('nameserver.list', {})
+
+    def test_error_code_mix(self):
+        server = FakeDomrobot(error_rate=0.25, errors={2201: 0.25, 2500: 0.25}, seed=1)
+        draws = [server._draw_error() for _ in range(4000)]
+        for code in (2400, 2201, 2500, None):
+            assert draws.count(code) == pytest.approx(1000, rel=0.15)
+
+    def test_lognormal_latency(self):
+        rng = random.Random(0)
+        latency = lognormal_latency(0.01)
+        assert statistics.median(latency(rng) for _ in range(2000)) == pytest.approx(0.01, rel=0.1)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
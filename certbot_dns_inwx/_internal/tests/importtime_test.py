@@ -0,0 +1,56 @@
+"""Import time regression tests of the plugin's load path."""
+import os
+import subprocess
+import sys
+import unittest
+from typing import Dict, Tuple
+
+import pytest
+
+BASELINE = 'import acme.challenges, certbot.achallenges, certbot.display.util, certbot.plugins.dns_common'
+PLUGIN = 'import certbot_dns_inwx._internal.dns_inwx'
+LOAD = PLUGIN + '; certbot_dns_inwx._internal.dns_inwx.Authenticator.add_parser_arguments(lambda *a, **kw: None)'
+
+# Modules only needed once a client or resolver is actually used
+DEFERRED = ('INWX', 'xmlrpc.client', 'dns', 'aiohttp', 'concurrent.futures.thread',
+            'certbot_dns_inwx._internal.cache', 'certbot_dns_inwx._internal.session',
+            'certbot_dns_inwx._internal.aio')
+
+# Microseconds the plugin may add on top of certbot's own imports, generous to tolerate
+# slow machines and missing bytecode caches
+BUDGET = 50000
+
+# Timing assertions depend on the machine, so they only run if this environment variable is set
+PERFORMANCE_TESTS = 'CERTBOT_DNS_INWX_PERFORMANCE_TESTS'
+
+
+def import_times(code: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Run `code` in a fresh interpreter and return the self and cumulative import time of every module.
+    """
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in output.splitlines():
+        fields = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = (int(fields[0][len('import time:'):]), int(fields[1]))
+    return times
+
+
+class ImportTimeTest(unittest.TestCase):
+    def test_deferred_imports(self):
+        imported = import_times(LOAD)
+        assert 'certbot_dns_inwx._internal.dns_inwx' in imported
+        for module in DEFERRED:
+            assert module not in imported, f'{module} is imported when loading the plugin'
+
+    @unittest.skipUnless(os.environ.get(PERFORMANCE_TESTS), f'set {PERFORMANCE_TESTS} to measure the import time')
+    def test_budget(self):
+        baseline = import_times(BASELINE)
+        added = sum(self_time for module, (self_time, _) in import_times(LOAD).items() if module not in baseline)
+        assert added <= BUDGET, f'Loading the plugin adds {added} us to the import time'
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
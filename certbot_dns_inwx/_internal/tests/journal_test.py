@@ -0,0 +1,106 @@
+"""Tests for certbot_dns_inwx._internal.journal."""
+import json
+import subprocess
+import sys
+import time
+from unittest import mock
+
+import pytest
+from certbot.compat import filesystem
+from certbot.compat import os
+from certbot.tests import util as test_util
+
+from certbot_dns_inwx._internal.journal import Journal
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class JournalTest(test_util.TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.path = os.path.join(self.tempdir, 'dns-inwx', 'journal.jsonl')
+        self.journal = Journal(self.path)
+
+    def _write(self, *entries: dict) -> None:
+        filesystem.makedirs(os.path.dirname(self.path), 0o700)
+        with open(self.path, 'a') as file:
+            for entry in entries:
+                file.write(json.dumps(entry) + '\n')
+
+    def test_outstanding(self):
+        self.journal.created('a.test', '_acme.a.test', 'content-a', 1)
+        self.journal.created('a.test', '_acme.a.test', 'content-b', 2)
+        self.journal.deleted(1)
+        assert [entry['id'] for entry in self.journal.outstanding()] == [2]
+        assert self.journal.find('_acme.a.test', 'content-b')['zone'] == 'a.test'
+        assert self.journal.find('_acme.a.test', 'content-a') is None
+        assert filesystem.check_mode(self.path, 0o600)
+
+    def test_leftovers(self):
+        pid = dead_pid()
+        self._write({'op': 'create', 'zone': 'a.test', 'name': 'dead', 'content': 'x', 'id': 1, 'pid': pid,
+                     'time': 1000.0},
+                    {'op': 'create', 'zone': 'a.test', 'name': 'running', 'content': 'x', 'id': 2,
+                     'pid': os.getppid(), 'time': 1000.0})
+        self.journal.created('a.test', 'own', 'x', 3)
+        with mock.patch('time.time', return_value=2000.0):
+            assert [entry['name'] for entry in self.journal.leftovers()] == ['dead']
+        with mock.patch('time.time', return_value=1000.0 + Journal.MAX_AGE + 1):
+            assert [entry['name'] for entry in self.journal.leftovers()] == ['dead', 'running']
+
+    def test_leftovers_reused_pid(self):
+        # An earlier run in a container started anew has the same PID as this one
+        self._write({'op': 'create', 'zone': 'a.test', 'name': 'earlier', 'content': 'x', 'id': 1,
+                     'pid': os.getpid(), 'run': 'earlier-run', 'time': time.time()},
+                    {'op': 'create', 'zone': 'a.test', 'name': 'legacy', 'content': 'x', 'id': 2,
+                     'pid': os.getpid(), 'time': time.time()})
+        self.journal.created('a.test', 'own', 'x', 3)
+        assert [entry['name'] for entry in self.journal.leftovers()] == ['earlier', 'legacy']
+
+    def test_leftovers_own_run_expired(self):
+        self.journal.created('a.test', 'own', 'x', 1)
+        with mock.patch('time.time', return_value=time.time() + Journal.MAX_AGE + 1):
+            assert [entry['name'] for entry in self.journal.leftovers()] == ['own']
+
+    def test_taken_over(self):
+        self._write({'op': 'create', 'zone': 'a.test', 'name': 'n', 'content': 'x', 'id': 1, 'pid': dead_pid(),
+                     'time': 1000.0})
+        self.journal.created('a.test', 'n', 'x', 1)
+        assert self.journal.leftovers() == []
+
+    def test_torn_line(self):
+        self.journal.created('a.test', '_acme.a.test', 'content', 1)
+        with open(self.path, 'a') as file:
+            file.write('{"op": "create", "zo')
+        assert len(self.journal.outstanding()) == 1
+
+    def test_compact(self):
+        self.journal.created('a.test', '_acme.a.test', 'content-a', 1)
+        self.journal.created('a.test', '_acme.a.test', 'content-b', 2)
+        self.journal.deleted(1)
+        self.journal.compact()
+        with open(self.path) as file:
+            assert [json.loads(line)['id'] for line in file] == [2]
+        self.journal.deleted(2)
+        self.journal.compact()
+        assert not os.path.exists(self.path)
+
+    def test_missing(self):
+        assert self.journal.outstanding() == []
+        self.journal.compact()
+
+    @mock.patch('certbot.compat.filesystem.makedirs', side_effect=PermissionError('read-only'))
+    def test_inaccessible(self, unused_makedirs_mock):
+        self.journal.created('a.test', '_acme.a.test', 'content', 1)
+        assert self.journal.outstanding() == []
+        assert self.journal.find('_acme.a.test', 'content') is None
+        assert self.journal.leftovers() == []
+        self.journal.compact()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
@@ -0,0 +1,93 @@
+"""Tests for certbot_dns_inwx._internal.lru."""
+import sys
+import unittest
+from unittest import mock
+
+import pytest
+
+from certbot_dns_inwx._internal.lru import LRUCache
+from certbot_dns_inwx._internal.metrics import Metrics
+
+
+class LRUCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.metrics = Metrics()
+        self.cache = LRUCache('test', max_entries=2, ttl=10, metrics=self.metrics)
+
+    def test_get_set(self):
+        assert self.cache.get('a') is None
+        assert self.cache.get('a', 'default') == 'default'
+        self.cache.set('a', 1)
+        assert self.cache.get('a') == 1
+        assert 'a' in self.cache
+        assert self.cache['a'] == 1
+        with pytest.raises(KeyError):
+            self.cache['b']
+        assert self.cache.stats() == {'hits': 1, 'misses': 2, 'evictions': 0, 'expirations': 0,
+                                      'invalidations': 0, 'size': 1}
+        assert self.metrics.to_json()['cache_hit_ratios'] == {'test': 0.3333}
+
+    def test_lru_eviction(self):
+        self.cache['a'] = 1
+        self.cache['b'] = 2
+        self.cache.get('a')
+        self.cache['c'] = 3
+        assert 'a' in self.cache
+        assert 'b' not in self.cache
+        assert len(self.cache) == 2
+        assert self.cache.stats()['evictions'] == 1
+        assert self.metrics.counts('cache_evictions_total', 'reason') == {'size': 1}
+
+    @mock.patch('time.monotonic')
+    def test_ttl(self, monotonic_mock):
+        monotonic_mock.return_value = 100.0
+        self.cache.set('a', 1)
+        self.cache.set('b', 2, ttl=60)
+        monotonic_mock.return_value = 110.0
+        assert self.cache.get('a') is None
+        assert self.cache.get('b') == 2
+        assert self.cache.stats()['expirations'] == 1
+        assert self.metrics.counts('cache_evictions_total', 'reason') == {'expired': 1}
+
+    def test_invalidate(self):
+        self.cache['a'] = 1
+        self.cache.invalidate('a')
+        self.cache.invalidate('unknown')
+        assert 'a' not in self.cache
+        assert self.cache.stats()['invalidations'] == 1
+
+    def test_clear(self):
+        self.cache['a'] = 1
+        self.cache.get('a')
+        self.cache.clear()
+        assert self.cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                                      'invalidations': 0, 'size': 0}
+
+    @mock.patch('time.monotonic')
+    def test_on_evict(self, monotonic_mock):
+        monotonic_mock.return_value = 100.0
+        on_evict = mock.MagicMock()
+        cache = LRUCache('test', max_entries=2, ttl=10, on_evict=on_evict)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        cache.set('c', 4)
+        cache.invalidate('b')
+        cache.set('d', 5, ttl=1)
+        monotonic_mock.return_value = 101.0
+        assert cache.get('d') is None
+        assert on_evict.mock_calls == [mock.call('a', 1), mock.call('c', 3), mock.call('b', 2), mock.call('d', 5)]
+
+        # Entries taken over or forgotten all at once are not reported
+        on_evict.reset_mock()
+        cache.set('e', 6)
+        assert cache.keys() == ['c', 'e']
+        assert cache.pop('c') == 4
+        assert cache.pop('c', 'default') == 'default'
+        cache.clear()
+        assert not on_evict.called
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
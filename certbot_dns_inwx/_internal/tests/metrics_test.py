@@ -0,0 +1,88 @@
+"""Tests for certbot_dns_inwx._internal.metrics."""
+import json
+import sys
+from unittest import mock
+
+import pytest
+from certbot.compat import os
+from certbot.tests import util as test_util
+
+from certbot_dns_inwx._internal.metrics import Metrics
+
+
+class MetricsTest(test_util.TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.metrics = Metrics()
+
+    def test_histogram(self):
+        self.metrics.observe('api_request_duration_seconds', 0.02, method='nameserver.list')
+        self.metrics.observe('api_request_duration_seconds', 20, method='nameserver.list')
+        histogram = self.metrics.to_json()['histograms']['api_request_duration_seconds'][0]
+        assert histogram['count'] == 2
+        assert histogram['sum'] == 20.02
+        assert histogram['buckets']['0.01'] == 0
+        assert histogram['buckets']['0.025'] == 1
+        assert histogram['buckets']['10.0'] == 1
+
+    def test_timed(self):
+        with mock.patch('time.monotonic', side_effect=[10.0, 10.5]):
+            with self.metrics.timed('zone_lookup_duration_seconds'):
+                pass
+        histogram = self.metrics.to_json()['histograms']['zone_lookup_duration_seconds'][0]
+        assert histogram == {'labels': {}, 'count': 1, 'sum': 0.5, 'buckets': mock.ANY}
+
+    def test_cache_hit_ratios(self):
+        self.metrics.cache_lookup('record', True)
+        self.metrics.cache_lookup('record', True)
+        self.metrics.cache_lookup('record', False)
+        self.metrics.cache_lookup('zone_index', False)
+        assert self.metrics.to_json()['cache_hit_ratios'] == {'record': 0.6667, 'zone_index': 0.0}
+
+    def test_to_prometheus(self):
+        self.metrics.increment('retries_total', reason='session_expired')
+        self.metrics.observe('zone_lookup_duration_seconds', 0.2)
+        text = self.metrics.to_prometheus()
+        assert '# TYPE certbot_dns_inwx_retries_total counter\n' in text
+        assert 'certbot_dns_inwx_retries_total{reason="session_expired"} 1\n' in text
+        assert '# TYPE certbot_dns_inwx_zone_lookup_duration_seconds histogram\n' in text
+        assert 'certbot_dns_inwx_zone_lookup_duration_seconds_bucket{le="0.1"} 0\n' in text
+        assert 'certbot_dns_inwx_zone_lookup_duration_seconds_bucket{le="0.25"} 1\n' in text
+        assert 'certbot_dns_inwx_zone_lookup_duration_seconds_bucket{le="+Inf"} 1\n' in text
+        assert 'certbot_dns_inwx_zone_lookup_duration_seconds_count 1\n' in text
+
+    def test_label_escaping(self):
+        self.metrics.increment('api_requests_total', method='a"b\\c')
+        assert 'certbot_dns_inwx_api_requests_total{method="a\\"b\\\\c"} 1' in self.metrics.to_prometheus()
+
+    def test_write_json(self):
+        path = os.path.join(self.tempdir, 'metrics.json')
+        self.metrics.increment('retries_total', reason='stale_zone')
+        self.metrics.write(path)
+        with open(path) as file:
+            assert json.load(file)['counters']['retries_total'] == [{'labels': {'reason': 'stale_zone'}, 'value': 1}]
+
+    def test_write_failure(self):
+        self.metrics.write(os.path.join(self.tempdir, 'missing', 'metrics.prom'))
+
+    def test_counts(self):
+        self.metrics.increment('api_requests_total', method='nameserver.info', code=1000)
+        self.metrics.increment('api_requests_total', method='nameserver.info', code=2400)
+        self.metrics.increment('api_requests_total', method='nameserver.list', code=1000)
+        assert self.metrics.counts('api_requests_total', 'method') == {'nameserver.info': 2, 'nameserver.list': 1}
+        assert self.metrics.counts('retries_total', 'reason') == {}
+
+    def test_mean(self):
+        assert self.metrics.mean('api_request_duration_seconds') is None
+        self.metrics.observe('api_request_duration_seconds', 0.1, method='nameserver.info')
+        self.metrics.observe('api_request_duration_seconds', 0.3, method='nameserver.list')
+        assert self.metrics.mean('api_request_duration_seconds') == pytest.approx(0.2)
+
+    def test_reset(self):
+        self.metrics.increment('retries_total', reason='stale_zone')
+        self.metrics.reset()
+        assert self.metrics.to_json() == {'counters': {}, 'histograms': {}, 'cache_hit_ratios': {}}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
@@ -0,0 +1,62 @@
+"""Tests for certbot_dns_inwx._internal.plan."""
+import json
+import sys
+from unittest import mock
+
+import pytest
+from certbot.tests import util as test_util
+
+from certbot_dns_inwx._internal import plan
+from certbot_dns_inwx._internal.standalone import StandaloneAuthenticator
+from certbot_dns_inwx._internal.tests import benchmark
+from certbot_dns_inwx._internal.tests.fake_domrobot import FakeDomrobot
+
+
+class PlanTest(test_util.TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        benchmark.reset_caches()
+        self.server = FakeDomrobot(['a.test', 'b.test']).start()
+        self.server.zones['a.test'][100] = {'id': 100, 'name': '_acme-challenge.old.a.test', 'type': 'TXT',
+                                            'content': 'stale', 'ttl': 300}
+        self.config = benchmark.make_config(self.tempdir, self.server.url, rate_limit=0)
+        self.authenticator = StandaloneAuthenticator(self.config, 'dns-inwx')
+        self.authenticator._setup_credentials()
+
+    def tearDown(self) -> None:
+        self.server.stop()
+        benchmark.reset_caches()
+        super().tearDown()
+
+    def test_make_plan(self):
+        result = plan.make_plan(self.authenticator, ['a.test', '*.a.test', 'www.b.test', 'c.test'])
+        assert [record['zone'] for record in result['records']] == ['a.test', 'a.test', 'b.test', None]
+        assert result['records'][1]['record_name'] == '_acme-challenge.a.test'
+        assert 'Unable to determine base domain' in result['records'][3]['error']
+        assert [record['zone_cache'] for record in result['records']] == ['cold', 'warm', 'warm', 'cold']
+        assert result['zones'][0] == {'account': None, 'zone': 'a.test', 'records': 2, 'negative_ttl': None,
+                                      'existing_challenge_records': 1}
+        assert result['api_calls'] == {'account.login': 1, 'nameserver.createRecord': 3,
+                                       'nameserver.deleteRecord': 3, 'nameserver.info': 2, 'nameserver.list': 2}
+        assert result['estimated_seconds']['propagation'] == 0
+
+    def test_no_writes(self):
+        plan.make_plan(self.authenticator, ['a.test', 'b.test'])
+        assert 'nameserver.createRecord' not in self.server.calls
+        assert 'nameserver.deleteRecord' not in self.server.calls
+        assert len(self.server.records()) == 1
+
+    def test_format_plan(self):
+        text = plan.format_plan(plan.make_plan(self.authenticator, ['a.test']))
+        assert '_acme-challenge.a.test for a.test: zone a.test, TTL 300' in text
+        assert 'nameserver.createRecord: 1' in text
+
+    def test_main(self):
+        with mock.patch('builtins.print') as print_mock:
+            assert plan.main(['-d', 'a.test', '--json', '--credentials', self.config.dns_inwx_credentials,
+                              '--rate-limit', '0', '--follow-cnames', '']) == 0
+        assert json.loads(print_mock.call_args[0][0])['api_calls']['nameserver.createRecord'] == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
@@ -0,0 +1,104 @@
+"""Tests for certbot_dns_inwx._internal.propagation."""
+import sys
+import unittest
+from unittest import mock
+
+import dns.exception
+import dns.message
+import dns.name
+import dns.rdatatype
+import dns.resolver
+import dns.rrset
+import pytest
+
+from certbot_dns_inwx._internal.propagation import PropagationChecker
+
+ZONE = 'example.com'
+NAME = '_acme-challenge.example.com'
+
+
+def _response(name: str, *values: str) -> dns.message.Message:
+    response = dns.message.make_response(dns.message.make_query(name, dns.rdatatype.TXT))
+    if values:
+        response.answer.append(dns.rrset.from_text(name + '.', 300, 'IN', 'TXT', *(f'"{v}"' for v in values)))
+    return response
+
+
+class PropagationCheckerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.checker = PropagationChecker(30, max_workers=2)
+        self.checker.nameservers[ZONE] = ['192.0.2.1', '192.0.2.2']
+
+    @mock.patch('time.sleep')
+    @mock.patch('dns.query.udp_with_fallback')
+    def test_wait_visible(self, query_mock, sleep_mock):
+        query_mock.return_value = (_response(NAME, 'other', 'validation'), False)
+        assert self.checker.wait([(ZONE, NAME, 'validation')])
+        assert query_mock.call_count == 2
+        assert not sleep_mock.called
+
+    @mock.patch('time.sleep')
+    @mock.patch('dns.query.udp_with_fallback')
+    def test_wait_shared_name(self, query_mock, sleep_mock):
+        query_mock.side_effect = [(_response(NAME, 'apex'), False)] * 2 + \
+                                 [(_response(NAME, 'apex', 'wildcard'), False)] * 2
+        assert self.checker.wait([(ZONE, NAME, 'apex'), (ZONE, NAME, 'wildcard')])
+        # One query per nameserver and round, not per record
+        assert query_mock.call_count == 4
+        sleep_mock.assert_called_once_with(1.0)
+
+    @mock.patch('time.sleep')
+    @mock.patch('dns.query.udp_with_fallback')
+    def test_wait_backoff(self, query_mock, sleep_mock):
+        responses = {'192.0.2.1': [_response(NAME)] * 3 + [_response(NAME, 'validation')],
+                     '192.0.2.2': [_response(NAME, 'validation')] * 4}
+        query_mock.side_effect = lambda query, server, timeout: (responses[server].pop(0), False)
+        assert self.checker.wait([(ZONE, NAME, 'validation')])
+        assert sleep_mock.mock_calls == [mock.call(1.0), mock.call(2.0), mock.call(4.0)]
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.monotonic')
+    @mock.patch('dns.query.udp_with_fallback')
+    def test_wait_timeout(self, query_mock, monotonic_mock, sleep_mock):
+        clock = [0.0]
+        monotonic_mock.side_effect = lambda: clock[0]
+        sleep_mock.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        query_mock.side_effect = dns.exception.Timeout()
+        assert not self.checker.wait([(ZONE, NAME, 'validation')])
+        assert clock[0] == 30.0
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.monotonic')
+    @mock.patch('dns.resolver.resolve')
+    def test_wait_unknown_nameservers(self, resolve_mock, monotonic_mock, sleep_mock):
+        clock = [0.0]
+        monotonic_mock.side_effect = lambda: clock[0]
+        sleep_mock.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        resolve_mock.side_effect = dns.resolver.NXDOMAIN()
+        checker = PropagationChecker(3)
+        assert not checker.wait([('unknown.test', '_acme-challenge.unknown.test', 'validation')])
+        assert checker.nameservers['unknown.test'] == []
+        assert clock[0] == 3.0
+        resolve_mock.assert_called_once()
+
+    @mock.patch('dns.resolver.resolve')
+    def test_get_nameservers(self, resolve_mock):
+        def resolve(qname, rdtype):
+            if rdtype == dns.rdatatype.NS:
+                return [mock.MagicMock(target=dns.name.from_text('ns1.test')),
+                        mock.MagicMock(target=dns.name.from_text('ns2.test'))]
+            if rdtype == dns.rdatatype.A and qname == dns.name.from_text('ns1.test'):
+                return [mock.MagicMock(address='192.0.2.1')]
+            if rdtype == dns.rdatatype.AAAA and qname == dns.name.from_text('ns2.test'):
+                return [mock.MagicMock(address='2001:db8::2')]
+            raise dns.resolver.NoAnswer()
+
+        resolve_mock.side_effect = resolve
+        checker = PropagationChecker(30)
+        assert checker._get_nameservers('other.test') == ['192.0.2.1', '2001:db8::2']
+        checker._get_nameservers('other.test')
+        assert resolve_mock.call_count == 4
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
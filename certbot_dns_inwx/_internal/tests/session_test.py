@@ -0,0 +1,60 @@
+"""Tests for certbot_dns_inwx._internal.session."""
+import sys
+from unittest import mock
+
+import pytest
+from certbot.compat import filesystem
+from certbot.compat import os
+from certbot.tests import util as test_util
+
+from certbot_dns_inwx._internal.session import SessionStore
+
+URL = 'https://test-api.example.com'
+USERNAME = 'test-user'
+COOKIES = [{'name': 'domrobot', 'value': 'cookie-value', 'domain': 'test-api.example.com', 'path': '/'}]
+
+
+class SessionStoreTest(test_util.TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.path = os.path.join(self.tempdir, 'inwx.cfg.session')
+        self.store = SessionStore(self.path, max_age=60)
+
+    def test_roundtrip(self):
+        assert self.store.load(URL, USERNAME) is None
+        self.store.save(URL, USERNAME, COOKIES)
+        assert self.store.load(URL, USERNAME) == COOKIES
+        assert filesystem.check_mode(self.path, 0o600)
+
+    def test_other_account(self):
+        self.store.save(URL, USERNAME, COOKIES)
+        assert self.store.load(URL, 'other-user') is None
+        assert self.store.load('https://other-api.example.com', USERNAME) is None
+
+    def test_expired(self):
+        with mock.patch('time.time', return_value=1000.0):
+            self.store.save(URL, USERNAME, COOKIES)
+        with mock.patch('time.time', return_value=1059.0):
+            assert self.store.load(URL, USERNAME) == COOKIES
+        with mock.patch('time.time', return_value=1060.0):
+            assert self.store.load(URL, USERNAME) is None
+
+    def test_corrupt(self):
+        with open(self.path, 'w') as file:
+            file.write('{"url": ')
+        assert self.store.load(URL, USERNAME) is None
+
+    def test_save_failure(self):
+        store = SessionStore(os.path.join(self.tempdir, 'missing', 'inwx.cfg.session'))
+        store.save(URL, USERNAME, COOKIES)
+        assert store.load(URL, USERNAME) is None
+
+    def test_discard(self):
+        self.store.save(URL, USERNAME, COOKIES)
+        self.store.discard()
+        assert not os.path.exists(self.path)
+        self.store.discard()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
@@ -0,0 +1,151 @@
+"""Load and soak test of concurrent perform/cleanup cycles against a rate limited, faulty Domrobot stand-in.
+
+Run e.g. ``python -m certbot_dns_inwx._internal.tests.soak --cycles 1000 --concurrency 50 --error-rate 0.01``.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from acme import challenges
+from acme import messages
+from certbot import achallenges
+from certbot.plugins import dns_test_common
+from certbot.tests import acme_util
+from certbot.tests import util as test_util
+
+from certbot_dns_inwx._internal.dns_inwx import Authenticator
+from certbot_dns_inwx._internal.tests import benchmark
+from certbot_dns_inwx._internal.tests.fake_domrobot import FakeDomrobot, lognormal_latency
+
+
+def make_achalls(cycle: int, names: int, hosts: int, zones: List[str]) -> List[achallenges.AnnotatedChallenge]:
+    """
+    Create the challenges of one certificate with a fresh token per challenge.
+
+    The certificates of all cycles share a pool of `hosts` names, like renewals of the same
+    certificates do, so caches warm up instead of growing with the number of cycles.
+    """
+    achalls = []
+    for i in range(names):
+        host = (cycle * names + i) % hosts
+        challb = acme_util.chall_to_challb(challenges.DNS01(token=os.urandom(16)), messages.STATUS_PENDING)
+        achalls.append(achallenges.KeyAuthorizationAnnotatedChallenge(
+            challb=challb,
+            identifier=messages.Identifier(typ=messages.IDENTIFIER_FQDN, value=f'host{host}.{zones[host % len(zones)]}'),
+            account_key=dns_test_common.KEY))
+    return achalls
+
+
+def run(cycles: int, concurrency: int = 20, names: int = 2, hosts: int = 50, zones: int = 5,
+        latency: float = 0.005, error_rate: float = 0.0, rate_limit: float = 1000, **options) -> dict:
+    """
+    Run `cycles` perform/cleanup cycles, `concurrency` of them at a time, in a single process.
+
+    The plugin's rate limit defaults to 80% of that of the server and its journal is enabled.
+    A first tenth of the cycles warms up the caches; the traced memory is measured after it
+    and again at the end.
+
+    :param float latency: Median of the log-normally distributed latency of API calls.
+    :param float error_rate: Probability of an API call to fail with the transient result code 2400.
+    :param float rate_limit: Maximum number of API calls per second accepted by the server.
+    :returns: Throughput, failed cycles, API calls, leaked records and memory usage of the run.
+    :rtype: dict
+    """
+    zone_names = [f'zone{i}.test' for i in range(zones)]
+    benchmark.reset_caches()
+    Authenticator.metrics.reset()
+    with FakeDomrobot(zone_names, latency=lognormal_latency(latency) if latency else 0.0, error_rate=error_rate,
+                      seed=0, rate_limit=rate_limit) as server, \
+            tempfile.TemporaryDirectory() as workdir, test_util.patch_display_util():
+        options.setdefault('rate_limit', rate_limit * 0.8)
+        options.setdefault('max_workers', 4)
+        options.setdefault('journal', True)
+        config = benchmark.make_config(workdir, server.url, **options)
+        failures = []
+
+        def cycle(number):
+            auth = Authenticator(config, 'dns-inwx')
+            achalls = make_achalls(number, names, hosts, zone_names)
+            try:
+                auth.perform(achalls)
+            except Exception as err:
+                failures.append(f'perform: {err}')
+            finally:
+                try:
+                    auth.cleanup(achalls)
+                except Exception as err:
+                    failures.append(f'cleanup: {err}')
+
+        warmup = max(1, cycles // 10)
+        tracemalloc.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(cycle, range(warmup)))
+            gc.collect()
+            warm_memory, _ = tracemalloc.get_traced_memory()
+            list(executor.map(cycle, range(warmup, cycles)))
+        seconds = time.perf_counter() - start
+        gc.collect()
+        end_memory, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'cycles': cycles,
+            'concurrency': concurrency,
+            'seconds': round(seconds, 3),
+            'cycles_per_second': round(cycles / seconds, 2),
+            'failed_cycles': len(failures),
+            'failures': sorted(set(failures))[:10],
+            'api_calls': sum(server.calls.values()),
+            'api_calls_by_method': dict(sorted(server.calls.items())),
+            'rate_limited_calls': server.rate_limited,
+            'peak_concurrent_calls': server.peak_in_flight,
+            'leaked_records': len(server.records()),
+            'memory_growth_kib': round((end_memory - warm_memory) / 1024, 1),
+            'peak_memory_kib': round(peak / 1024, 1),
+        }
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=500, help='Number of perform/cleanup cycles.')
+    parser.add_argument('--concurrency', type=int, default=50, help='Number of cycles run at the same time.')
+    parser.add_argument('--names', type=int, default=2, help='Number of names per certificate.')
+    parser.add_argument('--hosts', type=int, default=50, help='Number of distinct names of all certificates.')
+    parser.add_argument('--zones', type=int, default=5, help='Number of zones of the fake account.')
+    parser.add_argument('--latency', type=float, default=0.005, help='Median seconds of API calls.')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Probability of an API call to fail temporarily.')
+    parser.add_argument('--rate-limit', type=float, default=1000,
+                        help='Maximum number of API calls per second accepted by the fake API.')
+    parser.add_argument('--plugin-rate-limit', type=float, default=None,
+                        help='Value of --dns-inwx-rate-limit, defaults to 80%% of --rate-limit.')
+    parser.add_argument('--max-workers', type=int, default=4, help='Value of --dns-inwx-max-workers.')
+    parser.add_argument('--async-client', action='store_true', help='Use the asynchronous client.')
+    parser.add_argument('--json', action='store_true', help='Print the result as JSON.')
+    parsed = parser.parse_args(args)
+
+    options = {'max_workers': parsed.max_workers}
+    if parsed.plugin_rate_limit is not None:
+        options['rate_limit'] = parsed.plugin_rate_limit
+    if parsed.async_client:
+        options['async_client'] = True
+    result = run(parsed.cycles, parsed.concurrency, parsed.names, parsed.hosts, parsed.zones, parsed.latency,
+                 parsed.error_rate, parsed.rate_limit, **options)
+    if parsed.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f'{key:>22}: {value}')
+    return 1 if result['leaked_records'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
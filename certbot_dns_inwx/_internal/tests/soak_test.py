@@ -0,0 +1,48 @@
+"""Tests for certbot_dns_inwx._internal.tests.soak."""
+import os
+import sys
+import unittest
+from unittest import mock
+
+import pytest
+
+from certbot_dns_inwx._internal.tests import soak
+
+# Timing and memory assertions depend on the machine, so they only run if this environment variable is set
+PERFORMANCE_TESTS = 'CERTBOT_DNS_INWX_PERFORMANCE_TESTS'
+
+
+class SoakTest(unittest.TestCase):
+    @mock.patch('random.uniform', return_value=0)
+    def test_soak(self, unused_uniform_mock):
+        result = soak.run(40, concurrency=10, names=1, latency=0.002, error_rate=0.005, rate_limit=1000)
+        assert result['failures'] == []
+        assert result['leaked_records'] == 0
+        assert result['rate_limited_calls'] == 0
+        # A single client and session is shared by all concurrent cycles
+        assert result['api_calls_by_method']['account.login'] == 1
+        assert result['api_calls_by_method']['nameserver.createRecord'] >= 40
+
+    @unittest.skipUnless(os.environ.get(PERFORMANCE_TESTS), f'set {PERFORMANCE_TESTS} to measure throughput and memory')
+    @mock.patch('random.uniform', return_value=0)
+    def test_soak_performance(self, unused_uniform_mock):
+        result = soak.run(200, concurrency=25, names=1, latency=0.002, error_rate=0.005, rate_limit=1000)
+        assert result['failures'] == []
+        assert result['leaked_records'] == 0
+        # Generous bounds, which only catch gross regressions on slow machines
+        assert result['cycles_per_second'] > 5
+        assert result['memory_growth_kib'] < 2048
+
+    def test_rate_limited_server(self):
+        # The plugin spaces out its requests to stay below the limit of the server
+        result = soak.run(20, concurrency=10, latency=0, rate_limit=50)
+        assert result['failures'] == []
+        assert result['leaked_records'] == 0
+        assert result['rate_limited_calls'] == 0
+
+    def test_main(self):
+        assert soak.main(['--cycles', '4', '--concurrency', '2', '--json']) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))
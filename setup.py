@@ -28,6 +28,7 @@ test_extras = [
 
 extras_require = {
     'CNAME': ['dnspython'],
+    'async': ['aiohttp'],
     'test': test_extras,
 }
 
@@ -52,6 +53,10 @@ setup(
         'certbot.plugins': [
             'dns-inwx = certbot_dns_inwx._internal.dns_inwx:Authenticator',
         ],
+        'console_scripts': [
+            'certbot-dns-inwx-daemon = certbot_dns_inwx._internal.daemon:main',
+            'certbot-dns-inwx-plan = certbot_dns_inwx._internal.plan:main',
+        ],
     },
     classifiers=[
         "Programming Language :: Python :: 3",